@@ -32,11 +32,22 @@ upload_dir.mkdir(parents=True, exist_ok=True)
 
 files = st.file_uploader("Upload PDFs", type="pdf", accept_multiple_files=True)
 if files:
+    file_paths = []
     for file in files:
         file_path = upload_dir / file.name
         file_path.write_bytes(file.read())
-        asyncio.run(st.session_state.docs.aadd(file_path, docname=file.name))
-        st.success(f"Added {file.name}")
+        file_paths.append(file_path)
+    # Ingest the files concurrently, embedding their texts together
+    docnames = asyncio.run(
+        st.session_state.docs.aadd_many(
+            file_paths, docnames=[file.name for file in files]
+        )
+    )
+    for file, docname in zip(files, docnames, strict=True):
+        if docname is None:
+            st.warning(f"Could not add {file.name}")
+        else:
+            st.success(f"Added {file.name} as {docname}")
 
 question = st.text_input("Ask a question about your papers")
 if st.button("Submit") and question:
@@ -0,0 +1,75 @@
+"""Benchmark the memory and garbage collection cost of a `ChunkStore`.
+
+Run with `python benchmarks/chunk_store.py`. Compares holding embedded chunks as a
+list of `Text`s against the columnar `ChunkStore`.
+"""
+
+import gc
+import time
+import tracemalloc
+from collections.abc import Callable, Sequence
+from functools import partial
+
+import numpy as np
+
+from paperqa.types import ChunkStore, Doc, Text
+
+SEED = 42
+
+
+def _make_texts(
+    rng: np.random.Generator, n_texts: int, dim: int, chunks_per_doc: int = 100
+) -> list[Text]:
+    doc = Doc(docname="stub", citation="stub", dockey="stub")
+    texts = []
+    for i, embedding in enumerate(
+        rng.standard_normal((n_texts, dim), dtype=np.float32).tolist()
+    ):
+        if i % chunks_per_doc == 0:
+            doc = Doc(docname=f"doc{i}", citation=f"doc{i}", dockey=f"doc{i}")
+        texts.append(
+            Text.model_construct(
+                text=f"Chunk {i} of {doc.docname}. " * 40,
+                name=f"{doc.docname} chunk {i}",
+                doc=doc,
+                embedding=embedding,
+            )
+        )
+    return texts
+
+
+def _measure(
+    store_type: Callable[[list[Text]], Sequence[Text]], texts: Callable[[], list[Text]]
+) -> tuple[float, float]:
+    """Get the traced MB of a store of the input texts, and a full collection's ms."""
+    gc.collect()
+    tracemalloc.start()
+    store = store_type(texts())
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    gc.collect()
+    elapsed = time.perf_counter() - start
+    del store
+    return size / 2**20, 1e3 * elapsed
+
+
+def bench_chunk_store(
+    n_texts_options: tuple[int, ...] = (10_000, 100_000), dim: int = 256
+) -> None:
+    """Report memory and full garbage collection time by number of chunks."""
+    rng = np.random.default_rng(SEED)
+    print(f"{'texts':>8} {'store':>11} {'MB':>8} {'gc ms':>8}")
+    for n_texts in n_texts_options:
+        for store_name, store_type in (
+            ("list[Text]", list),
+            ("ChunkStore", ChunkStore),
+        ):
+            size_mb, gc_ms = _measure(
+                store_type, partial(_make_texts, rng, n_texts, dim)
+            )
+            print(f"{n_texts:>8} {store_name:>11} {size_mb:>8.1f} {gc_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    bench_chunk_store()
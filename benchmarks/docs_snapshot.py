@@ -0,0 +1,114 @@
+"""Benchmark saving and loading a `Docs` snapshot against pickling it.
+
+Run with `python benchmarks/docs_snapshot.py`. Compares the file size, save time and
+load time of `Docs.save`/`Docs.load` (memory-mapped or read into memory) against
+pickling, with and without the zlib compression used by the search index.
+"""
+
+import asyncio
+import pickle
+import shutil
+import tempfile
+import time
+import zlib
+from collections.abc import Callable
+from functools import partial
+from pathlib import Path
+from typing import cast
+
+import numpy as np
+
+from paperqa import ChunkStore, Docs, NumpyVectorStore
+from paperqa.types import Doc, Text
+
+SEED = 42
+
+
+def _make_docs(
+    n_docs: int, chunks_per_doc: int, dim: int, columnar: bool = False
+) -> Docs:
+    rng = np.random.default_rng(SEED)
+    embeddings = rng.standard_normal((n_docs * chunks_per_doc, dim), dtype=np.float32)
+    docs: dict[str, Doc] = {}
+    texts = []
+    for i in range(n_docs):
+        doc = Doc(docname=f"doc{i}", citation=f"Author {i}, Paper {i}", dockey=f"{i}")
+        docs[doc.dockey] = doc
+        texts.extend(
+            Text.model_construct(
+                text=f"Chunk {j} of {doc.docname}. " * 40,
+                name=f"{doc.docname} pages {j}-{j + 1}",
+                doc=doc,
+                embedding=embeddings[i * chunks_per_doc + j].tolist(),
+            )
+            for j in range(chunks_per_doc)
+        )
+    index = NumpyVectorStore()
+    asyncio.run(index.add_texts_and_embeddings(texts))
+    return Docs(
+        docs=docs,
+        docnames={d.docname for d in docs.values()},
+        texts=ChunkStore(texts) if columnar else texts,
+        texts_index=index,
+    )
+
+
+def _size_mb(path: Path) -> float:
+    if path.is_file():
+        return path.stat().st_size / 2**20
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) / 2**20
+
+
+def _time(fn: Callable[[], object]) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def bench_docs_snapshot(
+    n_docs: int = 20_000, chunks_per_doc: int = 10, dim: int = 256
+) -> None:
+    """Report the file size, save and load seconds of each persistence format."""
+    print(f"{n_docs} papers x {chunks_per_doc} chunks (dim={dim})")
+    print(f"{'format':>22} {'MB':>8} {'save s':>8} {'load s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for columnar in (False, True):
+            docs = _make_docs(n_docs, chunks_per_doc, dim, columnar=columnar)
+            texts_name = "ChunkStore" if columnar else "list"
+            for compress in (False, True):
+                path = Path(tmp) / "docs.pkl"
+
+                def save(
+                    docs: Docs = docs, compress: bool = compress, path: Path = path
+                ) -> None:
+                    data = pickle.dumps(docs)
+                    path.write_bytes(zlib.compress(data) if compress else data)
+
+                def load(compress: bool = compress, path: Path = path) -> Docs:
+                    data = path.read_bytes()
+                    return pickle.loads(  # noqa: S301
+                        zlib.decompress(data) if compress else data
+                    )
+
+                save_s, _ = _time(save)
+                load_s, _ = _time(load)
+                name = f"pickle{'+zlib' if compress else ''} ({texts_name})"
+                print(
+                    f"{name:>22} {_size_mb(path):>8.1f} {save_s:>8.2f} {load_s:>8.2f}"
+                )
+            for mmap in (True, False):
+                directory = Path(tmp) / "docs"
+                shutil.rmtree(directory, ignore_errors=True)
+                save_s, _ = _time(partial(docs.save, directory))
+                load_s, loaded = _time(partial(Docs.load, directory, mmap=mmap))
+                if len(cast("Docs", loaded).texts) != len(docs.texts):
+                    raise RuntimeError("Loaded texts differ from the saved texts.")
+                name = f"save{' mmap' if mmap else ''} ({texts_name})"
+                print(
+                    f"{name:>22} {_size_mb(directory):>8.1f} {save_s:>8.2f}"
+                    f" {load_s:>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    bench_docs_snapshot()
@@ -0,0 +1,72 @@
+"""Benchmark indexing into and searching a `BM25Index`.
+
+Run with `python benchmarks/lexical_index.py`. Texts draw words from a Zipfian
+vocabulary, like natural language, so common terms have long posting lists.
+"""
+
+import time
+
+import numpy as np
+
+from paperqa.llms import BM25Index
+from paperqa.types import Doc, Text
+
+SEED = 42
+
+
+def _make_texts(
+    rng: np.random.Generator, n_texts: int, vocab_size: int, words_per_text: int
+) -> list[Text]:
+    doc = Doc(docname="stub", citation="stub", dockey="stub")
+    word_ids = np.minimum(
+        rng.zipf(1.3, size=(n_texts, words_per_text)), vocab_size
+    ).tolist()
+    return [
+        Text.model_construct(
+            text=" ".join(f"w{i}" for i in ids), name=f"chunk {n}", doc=doc
+        )
+        for n, ids in enumerate(word_ids)
+    ]
+
+
+def bench_bm25(
+    n_texts_options: tuple[int, ...] = (10_000, 100_000),
+    vocab_size: int = 50_000,
+    words_per_text: int = 150,
+    n_queries: int = 200,
+    k: int = 10,
+) -> None:
+    """Report indexing throughput and mean search latency by number of texts.
+
+    Queries mix rare terms (e.g. gene names) with common ones.
+    """
+    rng = np.random.default_rng(SEED)
+    print(f"{'texts':>8} {'index texts/s':>14} {'rare ms':>8} {'mixed ms':>9}")
+    for n_texts in n_texts_options:
+        texts = _make_texts(rng, n_texts, vocab_size, words_per_text)
+        index = BM25Index()
+        start = time.perf_counter()
+        index.add_texts(texts)
+        index_rate = n_texts / (time.perf_counter() - start)
+
+        latencies_ms = []
+        for common_terms in (0, 3):
+            queries = [
+                " ".join(
+                    [f"w{i}" for i in rng.integers(1_000, vocab_size, size=2)]
+                    + [f"w{i}" for i in rng.integers(1, 20, size=common_terms)]
+                )
+                for _ in range(n_queries)
+            ]
+            start = time.perf_counter()
+            for query in queries:
+                index.search(query, k)
+            latencies_ms.append(1e3 * (time.perf_counter() - start) / n_queries)
+        print(
+            f"{n_texts:>8} {index_rate:>14.0f} {latencies_ms[0]:>8.3f}"
+            f" {latencies_ms[1]:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    bench_bm25()
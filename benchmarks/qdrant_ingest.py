@@ -0,0 +1,80 @@
+"""Benchmark streaming ingestion into (and loading from) an in-memory Qdrant.
+
+Run with `python benchmarks/qdrant_ingest.py`, requires `qdrant-client`. The default
+size stays within what Qdrant recommends for its local (in-memory) mode.
+"""
+
+import asyncio
+import time
+import tracemalloc
+from collections.abc import Iterator
+
+import numpy as np
+
+from paperqa.llms import QdrantVectorStore
+from paperqa.types import Doc, Text
+
+SEED = 42
+
+
+def _stream_texts(n_texts: int, dim: int, chunks_per_doc: int = 100) -> Iterator[Text]:
+    """Lazily make texts, so the input itself doesn't dominate memory."""
+    rng = np.random.default_rng(SEED)
+    doc = Doc(docname="stub", citation="stub", dockey="stub")
+    for i in range(n_texts):
+        if i % chunks_per_doc == 0:
+            doc = Doc(docname=f"doc{i}", citation=f"doc{i}", dockey=f"doc{i}")
+        yield Text(
+            text=f"chunk {i}",
+            name=f"{doc.docname} chunk {i}",
+            doc=doc,
+            embedding=rng.standard_normal(dim).tolist(),
+        )
+
+
+async def bench_ingest(
+    n_texts: int = 20_000,
+    dim: int = 256,
+    batch_size_options: tuple[int, ...] = (64, 256, 1024),
+) -> None:
+    """Report throughput and peak traced memory of streaming upserts per batch size.
+
+    Also reports the throughput of loading the collection back via `load_docs`,
+    with and without its lazy (no vectors and no text) hydration.
+    """
+    print(f"Qdrant ingestion of {n_texts} texts (dim={dim})")
+    print(f"{'batch':>6} {'points/s':>10} {'peak MB':>8} {'load/s':>8} {'lazy/s':>8}")
+    for batch_size in batch_size_options:
+        index = QdrantVectorStore(upsert_batch_size=batch_size)
+        tracemalloc.start()
+        start = time.perf_counter()
+        await index.add_texts_and_embeddings(_stream_texts(n_texts, dim))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if (await index.client.count(index.collection_name)).count != n_texts:
+            raise RuntimeError("Not every text was upserted.")
+        load_rates = []
+        loaded = []  # Stores close their client when collected, so keep them
+        for lazy in (False, True):
+            start = time.perf_counter()
+            docs = await QdrantVectorStore.load_docs(
+                index.client,
+                index.collection_name,
+                batch_size=batch_size,
+                with_vectors=not lazy,
+                with_text=not lazy,
+            )
+            load_rates.append(n_texts / (time.perf_counter() - start))
+            if len(docs.texts) != n_texts:
+                raise RuntimeError("Not every point was loaded.")
+            loaded.append(docs)
+        print(
+            f"{batch_size:>6} {n_texts / elapsed:>10.0f} {peak / 2**20:>8.1f}"
+            f" {load_rates[0]:>8.0f} {load_rates[1]:>8.0f}"
+        )
+        await index.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench_ingest())
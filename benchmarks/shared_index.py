@@ -0,0 +1,96 @@
+"""Benchmark the memory of worker processes sharing one saved `NumpyVectorStore`.
+
+Run with `python benchmarks/shared_index.py` on Linux, as it reads the proportional
+set size (PSS) from `/proc`, which splits each shared page's size across the
+processes mapping it. A loader saves the store once to the `/dev/shm` shared memory
+filesystem, then each worker loads it, either memory-mapped or copied into memory.
+"""
+
+import asyncio
+import multiprocessing as mp
+import shutil
+import tempfile
+from multiprocessing.synchronize import Barrier
+from pathlib import Path
+from typing import cast
+
+import numpy as np
+
+from paperqa.llms import NumpyVectorStore
+from paperqa.types import ChunkStore, Doc, Text
+
+SEED = 42
+
+
+def _pss_mb() -> float:
+    with Path("/proc/self/smaps_rollup").open() as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) / 2**10
+    raise RuntimeError("No PSS found in smaps_rollup.")
+
+
+def _worker(directory: Path, mmap: bool, barrier: Barrier, results: mp.Queue) -> None:
+    before = _pss_mb()
+    store = NumpyVectorStore.load(directory, mmap=mmap)
+    # Touch every page, like queries eventually do
+    cast("np.ndarray", store.embeddings_matrix).sum()
+    for i in range(0, len(store.texts), 97):
+        store.texts.text(i)
+    barrier.wait()  # Measure once every worker maps the pages
+    results.put(_pss_mb() - before)
+    barrier.wait()
+
+
+async def _save_store(directory: Path, n_texts: int, dim: int) -> None:
+    rng = np.random.default_rng(SEED)
+    store = NumpyVectorStore(texts=ChunkStore(store_embeddings=False))
+    for start in range(0, n_texts, 1_000):  # Batches, to bound the floats in memory
+        doc = Doc(docname=f"doc{start}", citation=f"doc{start}", dockey=f"doc{start}")
+        await store.add_texts_and_embeddings(
+            Text(
+                text=f"Chunk {i}. " * 100,
+                name=f"chunk {i}",
+                doc=doc,
+                embedding=embedding,
+            )
+            for i, embedding in enumerate(
+                rng.standard_normal((1_000, dim), dtype=np.float32).tolist(),
+                start=start,
+            )
+        )
+    store.save(directory)
+
+
+def bench_shared_index(
+    n_texts: int = 100_000, dim: int = 768, n_workers_options: tuple[int, ...] = (1, 4)
+) -> None:
+    """Report the total PSS of the workers' loaded stores, by number of workers."""
+    directory = Path(tempfile.mkdtemp(dir="/dev/shm"))
+    try:
+        asyncio.run(_save_store(directory, n_texts, dim))
+        size_mb = sum(f.stat().st_size for f in directory.iterdir()) / 2**20
+        print(f"Store of {n_texts} texts (dim={dim}) saved as {size_mb:.0f} MB")
+        print(f"{'workers':>8} {'mmap':>6} {'total PSS MB':>13}")
+        ctx = mp.get_context("spawn")
+        for n_workers in n_workers_options:
+            for mmap in (False, True):
+                barrier, results = ctx.Barrier(n_workers), ctx.Queue()
+                workers = [
+                    ctx.Process(
+                        target=_worker, args=(directory, mmap, barrier, results)
+                    )
+                    for _ in range(n_workers)
+                ]
+                for worker in workers:
+                    worker.start()
+                total_mb = sum(results.get() for _ in workers)
+                for worker in workers:
+                    worker.join()
+                print(f"{n_workers:>8} {mmap!s:>6} {total_mb:>13.0f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    bench_shared_index()
@@ -0,0 +1,268 @@
+"""Microbenchmarks for the retrieval hot paths of `NumpyVectorStore`.
+
+Run with `python benchmarks/vector_store.py`.
+"""
+
+import multiprocessing
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+from paperqa.llms import (
+    IVFVectorStore,
+    NumpyVectorStore,
+    l2_normalize,
+    maximal_marginal_relevance,
+    top_k_indices,
+)
+from paperqa.types import Doc, Text
+
+SEED = 42
+
+
+def _time(fn: Callable[[], object], repeats: int = 5) -> float:
+    """Get the best-of-N wall time of the input function, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def bench_top_k(
+    n_rows_options: tuple[int, ...] = (10**4, 10**5, 10**6), k: int = 20
+) -> None:
+    """Compare full argsort against argpartition-based top-k over similarity scores."""
+    rng = np.random.default_rng(SEED)
+    print(f"top-k selection (k={k})")
+    print(f"{'rows':>10} {'argsort ms':>12} {'top_k ms':>10} {'speedup':>8}")
+    for n_rows in n_rows_options:
+        scores = rng.standard_normal(n_rows).astype(np.float32)
+        full = np.argsort(-scores, kind="stable")[:k]
+        if not np.array_equal(full, top_k_indices(scores, k)):
+            raise RuntimeError("Top-k orders differ from full argsort.")
+
+        argsort_ms = _time(lambda: np.argsort(-scores)[:k])  # noqa: B023
+        top_k_ms = _time(lambda: top_k_indices(scores, k))  # noqa: B023
+        print(
+            f"{n_rows:>10} {argsort_ms:>12.2f} {top_k_ms:>10.2f}"
+            f" {argsort_ms / top_k_ms:>7.1f}x"
+        )
+
+
+def _clustered_embeddings(
+    rng: np.random.Generator, centers: np.ndarray, n_rows: int
+) -> np.ndarray:
+    """Make L2-normalized embeddings scattered around centers, like real corpora."""
+    embeddings = centers[rng.integers(len(centers), size=n_rows)]
+    embeddings += 1.5 * rng.standard_normal(embeddings.shape, dtype=np.float32)
+    return l2_normalize(embeddings)
+
+
+def _fill(store: NumpyVectorStore, embeddings: np.ndarray) -> None:
+    # Skip creating Texts, only the rows are searched
+    store._embeddings_matrix = embeddings
+    store._n_rows = len(embeddings)
+
+
+def bench_ivf(
+    n_rows: int = 200_000,
+    dim: int = 256,
+    k: int = 10,
+    n_queries: int = 100,
+    n_probe_options: tuple[int, ...] = (1, 4, 16, 64),
+) -> None:
+    """Compare recall@k and latency of `IVFVectorStore` against exact search."""
+    rng = np.random.default_rng(SEED)
+    centers = rng.standard_normal((1000, dim)).astype(np.float32)
+    embeddings = _clustered_embeddings(rng, centers, n_rows)
+    queries = _clustered_embeddings(rng, centers, n_queries)
+
+    exact = NumpyVectorStore()
+    _fill(exact, embeddings)
+    ivf = IVFVectorStore(min_train_rows=1)
+    _fill(ivf, embeddings)
+    start = time.perf_counter()
+    ivf.train()
+    print(
+        f"IVF over {n_rows} rows (dim={dim}, k={k}), trained"
+        f" {len(ivf._lists)} lists in {time.perf_counter() - start:.1f}s"
+    )
+
+    truth = [set(exact._search_rows(q, k)[0].tolist()) for q in queries]
+    exact_ms = _time(lambda: [exact._search_rows(q, k) for q in queries]) / n_queries
+    print(f"{'n_probe':>8} {'recall@k':>9} {'ms/query':>9} {'speedup':>8}")
+    print(f"{'exact':>8} {1.0:>9.3f} {exact_ms:>9.3f} {1.0:>7.1f}x")
+    for n_probe in n_probe_options:
+        ivf.n_probe = n_probe
+        recall = np.mean(
+            [
+                len(truth[i] & set(ivf._search_rows(q, k)[0].tolist())) / k
+                for i, q in enumerate(queries)
+            ]
+        )
+        ivf_ms = _time(lambda: [ivf._search_rows(q, k) for q in queries]) / n_queries
+        print(f"{n_probe:>8} {recall:>9.3f} {ivf_ms:>9.3f} {exact_ms / ivf_ms:>7.1f}x")
+
+
+def _original_mmr(
+    embeddings: np.ndarray, scores: np.ndarray, k: int, mmr_lambda: float
+) -> list[int]:
+    """MMR re-maximizing over all selected columns per selection, as originally done."""
+    similarity_matrix = embeddings @ embeddings.T
+
+    selected_indices = [0]
+    remaining_indices = list(range(1, len(embeddings)))
+
+    while len(selected_indices) < k:
+        selected_similarities = similarity_matrix[:, selected_indices]
+        max_sim_to_selected = selected_similarities.max(axis=1)
+
+        mmr_scores = mmr_lambda * scores - (1 - mmr_lambda) * max_sim_to_selected
+        mmr_scores[selected_indices] = -np.inf
+
+        max_mmr_index = int(mmr_scores.argmax())
+        selected_indices.append(max_mmr_index)
+        remaining_indices.remove(max_mmr_index)
+
+    return selected_indices
+
+
+def bench_mmr(
+    fetch_k_options: tuple[int, ...] = (20, 100, 500, 2000),
+    dim: int = 1536,
+    mmr_lambda: float = 0.9,
+) -> None:
+    """Compare the original and incremental MMR, checking they select the same order."""
+    rng = np.random.default_rng(SEED)
+    print(f"MMR selecting k = fetch_k / 2 (dim={dim}, lambda={mmr_lambda})")
+    print(f"{'fetch_k':>8} {'original ms':>12} {'incremental ms':>15} {'speedup':>8}")
+    for fetch_k in fetch_k_options:
+        k = fetch_k // 2
+        embeddings = l2_normalize(
+            rng.standard_normal((fetch_k, dim)).astype(np.float32)
+        )
+        query = l2_normalize(rng.standard_normal(dim).astype(np.float32))
+        scores = np.sort(embeddings @ query)[::-1].copy()
+        if _original_mmr(embeddings, scores, k, mmr_lambda) != (
+            maximal_marginal_relevance(embeddings, scores, k, mmr_lambda)
+        ):
+            raise RuntimeError("MMR selection orders differ from the original.")
+
+        original_ms = _time(
+            lambda: _original_mmr(embeddings, scores, k, mmr_lambda)  # noqa: B023
+        )
+        incremental_ms = _time(
+            lambda: maximal_marginal_relevance(
+                embeddings, scores, k, mmr_lambda  # noqa: B023
+            )
+        )
+        print(
+            f"{fetch_k:>8} {original_ms:>12.2f} {incremental_ms:>15.2f}"
+            f" {original_ms / incremental_ms:>7.1f}x"
+        )
+
+
+def _resident_memory() -> tuple[int, int]:
+    """Get this process's resident anonymous and file-backed memory, in bytes.
+
+    Anonymous memory is private to the process, whereas file-backed memory is
+    memory-mapped page cache, that processes mapping the same file share and
+    that the OS can evict. Linux only.
+    """
+    with open("/proc/self/status", encoding="utf-8") as f:
+        status = dict(line.split(":", 1) for line in f)
+    return tuple(  # type: ignore[return-value]
+        int(status[field].split()[0]) * 1024 for field in ("RssAnon", "RssFile")
+    )
+
+
+def _resident_search(directory: Path, queries: np.ndarray, k: int) -> tuple[int, int]:
+    """Load a saved store and search it, getting the resident memory this added."""
+    baseline = _resident_memory()
+    store = NumpyVectorStore.load(directory)
+    for np_query in queries:
+        store._search_rows(np_query, k)
+    return tuple(  # type: ignore[return-value]
+        after - before
+        for after, before in zip(_resident_memory(), baseline, strict=True)
+    )
+
+
+def bench_quantization(
+    n_rows: int = 200_000, dim: int = 768, k: int = 10, n_queries: int = 100
+) -> None:
+    """Compare memory, latency and recall@k of quantized stores against float32.
+
+    Memory is measured both as the embeddings an in-memory store holds, and as the
+    resident memory a fresh process gains from loading the saved store and
+    searching it. Loaded stores are memory-mapped, so this is split into private
+    (anonymous) memory and shared page cache. Quantized stores scan the codes,
+    only reading in the full-precision rows they re-rank, though the OS may map
+    whole large pages of those rows.
+    """
+    rng = np.random.default_rng(SEED)
+    centers = rng.standard_normal((1000, dim)).astype(np.float32)
+    embeddings = _clustered_embeddings(rng, centers, n_rows)
+    queries = _clustered_embeddings(rng, centers, n_queries)
+    doc = Doc(docname="stub", citation="stub", dockey="stub")
+    # Skip validation to share rows with the embeddings
+    texts = [
+        Text.model_construct(
+            text=f"chunk {i}", name=f"chunk {i}", doc=doc, embedding=row
+        )
+        for i, row in enumerate(embeddings)
+    ]
+    # Spawn, to not inherit this process's memory
+    mp_context = multiprocessing.get_context("spawn")
+
+    print(f"Quantization over {n_rows} rows (dim={dim}, k={k})")
+    print(
+        f"{'storage':>8} {'rerank':>7} {'heap MB':>8} {'anon MB':>8} {'file MB':>8}"
+        f" {'recall@k':>9} {'ms/query':>9}"
+    )
+    truth: list[set[int]] = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for quantization, rerank_factor in (
+            (None, 1),
+            ("float16", 4),
+            ("int8", 1),
+            ("int8", 4),
+        ):
+            store = NumpyVectorStore(
+                texts=texts, quantization=quantization, rerank_factor=rerank_factor
+            )
+            store._sync_rows()
+            results = [store._search_rows(q, k)[0] for q in queries]
+            if not truth:
+                truth = [set(rows.tolist()) for rows in results]
+            recall = np.mean(
+                [
+                    len(truth[i] & set(rows.tolist())) / k
+                    for i, rows in enumerate(results)
+                ]
+            )
+            search_ms = _time(
+                lambda store=store: [store._search_rows(q, k) for q in queries]
+            )
+            directory = Path(tmp_dir) / f"{quantization}_{rerank_factor}"
+            store.save(directory)
+            with mp_context.Pool(1) as pool:
+                anon, file = pool.apply(_resident_search, (directory, queries, k))
+            print(
+                f"{quantization or 'float32':>8} {rerank_factor:>6}x"
+                f" {store.nbytes / 2**20:>8.1f} {anon / 2**20:>8.1f}"
+                f" {file / 2**20:>8.1f}"
+                f" {recall:>9.3f} {search_ms / n_queries:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    bench_top_k()
+    bench_ivf()
+    bench_mmr()
+    bench_quantization()
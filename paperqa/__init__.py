@@ -16,12 +16,25 @@ from paperqa.agents import ask
 from paperqa.agents.main import agent_query
 from paperqa.docs import Docs, PQASession
 from paperqa.llms import (
+    BM25Index,
+    DiskEmbeddingCache,
+    EmbeddingBatcher,
+    IVFVectorStore,
     NumpyVectorStore,
     QdrantVectorStore,
+    QueryEmbeddingCache,
     VectorStore,
 )
 from paperqa.settings import Settings, get_settings
-from paperqa.types import Answer, Context, Doc, DocDetails, Text
+from paperqa.types import (
+    Answer,
+    ChunkStore,
+    Context,
+    Doc,
+    DocDetails,
+    IngestionStats,
+    Text,
+)
 from paperqa.version import __version__
 
 # TODO: remove after refactoring all models to avoid using _* private vars
@@ -32,12 +45,18 @@ warnings.filterwarnings(
 
 __all__ = [
     "Answer",
+    "BM25Index",
+    "ChunkStore",
     "Context",
+    "DiskEmbeddingCache",
     "Doc",
     "DocDetails",
     "Docs",
+    "EmbeddingBatcher",
     "EmbeddingModel",
     "HybridEmbeddingModel",
+    "IVFVectorStore",
+    "IngestionStats",
     "LLMModel",
     "LLMResult",
     "LiteLLMEmbeddingModel",
@@ -45,6 +64,7 @@ __all__ = [
     "NumpyVectorStore",
     "PQASession",
     "QdrantVectorStore",
+    "QueryEmbeddingCache",
     "SentenceTransformerEmbeddingModel",
     "Settings",
     "SparseEmbeddingModel",
@@ -24,6 +24,7 @@ from tenacity import (
 
 from paperqa._ldp_shims import Callback, RolloutManager
 from paperqa.docs import Docs
+from paperqa.llms import QueryEmbeddingCache
 from paperqa.settings import AgentSettings, Settings
 from paperqa.types import PQASession
 
@@ -59,13 +60,17 @@ async def agent_query(
     **runner_kwargs,
 ) -> AnswerResponse:
     if docs is None:
-        docs = Docs()
+        docs = Docs(texts_index=settings.get_texts_index())
+        # Agents often re-ask similar questions, so reuse their embeddings
+        docs.texts_index.query_embedding_cache = QueryEmbeddingCache()
 
     answers_index = SearchIndex(
         fields=[*SearchIndex.REQUIRED_FIELDS, "question"],
         index_name="answers",
         index_directory=settings.agent.index.index_directory,
         storage=SearchDocumentStorage.JSON_MODEL_DUMP,
+        # Write each distinct document once, instead of once per context
+        storage_context={"dedupe_docs": True},
     )
 
     response = await run_agent(docs, query, settings, agent_type, **runner_kwargs)
@@ -137,6 +142,11 @@ async def run_agent(
         )
     else:
         raise NotImplementedError(f"Didn't yet handle agent type {agent_type}.")
+    if (query_cache := docs.texts_index.query_embedding_cache) is not None:
+        logger.info(
+            f"Query embedding cache had {query_cache.hits} hits and"
+            f" {query_cache.misses} misses ({query_cache.hit_rate:.0%} hit rate)."
+        )
 
     if agent_status != AgentStatus.TRUNCATED and session.has_successful_answer is False:
         agent_status = AgentStatus.UNSURE
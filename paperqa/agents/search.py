@@ -75,10 +75,12 @@ class SearchDocumentStorage(StrEnum):
             return "zip"
         return "pkl"
 
-    def write_to_string(self, data: BaseModel | SupportsPickle) -> bytes:
+    def write_to_string(
+        self, data: BaseModel | SupportsPickle, context: dict[str, Any] | None = None
+    ) -> bytes:
         if self == SearchDocumentStorage.JSON_MODEL_DUMP:
             if isinstance(data, BaseModel):
-                return data.model_dump_json().encode("utf-8")
+                return data.model_dump_json(context=context).encode("utf-8")
             raise ValueError("JSON_MODEL_DUMP requires a BaseModel object.")
         if self == SearchDocumentStorage.PICKLE_COMPRESSED:
             return zlib.compress(pickle.dumps(data))
@@ -124,6 +126,7 @@ class SearchIndex:
             "index_directory"
         ].default,
         storage: SearchDocumentStorage = SearchDocumentStorage.PICKLE_COMPRESSED,
+        storage_context: dict[str, Any] | None = None,
     ):
         if fields is None:
             fields = self.REQUIRED_FIELDS
@@ -141,6 +144,8 @@ class SearchIndex:
         self._index_files: dict[str, str] = {}
         self.changed = False
         self.storage = storage
+        # Serialization context of JSON stored documents, e.g. {"dedupe_docs": True}
+        self.storage_context = storage_context
 
     @property
     async def index_directory(  # TODO: rename to index_root_directory
@@ -309,7 +314,11 @@ class SearchIndex:
                             docs_index_dir / f"{filehash}.{self.storage.extension()}",
                             "wb",
                         ) as f:
-                            await f.write(self.storage.write_to_string(document))
+                            await f.write(
+                                self.storage.write_to_string(
+                                    document, context=self.storage_context
+                                )
+                            )
 
                     self.changed = True
                 except ValueError as e:
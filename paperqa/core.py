@@ -218,8 +218,9 @@ async def map_fxn_summary(
                 # Embeddings enable the retrieval of Texts to make Contexts.
                 # Once we already have Contexts, we filter them by score
                 # (and not the underlying Text's embeddings),
-                # so embeddings can be safely dropped from the deepcopy
-                doc=text.doc.model_dump(exclude={"embedding"}),
+                # so embeddings can be safely dropped from the copy.
+                # The Doc is shared, not copied, so Contexts of a Doc reference it once
+                doc=text.doc.without_embedding(),
                 **text.model_dump(exclude={"embedding", "doc"}),
             ),
             score=score,  # pylint: disable=possibly-used-before-assignment
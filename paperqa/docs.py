@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import os
@@ -7,29 +8,45 @@ import re
 import tempfile
 import urllib.request
 import warnings
-from collections.abc import Callable, Sequence
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
 from datetime import datetime
 from io import BytesIO
 from pathlib import Path
-from typing import Any, BinaryIO, cast
+from typing import Any, BinaryIO, ClassVar, Self, cast
 from uuid import UUID, uuid4
 
+import numpy as np
 from aviary.core import Message
 from lmi import Embeddable, EmbeddingModel, LLMModel
 from lmi.types import set_llm_session_ids
 from lmi.utils import gather_with_concurrency
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 from paperqa.clients import DEFAULT_CLIENTS, DocMetadataClient
 from paperqa.core import llm_parse_json, map_fxn_summary
 from paperqa.llms import (
+    BM25Index,
+    DiskEmbeddingCache,
+    EmbeddingBatcher,
     NumpyVectorStore,
+    QueryEmbeddingCache,
     VectorStore,
+    reciprocal_rank_fusion,
 )
 from paperqa.prompts import CANNOT_ANSWER_PHRASE
 from paperqa.readers import read_doc
-from paperqa.settings import MaybeSettings, get_settings
-from paperqa.types import Doc, DocDetails, DocKey, PQASession, Text
+from paperqa.settings import MaybeSettings, Settings, get_settings
+from paperqa.types import (
+    DOC_ADAPTER,
+    ChunkStore,
+    Doc,
+    DocDetails,
+    DocKey,
+    IngestionStats,
+    PQASession,
+    Text,
+)
 from paperqa.utils import (
     citation_to_docname,
     get_loop,
@@ -42,18 +59,84 @@ from paperqa.utils import (
 logger = logging.getLogger(__name__)
 
 
+def _default_texts_index(data: dict[str, Any]) -> VectorStore:
+    """Get a texts index, storing its texts columnar if the `Docs`' texts are."""
+    if isinstance(data.get("texts"), ChunkStore):
+        return NumpyVectorStore(texts=ChunkStore(store_embeddings=False))
+    return NumpyVectorStore()
+
+
 class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
     """A collection of documents to be used for answering questions."""
 
     model_config = ConfigDict(extra="forbid")
 
+    # Layout of a collection saved to a directory
+    FORMAT_VERSION: ClassVar[int] = 1
+    METADATA_FILENAME: ClassVar[str] = "docs.json"
+    EMBEDDINGS_FILENAME: ClassVar[str] = "embeddings.npy"
+    # Template of the filenames of the texts' columns, by column name
+    CHUNKS_FILENAME: ClassVar[str] = "chunks_{}.npy"
+    CHUNKS_COLUMNS: ClassVar[tuple[str, ...]] = (
+        *NumpyVectorStore.CHUNKS_COLUMNS,
+        "has_embedding",
+    )
+    TEXTS_INDEX_DIRNAME: ClassVar[str] = "texts_index"
+
     id: UUID = Field(default_factory=uuid4)
     docs: dict[DocKey, Doc | DocDetails] = Field(default_factory=dict)
-    texts: list[Text] = Field(default_factory=list)
+    texts: ChunkStore | list[Text] = Field(
+        default_factory=list,
+        union_mode="left_to_right",
+        description=(
+            "Texts of the documents. Pass a `ChunkStore` to store them compactly,"
+            " only materializing the texts retrievals return."
+        ),
+    )
     docnames: set[str] = Field(default_factory=set)
-    texts_index: VectorStore = Field(default_factory=NumpyVectorStore)
+    texts_index: VectorStore = Field(
+        default_factory=_default_texts_index,
+        description=(
+            "Index of the texts for dense retrieval. Defaults to a `NumpyVectorStore`,"
+            " storing its texts in a `ChunkStore` if the texts are one."
+        ),
+    )
+    lexical_index: BM25Index = Field(
+        default_factory=BM25Index,
+        description="BM25 index of the texts, for lexical retrieval.",
+    )
     name: str = Field(default="default", description="Name of this docs collection")
     deleted_dockeys: set[DocKey] = Field(default_factory=set)
+    embedding_batcher: EmbeddingBatcher | None = Field(
+        default=None,
+        description=(
+            "Optional batcher to embed texts through, coalescing the texts of"
+            " concurrently added documents into token-budgeted batches."
+        ),
+    )
+    embedding_cache: DiskEmbeddingCache | None = Field(
+        default=None,
+        description=(
+            "Optional persistent cache of text embeddings, consulted before"
+            " embedding texts, so identical texts are embedded once."
+        ),
+    )
+    # Deleted documents whose texts were removed from the texts index
+    _removed_from_index: set[DocKey] = PrivateAttr(default_factory=set)
+    # Bumped when texts are removed, as removals shift the rows of texts
+    _texts_version: int = 0
+    # Per index, the texts, index, texts version, number of rows of texts and number
+    # of indexed texts when the index was last built, to only check newer rows
+    _index_watermarks: dict[str, tuple[Any, Any, int, int, int]] = PrivateAttr(
+        default_factory=dict
+    )
+    # Each document's rows of texts, valid while the texts, their count and the
+    # texts version match the state, otherwise it's rebuilt from the texts
+    _rows_by_dockey: dict[DocKey, range] | None = None
+    _rows_state: tuple[Any, int, int] | None = None
+    _dockeys_by_docname: dict[str, DocKey] = PrivateAttr(default_factory=dict)
+    # Last suffix given to each docname, to not probe taken suffixes again
+    _docname_suffixes: dict[str, str] = PrivateAttr(default_factory=dict)
 
     def __eq__(self, other) -> bool:
         if (
@@ -72,23 +155,291 @@ class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
             and self.docnames == other.docnames
             and self.texts_index == other.texts_index
             and self.name == other.name
-            # NOTE: ignoring deleted_dockeys
+            # NOTE: ignoring deleted_dockeys, lexical_index, and embedding helpers
+        )
+
+    def __setstate__(self, state: dict[Any, Any]) -> None:
+        # Docs pickled before the lexical index existed lack it, it gets rebuilt
+        state["__dict__"].setdefault("lexical_index", BM25Index())
+        state["__dict__"].setdefault("embedding_batcher", None)
+        state["__dict__"].setdefault("embedding_cache", None)
+        state["__pydantic_private__"] = {
+            "_removed_from_index": set(),
+            "_texts_version": 0,
+            "_index_watermarks": {},
+            "_rows_by_dockey": None,
+            "_rows_state": None,
+            "_dockeys_by_docname": {},
+            "_docname_suffixes": {},
+        } | (state.get("__pydantic_private__") or {})
+        super().__setstate__(state)
+
+    def save(
+        self, directory: str | os.PathLike, embedding_model_name: str | None = None
+    ) -> None:
+        """Save to a directory as a JSON table of documents and `.npy` text columns.
+
+        Pickling serializes every `Text` with a nested copy of its document and its
+        embedding as a list of floats. Instead, texts and names are saved as UTF-8
+        buffers delimited by offsets, each text references its document by position
+        in the table, and embeddings are saved as one float32 matrix, so `load` can
+        memory-map them. A `NumpyVectorStore` (or subclass) texts index is saved
+        alongside with its configuration, referencing these text columns when its
+        texts match them. Other texts indexes load as a `NumpyVectorStore` and the
+        lexical index is rebuilt, both at retrieval. The embedding batcher and cache
+        aren't saved.
+
+        Args:
+            directory: Directory to save to.
+            embedding_model_name: Optional name of the model that embedded the texts,
+                saved with the texts index for `load` to check.
+        """
+        chunks = (
+            self.texts if isinstance(self.texts, ChunkStore) else ChunkStore(self.texts)
+        )
+        # The collection's documents come first, then any other texts' documents
+        doc_table = list(self.docs.values())
+        doc_positions = {doc.dockey: i for i, doc in enumerate(doc_table)}
+        for doc in chunks.docs:
+            if doc.dockey not in doc_positions:
+                doc_positions[doc.dockey] = len(doc_table)
+                doc_table.append(doc)
+        columns = chunks.columns(include_embeddings=True)
+        columns["doc_indices"] = np.array(
+            [doc_positions[doc.dockey] for doc in chunks.docs], dtype=np.int64
+        )[columns["doc_indices"]]
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / self.EMBEDDINGS_FILENAME, columns.pop("embeddings"))
+        for name, column in columns.items():
+            np.save(directory / self.CHUNKS_FILENAME.format(name), column)
+        save_texts_index = isinstance(self.texts_index, NumpyVectorStore)
+        n_indexed_rows = 0
+        index_shares_texts = False
+        if not save_texts_index:
+            logger.warning(
+                f"Not saving the {type(self.texts_index).__name__} texts index, the"
+                f" loaded collection will rebuild a {NumpyVectorStore.__name__}."
+            )
+        else:
+            self.texts_index.compact()  # Removed rows aren't saved
+            index_shares_texts = self._texts_match_columns(
+                self.texts_index.texts, columns, doc_positions
+            )
+            # So a loaded collection needn't check the indexed rows' hashes again
+            last = self._index_watermarks.get("texts")
+            if last is not None and last[:3] == (
+                self.texts,
+                self.texts_index,
+                self._texts_version,
+            ):
+                n_indexed_rows = (
+                    last[3] if last[4] == len(self.texts_index.texts_hashes) else 0
+                )
+            self.texts_index.save(
+                directory / self.TEXTS_INDEX_DIRNAME,
+                embedding_model_name=embedding_model_name,
+                save_texts=not index_shares_texts,
+            )
+        # Written last, so a partially saved collection fails to load
+        (directory / self.METADATA_FILENAME).write_text(
+            json.dumps(
+                {
+                    "format_version": self.FORMAT_VERSION,
+                    "id": str(self.id),
+                    "name": self.name,
+                    "n_docs": len(self.docs),
+                    "docs": [
+                        doc.model_dump(mode="json", exclude={"embedding"})
+                        for doc in doc_table
+                    ],
+                    "docnames": sorted(self.docnames),
+                    "n_texts": len(chunks),
+                    "texts_type": type(self.texts).__name__,
+                    "texts_index": save_texts_index,
+                    "texts_index_shares_texts": index_shares_texts,
+                    "n_indexed_rows": n_indexed_rows,
+                    "deleted_dockeys": list(self.deleted_dockeys),
+                    "removed_from_index": list(self._removed_from_index),
+                }
+            )
+        )
+
+    @classmethod
+    def load(
+        cls,
+        directory: str | os.PathLike,
+        mmap: bool = True,
+        embedding_model_name: str | None = None,
+    ) -> Self:
+        """Load a collection previously written by `save`.
+
+        Args:
+            directory: Directory the collection was saved to.
+            mmap: Opt-out flag to read the embeddings matrix and texts' columns into
+                memory, instead of memory-mapping them read-only. Adding texts or
+                embeddings copies the memory-mapped columns into memory.
+            embedding_model_name: Optional name of the model that will embed queries,
+                to check against the name the texts index was saved with (if any).
+
+        Returns:
+            The loaded collection, whose texts are a `ChunkStore` of the texts'
+                columns if saved from a `ChunkStore`, otherwise a list of `Text`s.
+        """
+        directory = Path(directory)
+        data = json.loads((directory / cls.METADATA_FILENAME).read_text())
+        if data["format_version"] != cls.FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported format version {data['format_version']} in {directory},"
+                f" expected {cls.FORMAT_VERSION}."
+            )
+        doc_table = [DOC_ADAPTER.validate_python(d) for d in data["docs"]]
+        # Empty arrays can't be memory-mapped
+        mmap_mode = "r" if mmap and data["n_texts"] else None
+        columns = {
+            name: np.load(
+                directory / cls.CHUNKS_FILENAME.format(name), mmap_mode=mmap_mode
+            )
+            for name in cls.CHUNKS_COLUMNS
+        }
+        columns["embeddings"] = np.load(
+            directory / cls.EMBEDDINGS_FILENAME, mmap_mode=mmap_mode
+        )
+        texts: ChunkStore | list[Text] = ChunkStore.from_columns(columns, doc_table)
+        if data["texts_type"] != ChunkStore.__name__:
+            texts = list(texts)
+        docs = cls(
+            id=UUID(data["id"]),
+            name=data["name"],
+            docs={doc.dockey: doc for doc in doc_table[: data["n_docs"]]},
+            texts=texts,
+            docnames=set(data["docnames"]),
+            texts_index=(
+                NumpyVectorStore.load(
+                    directory / cls.TEXTS_INDEX_DIRNAME,
+                    mmap=mmap,
+                    embedding_model_name=embedding_model_name,
+                    # A separate store viewing the same columns, as each copies the
+                    # columns into memory once it's added to
+                    texts=(
+                        ChunkStore.from_columns(
+                            columns, doc_table, store_embeddings=False
+                        )
+                        if data.get("texts_index_shares_texts")
+                        else None
+                    ),
+                )
+                if data["texts_index"]
+                else NumpyVectorStore()
+            ),
+            deleted_dockeys=set(data["deleted_dockeys"]),
+        )
+        docs._removed_from_index = set(data["removed_from_index"])
+        if n_indexed_rows := data.get("n_indexed_rows"):
+            docs._index_watermarks["texts"] = (
+                docs.texts,
+                docs.texts_index,
+                docs._texts_version,
+                n_indexed_rows,
+                len(docs.texts_index.texts_hashes),
+            )
+        return docs
+
+    @staticmethod
+    def _texts_match_columns(
+        texts: Sequence[Embeddable],
+        columns: dict[str, np.ndarray],
+        doc_positions: dict[DocKey, int],
+    ) -> bool:
+        """Check if the texts are the rows of the columns, as saved by `save`."""
+        if isinstance(texts, ChunkStore):
+            chunks = texts
+        elif all(isinstance(t, Text) for t in texts):
+            chunks = ChunkStore(cast("list[Text]", texts), store_embeddings=False)
+        else:
+            return False
+        if len(chunks) != len(columns["doc_indices"]):
+            return False
+        texts_columns = chunks.columns()
+        texts_columns["doc_indices"] = np.array(
+            [doc_positions.get(doc.dockey, -1) for doc in chunks.docs], dtype=np.int64
+        )[texts_columns["doc_indices"]]
+        return all(
+            np.array_equal(column, columns[name])
+            for name, column in texts_columns.items()
         )
 
     def clear_docs(self) -> None:
-        self.texts = []
+        self._texts_version += 1
+        if isinstance(self.texts, ChunkStore):
+            self.texts.clear()
+        else:
+            self.texts = []
         self.docs = {}
         self.docnames = set()
+        self._dockeys_by_docname = {}
+        self._docname_suffixes = {}
         self.texts_index.clear()
+        self.lexical_index.clear()
 
     def _get_unique_name(self, docname: str) -> str:
         """Create a unique name given proposed name."""
-        suffix = ""
+        suffix = self._docname_suffixes.get(docname, "")
         while docname + suffix in self.docnames:
             # move suffix to next letter
             suffix = "a" if not suffix else chr(ord(suffix) + 1)
-        docname += suffix
-        return docname
+        self._docname_suffixes[docname] = suffix
+        return docname + suffix
+
+    def _doc_rows(self) -> dict[DocKey, range] | None:
+        """Get each document's rows of texts, or None if they're not contiguous."""
+        if (
+            self._rows_state is None
+            or self._rows_state[0] is not self.texts
+            or self._rows_state[1:] != (len(self.texts), self._texts_version)
+        ):
+            # Texts were changed outside of Docs (or loaded), so rebuild the rows
+            rows_by_dockey: dict[DocKey, range] = {}
+            row_doc = (
+                self.texts.doc
+                if isinstance(self.texts, ChunkStore)
+                else lambda i: self.texts[i].doc
+            )
+            for i in range(len(self.texts)):
+                dockey = row_doc(i).dockey
+                rows = rows_by_dockey.get(dockey)
+                if rows is not None and rows.stop != i:
+                    self._rows_by_dockey = None
+                    break
+                rows_by_dockey[dockey] = range(i if rows is None else rows.start, i + 1)
+            else:
+                self._rows_by_dockey = rows_by_dockey
+            self._rows_state = self.texts, len(self.texts), self._texts_version
+        return self._rows_by_dockey
+
+    def _dockey_of(self, docname: str) -> DocKey | None:
+        """Get the key of the document with the input docname, if any."""
+        for attempt in range(2):
+            if attempt or len(self._dockeys_by_docname) != len(self.docs):
+                # Docs were changed outside of Docs (or loaded), so rebuild the map
+                self._dockeys_by_docname = {
+                    doc.docname: dockey for dockey, doc in self.docs.items()
+                }
+            dockey = self._dockeys_by_docname.get(docname)
+            if dockey is None:
+                return None
+            doc = self.docs.get(dockey)
+            if doc is not None and doc.docname == docname:
+                return dockey
+        return None
+
+    def get_doc_texts(self, dockey: DocKey) -> list[Text]:
+        """Get the texts of the document with the input key."""
+        rows_by_dockey = self._doc_rows()
+        if rows_by_dockey is None:
+            return [t for t in self.texts if t.doc.dockey == dockey]
+        return self._texts_at(rows_by_dockey.get(dockey, range(0)))
 
     def add_file(
         self,
@@ -248,7 +599,7 @@ class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
             )
         )
 
-    async def aadd(  # noqa: PLR0912
+    async def aadd(
         self,
         path: str | os.PathLike,
         citation: str | None = None,
@@ -264,7 +615,47 @@ class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
     ) -> str | None:
         """Add a document to the collection."""
         all_settings = get_settings(settings)
+        texts, doc, docname = await self._aprepare_doc(
+            path,
+            citation=citation,
+            docname=docname,
+            dockey=dockey,
+            title=title,
+            doi=doi,
+            authors=authors,
+            settings=all_settings,
+            llm_model=llm_model,
+            **kwargs,
+        )
+        if await self.aadd_texts(texts, doc, all_settings, embedding_model):
+            return docname
+        return None
+
+    async def _aprepare_doc(  # noqa: PLR0912
+        self,
+        path: str | os.PathLike,
+        citation: str | None = None,
+        docname: str | None = None,
+        dockey: DocKey | None = None,
+        title: str | None = None,
+        doi: str | None = None,
+        authors: list[str] | None = None,
+        settings: MaybeSettings = None,
+        llm_model: LLMModel | None = None,
+        parse_executor: Executor | None = None,
+        stats: IngestionStats | None = None,
+        **kwargs,
+    ) -> tuple[list[Text], Doc, str]:
+        """Parse and chunk a document once, then infer its metadata, without adding it.
+
+        Returns:
+            Three-tuple of the chunked texts, the document, and its docname before
+                any upgrade from metadata.
+        """
+        all_settings = get_settings(settings)
         parse_config = all_settings.parsing
+        if stats is None:
+            stats = IngestionStats()
         dockey_is_content_hash = False
         if dockey is None:
             # md5 sum of file contents (not path!)
@@ -272,26 +663,47 @@ class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
             dockey_is_content_hash = True
         if llm_model is None:
             llm_model = all_settings.get_llm()
-        if citation is None:
-            # Peek first chunk
+        # Parse and chunk once, under a placeholder doc swapped out at the end
+        with stats.time_stage("parse"):
             texts = await read_doc(
                 path,
-                Doc(docname="", citation="", dockey=dockey),  # Fake doc
+                Doc(docname="", citation="", dockey=dockey),
                 chunk_chars=parse_config.chunk_size,
                 overlap=parse_config.overlap,
                 page_size_limit=parse_config.page_size_limit,
                 use_block_parsing=parse_config.pdfs_use_block_parsing,
                 parse_pdf=parse_config.parse_pdf,
+                executor=parse_executor,
             )
-            if not texts or not texts[0].text.strip():
-                raise ValueError(f"Could not read document {path}. Is it empty?")
-            result = await llm_model.call_single(
-                messages=[
-                    Message(
-                        content=parse_config.citation_prompt.format(text=texts[0].text)
-                    ),
-                ],
+        if citation is None and (not texts or not texts[0].text.strip()):
+            raise ValueError(f"Could not read document {path}. Is it empty?")
+        # loose check to see if document was loaded
+        if (
+            not texts
+            or len(texts[0].text) < 10  # noqa: PLR2004
+            or (
+                not parse_config.disable_doc_valid_check
+                # Use the first few text chunks to avoid potential issues with
+                # title page parsing in the first chunk
+                and not maybe_is_text("".join(text.text for text in texts[:5]))
             )
+        ):
+            raise ValueError(
+                f"This does not look like a text document: {path}. Pass disable_check"
+                " to ignore this error."
+            )
+        if citation is None:
+            # Peek first chunk
+            with stats.time_stage("citation"):
+                result = await llm_model.call_single(
+                    messages=[
+                        Message(
+                            content=parse_config.citation_prompt.format(
+                                text=texts[0].text
+                            )
+                        ),
+                    ],
+                )
             citation = cast("str", result.text)
             if (
                 len(citation) < 3  # noqa: PLR2004
@@ -315,9 +727,10 @@ class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
                     ),
                 ),
             ]
-            result = await llm_model.call_single(
-                messages=messages,
-            )
+            with stats.time_stage("structured_citation"):
+                result = await llm_model.call_single(
+                    messages=messages,
+                )
             # This code below tries to isolate the JSON
             # based on observed messages from LLMs
             # it does so by isolating the content between
@@ -373,37 +786,134 @@ class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
                     if d not in {"dockey", "doc_id"}
                 }
 
-            doc = await metadata_client.upgrade_doc_to_doc_details(
-                doc, **(query_kwargs | kwargs)
-            )
+            with stats.time_stage("metadata"):
+                doc = await metadata_client.upgrade_doc_to_doc_details(
+                    doc, **(query_kwargs | kwargs)
+                )
 
-        texts = await read_doc(
-            path,
-            doc,
-            chunk_chars=parse_config.chunk_size,
-            overlap=parse_config.overlap,
-            page_size_limit=parse_config.page_size_limit,
-            use_block_parsing=parse_config.pdfs_use_block_parsing,
-            parse_pdf=parse_config.parse_pdf,
-        )
-        # loose check to see if document was loaded
-        if (
-            not texts
-            or len(texts[0].text) < 10  # noqa: PLR2004
-            or (
-                not parse_config.disable_doc_valid_check
-                # Use the first few text chunks to avoid potential issues with
-                # title page parsing in the first chunk
-                and not maybe_is_text("".join(text.text for text in texts[:5]))
-            )
-        ):
+        # Chunks' names start with their docname, which was empty until now
+        for text in texts:
+            text.doc = doc
+            text.name = doc.docname + text.name
+        return texts, doc, docname
+
+    async def aadd_many(
+        self,
+        paths: Iterable[str | os.PathLike],
+        docnames: Iterable[str | None] | None = None,
+        concurrency: int = 8,
+        embedding_batch_size: int = 256,
+        settings: MaybeSettings = None,
+        llm_model: LLMModel | None = None,
+        embedding_model: EmbeddingModel | None = None,
+        parse_executor: Executor | None = None,
+        stats: IngestionStats | None = None,
+        **kwargs,
+    ) -> list[str | None]:
+        """Add many documents, pipelining the stages of `aadd` across documents.
+
+        Up to `concurrency` documents are in flight at once, overlapping their
+        parsing, LLM calls and metadata lookups. As documents are read, their texts
+        are embedded together in batches, and then added to the collection.
+
+        Args:
+            paths: Paths of the documents, whose metadata is inferred like `aadd`.
+            docnames: Optional docname of each document, aligned with the paths,
+                where None infers a docname like `aadd`.
+            concurrency: Max number of documents in flight.
+            embedding_batch_size: Number of read documents' texts at which they're
+                embedded together, in one request.
+            settings: Optional settings, for parsing and the models.
+            llm_model: Optional LLM model override, for the citations.
+            embedding_model: Optional embedding model override.
+            parse_executor: Optional executor to parse documents in. Defaults to a
+                process pool of up to `concurrency` workers, as parsing is CPU-bound
+                and PDF parsers may not be thread-safe.
+            stats: Optional counters to accumulate each stage's throughput into.
+            kwargs: Keyword arguments for the metadata lookup, like `aadd`.
+
+        Returns:
+            Name of each added document, aligned with the paths, or None if it
+                wasn't added (e.g. it failed to be read, or was already added).
+        """
+        all_settings = get_settings(settings)
+        if llm_model is None:
+            llm_model = all_settings.get_llm()
+        if not all_settings.parsing.defer_embedding and not embedding_model:
+            embedding_model = all_settings.get_embedding_model()
+        if stats is None:
+            stats = IngestionStats()
+        paths = list(paths)
+        docnames = [None] * len(paths) if docnames is None else list(docnames)
+        if len(docnames) != len(paths):
             raise ValueError(
-                f"This does not look like a text document: {path}. Pass disable_check"
-                " to ignore this error."
+                f"Got {len(docnames)} docnames for {len(paths)} paths, expected one"
+                " per path."
             )
-        if await self.aadd_texts(texts, doc, all_settings, embedding_model):
-            return docname
-        return None
+        added_docnames: list[str | None] = [None] * len(paths)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def prepare(i: int) -> tuple[int, list[Text], Doc] | None:
+            async with semaphore:
+                try:
+                    texts, doc, _ = await self._aprepare_doc(
+                        paths[i],
+                        docname=docnames[i],
+                        settings=all_settings,
+                        llm_model=llm_model,
+                        parse_executor=executor,
+                        stats=stats,
+                        **kwargs,
+                    )
+                except Exception:
+                    logger.exception(f"Failed to read document {paths[i]}.")
+                    return None
+            for doc_filter in all_settings.parsing.doc_filters or []:
+                if not doc.matches_filter_criteria(doc_filter):
+                    return None  # Don't embed texts that won't be added
+            return i, texts, doc
+
+        ready: list[tuple[int, list[Text], Doc]] = []
+
+        async def add_ready() -> None:
+            # Drop already added or repeated documents, so their texts aren't embedded
+            dockeys: set[DocKey] = set()
+            to_add: list[tuple[int, list[Text], Doc]] = []
+            for i, texts, doc in ready:
+                if doc.dockey not in self.docs and doc.dockey not in dockeys:
+                    dockeys.add(doc.dockey)
+                    to_add.append((i, texts, doc))
+            to_embed = [
+                t for _, texts, _ in to_add for t in texts if t.embedding is None
+            ]
+            if to_embed and embedding_model:
+                with stats.time_stage("embed", n_items=len(to_embed)):
+                    embeddings = await self._embed_documents(
+                        embedding_model, [t.text for t in to_embed]
+                    )
+                for t, t_embedding in zip(to_embed, embeddings, strict=True):
+                    t.embedding = t_embedding
+            for i, texts, doc in to_add:
+                if await self.aadd_texts(texts, doc, all_settings, embedding_model):
+                    added_docnames[i] = doc.docname
+            ready.clear()
+
+        executor = parse_executor or ProcessPoolExecutor(
+            max_workers=min(concurrency, os.cpu_count() or 1)
+        )
+        try:
+            for prepared in asyncio.as_completed(
+                [prepare(i) for i in range(len(paths))]
+            ):
+                if (result := await prepared) is not None:
+                    ready.append(result)
+                if sum(len(texts) for _, texts, _ in ready) >= embedding_batch_size:
+                    await add_ready()
+            await add_ready()
+        finally:
+            if parse_executor is None:
+                executor.shutdown()
+        return added_docnames
 
     def add_texts(
         self,
@@ -459,7 +969,7 @@ class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
         if embedding_model and texts[0].embedding is None:
             for t, t_embedding in zip(
                 texts,
-                await embedding_model.embed_documents(texts=[t.text for t in texts]),
+                await self._embed_documents(embedding_model, [t.text for t in texts]),
                 strict=True,
             ):
                 t.embedding = t_embedding
@@ -470,15 +980,59 @@ class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
                 t.name = t.name.replace(doc.docname, new_docname)
             doc.docname = new_docname
         # 3. Update self
-        # NOTE: we defer adding texts to the texts index to retrieval time
-        # (e.g. `self.texts_index.add_texts_and_embeddings(texts)`)
+        # NOTE: we defer adding texts to the texts and lexical indexes to retrieval
+        # time (e.g. `self.texts_index.add_texts_and_embeddings(texts)`)
         if doc.docname and doc.dockey:
-            self.docs[doc.dockey] = doc
-            self.texts += texts
-            self.docnames.add(doc.docname)
+            self._append_texts(doc, texts)
             return True
         return False
 
+    def _append_texts(
+        self, doc: Doc, texts: Sequence[Text], indexed: bool = False
+    ) -> None:
+        """Append the input document's texts, adding the document if it's new.
+
+        Args:
+            doc: Document of the texts.
+            texts: Texts to append, possibly none to only add the document.
+            indexed: Flag for if the texts are already in the texts index (e.g. they
+                were loaded from it), to add their hashes to the index.
+        """
+        rows_by_dockey = self._doc_rows()
+        start = len(self.texts)
+        # If the texts index was caught up with the texts, it stays so with these
+        last = self._index_watermarks.get("texts")
+        caught_up = indexed and (
+            not start
+            or (
+                last is not None
+                and last[0] is self.texts
+                and last[1] is self.texts_index
+                and last[2:]
+                == (self._texts_version, start, len(self.texts_index.texts_hashes))
+            )
+        )
+        if doc.dockey not in self.docs:
+            self.docs[doc.dockey] = doc
+            self.docnames.add(doc.docname)
+            self._dockeys_by_docname[doc.docname] = doc.dockey
+        self.texts += texts
+        if rows_by_dockey is not None:
+            rows = rows_by_dockey.get(doc.dockey, range(start, start))
+            if rows.stop == start:
+                rows_by_dockey[doc.dockey] = range(rows.start, len(self.texts))
+            else:  # The document's rows are no longer contiguous
+                self._rows_by_dockey = None
+        self._rows_state = self.texts, len(self.texts), self._texts_version
+        if indexed:
+            self.texts_index.texts_hashes.update(hash(t) for t in texts)
+        if caught_up:
+            self._mark_indexed(
+                "texts",
+                self.texts_index,
+                (self.texts, self.texts_index, self._texts_version, len(self.texts), 0),
+            )
+
     def delete(
         self,
         name: str | None = None,
@@ -490,28 +1044,183 @@ class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
         name = docname if name is None else name
 
         if name is not None:
-            doc = next((doc for doc in self.docs.values() if doc.docname == name), None)
-            if doc is None:
+            dockey = self._dockey_of(name)
+            if dockey is None:
                 return
-            if doc.docname and doc.dockey:
-                self.docnames.remove(doc.docname)
-                dockey = doc.dockey
-        del self.docs[dockey]
+            self.docnames.remove(name)
+        doc = self.docs.pop(dockey)
+        if self._dockeys_by_docname.get(doc.docname) == dockey:
+            del self._dockeys_by_docname[doc.docname]
         self.deleted_dockeys.add(dockey)
-        self.texts = list(filter(lambda x: x.doc.dockey != dockey, self.texts))
+        # Removal from the texts index is deferred to retrieval, like indexing
+        self._removed_from_index.discard(dockey)
+        rows_by_dockey = self._doc_rows()
+        self._texts_version += 1
+        if rows_by_dockey is None:
+            if isinstance(self.texts, ChunkStore):
+                self.texts.remove_docs({dockey})
+            else:
+                self.texts = list(filter(lambda x: x.doc.dockey != dockey, self.texts))
+            return
+        removed = rows_by_dockey.pop(dockey, range(0))
+        if isinstance(self.texts, ChunkStore):
+            self.texts.keep_rows(
+                [*range(removed.start), *range(removed.stop, len(self.texts))]
+            )
+        else:
+            self.texts = self.texts[: removed.start] + self.texts[removed.stop :]
+        # Shift the rows of the documents after the removed rows
+        for key, rows in rows_by_dockey.items():
+            if rows.start >= removed.stop:
+                rows_by_dockey[key] = range(
+                    rows.start - len(removed), rows.stop - len(removed)
+                )
+        self._rows_state = self.texts, len(self.texts), self._texts_version
+
+    def _unindexed_rows(
+        self, index_name: str, index: VectorStore | BM25Index
+    ) -> tuple[list[int], tuple[Any, Any, int, int, int]]:
+        """Get the rows of texts whose hashes aren't in the input index's hashes.
+
+        Rows below the index's watermark are skipped, if neither the texts nor the
+        index changed other than by appending since the watermark was made.
+
+        Returns:
+            Two-tuple of the unindexed rows, and the pending watermark to pass to
+                `_mark_indexed` once these rows are indexed.
+        """
+        watermark = (self.texts, index, self._texts_version, len(self.texts), 0)
+        start = 0
+        if (last := self._index_watermarks.get(index_name)) is not None:
+            texts, last_index, version, n_rows, n_indexed = last
+            if (
+                texts is self.texts
+                and last_index is index
+                and version == self._texts_version
+                and n_rows <= len(self.texts)
+                and n_indexed == len(index.texts_hashes)
+            ):
+                start = n_rows
+        if start == len(self.texts):
+            return [], watermark
+        indexed_hashes = (
+            index.sync_texts_hashes()
+            if isinstance(index, VectorStore)
+            else index.texts_hashes
+        )
+        if isinstance(self.texts, ChunkStore):
+            # Check hashes by row, to only materialize the new texts
+            row_hash = self.texts.row_hash
+            rows = [
+                i
+                for i in range(start, len(self.texts))
+                if row_hash(i) not in indexed_hashes
+            ]
+        else:
+            rows = [
+                i
+                for i in range(start, len(self.texts))
+                if hash(self.texts[i]) not in indexed_hashes
+            ]
+        return rows, watermark
+
+    def _mark_indexed(
+        self,
+        index_name: str,
+        index: VectorStore | BM25Index,
+        watermark: tuple[Any, Any, int, int, int],
+    ) -> None:
+        """Record the index is built up to the input pending watermark."""
+        texts, _, version, n_rows, _ = watermark
+        # Texts removed meanwhile shifted the rows, so the watermark is stale
+        if texts is self.texts and version == self._texts_version:
+            self._index_watermarks[index_name] = (
+                texts,
+                index,
+                version,
+                n_rows,
+                len(index.texts_hashes),
+            )
+
+    def _texts_at(self, rows: Sequence[int]) -> list[Text]:
+        if isinstance(self.texts, ChunkStore):
+            return self.texts.materialize(rows)
+        return [self.texts[i] for i in rows]
+
+    async def _embed_documents(
+        self, embedding_model: EmbeddingModel, texts: list[str]
+    ) -> list[list[float]]:
+        if self.embedding_cache is not None:
+            return await self.embedding_cache.embed_documents(
+                embedding_model,
+                texts,
+                embed=lambda misses: self._embed_uncached(embedding_model, misses),
+            )
+        return await self._embed_uncached(embedding_model, texts)
+
+    async def _embed_uncached(
+        self, embedding_model: EmbeddingModel, texts: list[str]
+    ) -> list[list[float]]:
+        if self.embedding_batcher is not None:
+            return await self.embedding_batcher.embed_documents(embedding_model, texts)
+        return await embedding_model.embed_documents(texts=texts)
+
+    def _unremoved_dockeys(self) -> set[DocKey]:
+        """Get the deleted documents whose texts the texts index may still return."""
+        return self.deleted_dockeys - self._removed_from_index
 
     async def _build_texts_index(self, embedding_model: EmbeddingModel) -> None:
-        texts = [t for t in self.texts if t not in self.texts_index]
+        for dockey in self._unremoved_dockeys():
+            try:
+                await self.texts_index.remove_doc(dockey)
+            except NotImplementedError:
+                break  # Searches exclude the deleted documents instead
+            # Keep the lexical index in step, to exclude the same documents from both
+            self.lexical_index.remove_doc(dockey)
+            self._removed_from_index.add(dockey)
+        index = self.texts_index
+        rows, watermark = self._unindexed_rows("texts", index)
+        texts = self._texts_at(rows)
         # For any embeddings we are supposed to lazily embed, embed them now
-        to_embed = [t for t in texts if t.embedding is None]
+        to_embed = [
+            (i, t) for i, t in zip(rows, texts, strict=True) if t.embedding is None
+        ]
         if to_embed:
-            for t, t_embedding in zip(
-                to_embed,
-                await embedding_model.embed_documents(texts=[t.text for t in to_embed]),
-                strict=True,
-            ):
-                t.embedding = t_embedding
-        await self.texts_index.add_texts_and_embeddings(texts)
+            embeddings = await self._embed_documents(
+                embedding_model, [t.text for _, t in to_embed]
+            )
+            if isinstance(self.texts, ChunkStore):
+                # Also sets the embeddings on the materialized texts
+                self.texts.set_embeddings([i for i, _ in to_embed], embeddings)
+            else:
+                for (_, t), t_embedding in zip(to_embed, embeddings, strict=True):
+                    t.embedding = t_embedding
+        await index.add_texts_and_embeddings(texts)
+        self._mark_indexed("texts", index, watermark)
+
+    def _build_lexical_index(self) -> None:
+        # Catch up on texts not added through `aadd_texts`, e.g. after loading
+        index = self.lexical_index
+        rows, watermark = self._unindexed_rows("lexical", index)
+        index.add_texts(self._texts_at(rows))
+        self._mark_indexed("lexical", index, watermark)
+
+    def _fuse_lexical(
+        self, query: str, matches: list[Text], k: int, settings: Settings
+    ) -> list[Text]:
+        """Fuse dense matches with the top k lexical matches, if enabled."""
+        if not settings.texts_index_lexical:
+            return matches[:k]
+        lexical_matches, _ = self.lexical_index.search(
+            query, k, exclude_dockeys=self._unremoved_dockeys()
+        )
+        return reciprocal_rank_fusion(
+            [matches, cast("list[Text]", lexical_matches)],
+            k=k,
+            rrf_k=settings.texts_index_rrf_k,
+            # Texts' hashes ignore their document, so key by it and the chunk name
+            key=lambda t: (t.doc.dockey, t.name),
+        )
 
     async def retrieve_texts(
         self,
@@ -520,31 +1229,86 @@ class Docs(BaseModel):  # noqa: PLW1641  # TODO: add __hash__
         settings: MaybeSettings = None,
         embedding_model: EmbeddingModel | None = None,
         partitioning_fn: Callable[[Embeddable], int] | None = None,
+        query_embedding_cache: QueryEmbeddingCache | None = None,
     ) -> list[Text]:
-        """Perform MMR search with the input query on the internal index."""
+        """Perform MMR search with the input query on the internal index.
+
+        Args:
+            query: Query to search for.
+            k: Number of texts to retrieve.
+            settings: Optional settings, for the MMR lambda and embedding model.
+            embedding_model: Optional embedding model override.
+            partitioning_fn: Optional function to partition texts into groups,
+                interleaving each group's results.
+            query_embedding_cache: Optional cache of query embeddings, which stays
+                attached to the internal index to be shared by later retrievals.
+
+        Returns:
+            Up to k texts, excluding those of deleted documents.
+        """
         settings = get_settings(settings)
         if embedding_model is None:
             embedding_model = settings.get_embedding_model()
 
         # TODO: should probably happen elsewhere
         self.texts_index.mmr_lambda = settings.texts_index_mmr_lambda
+        if query_embedding_cache is not None:
+            self.texts_index.query_embedding_cache = query_embedding_cache
 
         await self._build_texts_index(embedding_model)
-        _k = k + len(self.deleted_dockeys)
+        # Deleted documents' texts were removed from the index, or if the index
+        # doesn't support removal, it filters them out within its search
         matches: list[Text] = cast(
             "list[Text]",
             (
                 await self.texts_index.max_marginal_relevance_search(
                     query,
-                    k=_k,
-                    fetch_k=2 * _k,
+                    k=k,
+                    fetch_k=2 * k,
                     embedding_model=embedding_model,
                     partitioning_fn=partitioning_fn,
+                    exclude_dockeys=self._unremoved_dockeys(),
                 )
             )[0],
         )
-        matches = [m for m in matches if m.doc.dockey not in self.deleted_dockeys]
-        return matches[:k]
+        if partitioning_fn is not None:
+            return matches[:k]
+        if settings.texts_index_lexical:
+            self._build_lexical_index()
+        return self._fuse_lexical(query, matches, k, settings)
+
+    async def retrieve_texts_many(
+        self,
+        queries: Sequence[str],
+        k: int,
+        settings: MaybeSettings = None,
+        embedding_model: EmbeddingModel | None = None,
+    ) -> list[list[Text]]:
+        """Perform `retrieve_texts` for many queries, embedding and scoring them together.
+
+        Returns:
+            List of the same texts `retrieve_texts` returns, one per query.
+        """
+        settings = get_settings(settings)
+        if embedding_model is None:
+            embedding_model = settings.get_embedding_model()
+
+        self.texts_index.mmr_lambda = settings.texts_index_mmr_lambda
+
+        await self._build_texts_index(embedding_model)
+        results = await self.texts_index.batch_max_marginal_relevance_search(
+            queries,
+            k=k,
+            fetch_k=2 * k,
+            embedding_model=embedding_model,
+            exclude_dockeys=self._unremoved_dockeys(),
+        )
+        if settings.texts_index_lexical:
+            self._build_lexical_index()
+        return [
+            self._fuse_lexical(query, cast("list[Text]", list(matches)), k, settings)
+            for query, (matches, _) in zip(queries, results, strict=True)
+        ]
 
     def get_evidence(
         self,
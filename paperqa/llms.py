@@ -1,18 +1,41 @@
 import asyncio
+import hashlib
 import itertools
+import json
 import logging
+import os
+import re
+import sqlite3
 import threading
+import time
 import uuid
+import warnings
 from abc import ABC, abstractmethod
+from array import array
+from collections import Counter, OrderedDict, defaultdict
 from collections.abc import (
+    AsyncIterator,
+    Awaitable,
     Callable,
+    Collection,
+    Hashable,
     Iterable,
     Sequence,
     Sized,
 )
-from typing import TYPE_CHECKING, Any, cast
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    ClassVar,
+    Literal,
+    Self,
+    TypeVar,
+    cast,
+)
 
 import numpy as np
+import tiktoken
 from lmi import (
     Embeddable,
     EmbeddingModel,
@@ -26,11 +49,13 @@ from pydantic import (
     BaseModel,
     ConfigDict,
     Field,
+    PrivateAttr,
     model_validator,
 )
 from typing_extensions import override
 
-from paperqa.types import Doc, Text
+from paperqa.types import DOC_ADAPTER, ChunkStore, Doc, Text
+from paperqa.utils import pqa_directory
 
 if TYPE_CHECKING:
     from qdrant_client.http.models import Record
@@ -52,6 +77,786 @@ def cosine_similarity(a, b):
     return a @ b.T / norm_product
 
 
+def l2_normalize(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize the last axis of the input array in place, leaving zero vectors."""
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+    return embeddings
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Get the indices of the k highest scores, sorted in descending order of score.
+
+    This partially selects the k winners before sorting only them, matching the order
+    of a full stable sort (ties broken by lower index first) in O(n + k log k).
+    """
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    if k < len(scores):
+        kth_score = -np.partition(-scores, k - 1)[k - 1]
+        # Keep all ties with the kth score so ties resolve by index
+        candidates = np.flatnonzero(scores >= kth_score)
+    else:
+        candidates = np.arange(len(scores))
+    # Sort by descending score, then ascending index
+    return candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+
+
+def maximal_marginal_relevance(
+    embeddings: np.ndarray, scores: np.ndarray, k: int, mmr_lambda: float
+) -> list[int]:
+    """Select k indices by Maximal Marginal Relevance (MMR).
+
+    Each candidate's max similarity to the selected candidates is kept up to date
+    with one row of the similarity matrix per selection, so selecting is
+    O(k * n) after the single matrix product, rather than O(k^2 * n).
+
+    Args:
+        embeddings: L2-normalized embeddings of the candidates.
+        scores: Candidates' similarity to the query, sorted in descending order.
+        k: Number of indices to select.
+        mmr_lambda: MMR lambda value, trading off relevance and diversity.
+
+    Returns:
+        Selected indices into the candidates, in order of selection.
+    """
+    similarity_matrix = embeddings @ embeddings.T
+    relevance = mmr_lambda * scores
+    diversity_weight = 1 - mmr_lambda
+
+    max_sim_to_selected = similarity_matrix[0].copy()
+    selectable = np.ones(len(embeddings), dtype=bool)
+    selectable[0] = False
+    selected_indices = [0]
+
+    while len(selected_indices) < min(k, len(embeddings)):
+        mmr_scores = relevance - diversity_weight * max_sim_to_selected
+        mmr_scores[~selectable] = -np.inf  # Exclude already selected documents
+
+        max_mmr_index = int(mmr_scores.argmax())
+        selected_indices.append(max_mmr_index)
+        selectable[max_mmr_index] = False
+        # Similarities are symmetric, so the contiguous row equals the column
+        np.maximum(
+            max_sim_to_selected,
+            similarity_matrix[max_mmr_index],
+            out=max_sim_to_selected,
+        )
+
+    return selected_indices
+
+
+class QueryEmbeddingCache(BaseModel):
+    """Bounded LRU cache of query embeddings, to share across retrieval calls.
+
+    Entries are keyed by embedding model name, embedding mode, and query text.
+    """
+
+    max_size: int = Field(
+        default=1024, ge=1, description="Maximum number of query embeddings to keep."
+    )
+    hits: int = Field(default=0, description="Number of lookups that were cached.")
+    misses: int = Field(
+        default=0, description="Number of lookups that required embedding the query."
+    )
+    _cache: OrderedDict[tuple[str, str, str], np.ndarray] = PrivateAttr(
+        default_factory=OrderedDict
+    )
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        """Empty the cache and reset its counters."""
+        self._cache.clear()
+        self.hits = self.misses = 0
+
+    async def embed_query(
+        self,
+        query: str,
+        embedding_model: EmbeddingModel,
+        mode: EmbeddingModes = EmbeddingModes.QUERY,
+    ) -> np.ndarray:
+        """Get the input query's embedding, only calling the embedding model on a miss.
+
+        Returns:
+            Read-only embedding, copy it before modifying in place.
+        """
+        return (await self.embed_queries([query], embedding_model, mode))[0]
+
+    async def embed_queries(
+        self,
+        queries: Sequence[str],
+        embedding_model: EmbeddingModel,
+        mode: EmbeddingModes = EmbeddingModes.QUERY,
+    ) -> list[np.ndarray]:
+        """Get the input queries' embeddings, embedding all misses in one request.
+
+        Returns:
+            Read-only embeddings aligned with the queries.
+        """
+        embeddings: dict[str, np.ndarray] = {}
+        misses: list[str] = []
+        for query in queries:
+            key = embedding_model.name, mode.value, query
+            if query in embeddings or query in misses:
+                continue
+            try:
+                embeddings[query] = self._cache[key]
+            except KeyError:
+                self.misses += 1
+                misses.append(query)
+            else:
+                self.hits += 1
+                self._cache.move_to_end(key)
+
+        if misses:
+            embedding_model.set_mode(mode)
+            try:
+                new_embeddings = await embedding_model.embed_documents(misses)
+            finally:
+                embedding_model.set_mode(EmbeddingModes.DOCUMENT)
+            for query, new_embedding in zip(misses, new_embeddings, strict=True):
+                embedding = np.array(new_embedding)
+                embedding.flags.writeable = False
+                embeddings[query] = embedding
+                self._cache[embedding_model.name, mode.value, query] = embedding
+                if len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+        return [embeddings[q] for q in queries]
+
+
+class EmbeddingBatcher(BaseModel):
+    """Coalesces concurrent `embed_documents` calls into token-budgeted batches.
+
+    Texts pending from every caller (e.g. many documents added at once) are packed
+    in order into batches of at most `max_batch_tokens` tokens and
+    `max_batch_size` texts, and up to `max_concurrent_batches` batches are
+    embedded at once. A text above the token budget is embedded alone.
+    """
+
+    max_batch_tokens: int = Field(
+        default=100_000, ge=1, description="Maximum number of tokens per batch."
+    )
+    max_batch_size: int = Field(
+        default=2048, ge=1, description="Maximum number of texts per batch."
+    )
+    max_concurrent_batches: int = Field(
+        default=4, ge=1, description="Maximum number of batches embedded at once."
+    )
+    max_wait: float = Field(
+        default=0.01,
+        ge=0.0,
+        description=(
+            "Seconds pending texts wait for concurrent callers to add more texts,"
+            " before being packed into batches."
+        ),
+    )
+    n_batches: int = Field(default=0, description="Number of batches embedded.")
+    n_texts: int = Field(default=0, description="Number of texts embedded.")
+    n_tokens: int = Field(default=0, description="Number of tokens embedded.")
+    latency: float = Field(
+        default=0.0, description="Summed seconds of the batches' requests."
+    )
+    # Pending texts, their token counts and callers' futures, per embedding model
+    _pending: dict[
+        int, tuple[EmbeddingModel, list[tuple[str, int, asyncio.Future]]]
+    ] = PrivateAttr(default_factory=dict)
+    _flush_task: asyncio.Task | None = None
+    _semaphore: asyncio.Semaphore | None = None
+    _batch_tasks: set[asyncio.Task] = PrivateAttr(default_factory=set)
+
+    def __getstate__(self) -> dict[Any, Any]:
+        state = super().__getstate__()
+        # Pending work is bound to an event loop, so only the counters persist
+        state["__pydantic_private__"] = {
+            "_pending": {},
+            "_flush_task": None,
+            "_semaphore": None,
+            "_batch_tasks": set(),
+        }
+        return state
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.n_texts / self.n_batches if self.n_batches else 0.0
+
+    @property
+    def fill_ratio(self) -> float:
+        """Mean fraction of the token budget that batches used."""
+        if not self.n_batches:
+            return 0.0
+        return self.n_tokens / (self.n_batches * self.max_batch_tokens)
+
+    @property
+    def mean_latency(self) -> float:
+        return self.latency / self.n_batches if self.n_batches else 0.0
+
+    async def embed_documents(
+        self, embedding_model: EmbeddingModel, texts: Sequence[str]
+    ) -> list[list[float]]:
+        """Embed the input texts, in batches shared with concurrent callers."""
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        enc = tiktoken.get_encoding("cl100k_base")
+        futures = [loop.create_future() for _ in texts]
+        _, pending = self._pending.setdefault(
+            id(embedding_model), (embedding_model, [])
+        )
+        pending.extend(
+            zip(
+                texts,
+                (len(enc.encode_ordinary(t)) for t in texts),
+                futures,
+                strict=True,
+            )
+        )
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+        return list(await asyncio.gather(*futures))
+
+    def _pack(
+        self, items: list[tuple[str, int, asyncio.Future]]
+    ) -> list[list[tuple[str, int, asyncio.Future]]]:
+        """Split the items in order into batches within the token and size budgets."""
+        batches: list[list[tuple[str, int, asyncio.Future]]] = []
+        batch_tokens = 0
+        for item in items:
+            if (
+                not batches
+                or len(batches[-1]) >= self.max_batch_size
+                or batch_tokens + item[1] > self.max_batch_tokens
+            ):
+                batches.append([])
+                batch_tokens = 0
+            batches[-1].append(item)
+            batch_tokens += item[1]
+        return batches
+
+    async def _flush(self) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        # Texts added while waiting for a free batch slot join the next batches
+        while self._pending:
+            await asyncio.sleep(self.max_wait)
+            pending, self._pending = self._pending, {}
+            for embedding_model, items in pending.values():
+                for batch in self._pack(items):
+                    await self._semaphore.acquire()
+                    task = asyncio.create_task(
+                        self._embed_batch(embedding_model, batch)
+                    )
+                    # Hold a reference, so the task isn't garbage collected
+                    self._batch_tasks.add(task)
+                    task.add_done_callback(self._batch_tasks.discard)
+
+    async def _embed_batch(
+        self,
+        embedding_model: EmbeddingModel,
+        batch: list[tuple[str, int, asyncio.Future]],
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            results = list(
+                zip(
+                    batch,
+                    await embedding_model.embed_documents(
+                        texts=[text for text, _, _ in batch]
+                    ),
+                    strict=True,
+                )
+            )
+        except Exception as exc:
+            # Fail the batch's callers, instead of leaving them waiting
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            cast("asyncio.Semaphore", self._semaphore).release()
+        self.n_batches += 1
+        self.n_texts += len(batch)
+        self.n_tokens += sum(n_tokens for _, n_tokens, _ in batch)
+        self.latency += time.perf_counter() - start
+        for (_, _, future), embedding in results:
+            if not future.done():  # The caller may have been cancelled
+                future.set_result(embedding)
+
+
+class DiskEmbeddingCache(BaseModel):
+    """Persistent LRU cache of text embeddings, in a SQLite database.
+
+    Entries are keyed by embedding model name, a hash of the embedding model's
+    configuration, and a hash of the text, so identical chunks (e.g. across index
+    rebuilds with new chunking, or boilerplate pages across papers) are embedded
+    once. Embeddings are stored as float32.
+
+    The number of cached embeddings is kept in a metadata table by triggers, so
+    storing embeddings needn't count them. Lookups only write an embedding's last
+    use when it's older than `last_used_resolution`, so concurrent readers of hot
+    embeddings don't contend for the database's write lock.
+    """
+
+    path: Path = Field(
+        default_factory=lambda: pqa_directory("embeddings") / "cache.sqlite3",
+        description="Path to the SQLite database, it's created if missing.",
+    )
+    max_size: int = Field(
+        default=1_000_000,
+        ge=1,
+        description=(
+            "Maximum number of embeddings to keep, the least recently used"
+            " embeddings are evicted beyond it."
+        ),
+    )
+    last_used_resolution: float = Field(
+        default=60.0,
+        ge=0.0,
+        description=(
+            "Seconds within which repeated uses of an embedding aren't recorded,"
+            " so eviction is least recently used to within this resolution."
+        ),
+    )
+    hits: int = Field(default=0, description="Number of texts that were cached.")
+    misses: int = Field(
+        default=0, description="Number of texts that required embedding."
+    )
+    _connection: sqlite3.Connection | None = None
+
+    # SQLite's default limit on a statement's host parameters is 999
+    _MAX_PARAMS: ClassVar[int] = 900
+
+    def __getstate__(self) -> dict[Any, Any]:
+        state = super().__getstate__()
+        # Connections can't be pickled, they're reopened on use
+        state["__pydantic_private__"] = {"_connection": None}
+        return state
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                self.path, timeout=30.0, check_same_thread=False
+            )
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    " model TEXT NOT NULL,"
+                    " config TEXT NOT NULL,"
+                    " text_hash TEXT NOT NULL,"
+                    " embedding BLOB NOT NULL,"
+                    " last_used INTEGER NOT NULL,"
+                    " PRIMARY KEY (model, config, text_hash)"
+                    ") WITHOUT ROWID"
+                )
+                self._connection.execute(
+                    "CREATE INDEX IF NOT EXISTS embeddings_last_used"
+                    " ON embeddings (last_used)"
+                )
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS meta ("
+                    " key TEXT PRIMARY KEY, value INTEGER NOT NULL"
+                    ")"
+                )
+                # Count caches created before the count was kept
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO meta"
+                    " SELECT 'n_embeddings', COUNT(*) FROM embeddings"
+                )
+                self._connection.execute(
+                    "CREATE TRIGGER IF NOT EXISTS embeddings_insert"
+                    " AFTER INSERT ON embeddings BEGIN"
+                    " UPDATE meta SET value = value + 1 WHERE key = 'n_embeddings';"
+                    " END"
+                )
+                self._connection.execute(
+                    "CREATE TRIGGER IF NOT EXISTS embeddings_delete"
+                    " AFTER DELETE ON embeddings BEGIN"
+                    " UPDATE meta SET value = value - 1 WHERE key = 'n_embeddings';"
+                    " END"
+                )
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __len__(self) -> int:
+        return self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'n_embeddings'"
+        ).fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        """Empty the cache and reset its counters."""
+        with self.connection:
+            self.connection.execute("DELETE FROM embeddings")
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def model_key(embedding_model: EmbeddingModel) -> tuple[str, str]:
+        """Get the embedding model's name and a hash of its configuration."""
+        config = json.dumps(
+            {
+                "type": type(embedding_model).__name__,
+                **embedding_model.model_dump(exclude={"name"}),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return embedding_model.name, hashlib.sha256(config.encode()).hexdigest()
+
+    def get(
+        self, embedding_model: EmbeddingModel, texts: Sequence[str]
+    ) -> list[list[float] | None]:
+        """Look up the texts' embeddings, with None for texts not cached.
+
+        Lookups don't count towards the hit and miss counters.
+        """
+        model, config = self.model_key(embedding_model)
+        text_hashes = [hashlib.sha256(t.encode()).hexdigest() for t in texts]
+        found: dict[str, bytes] = {}
+        stale: list[str] = []
+        now = time.time_ns()
+        stale_before = now - int(self.last_used_resolution * 1e9)
+        unique_hashes = list(dict.fromkeys(text_hashes))
+        for i in range(0, len(unique_hashes), self._MAX_PARAMS):
+            chunk = unique_hashes[i : i + self._MAX_PARAMS]
+            # Only the '?' placeholders are interpolated, values stay bound parameters
+            for text_hash, embedding, last_used in self.connection.execute(
+                "SELECT text_hash, embedding, last_used FROM embeddings"  # noqa: S608
+                " WHERE model = ? AND config = ?"
+                f" AND text_hash IN ({', '.join('?' * len(chunk))})",
+                (model, config, *chunk),
+            ):
+                found[text_hash] = embedding
+                if last_used < stale_before:
+                    stale.append(text_hash)
+        if stale:
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_used = ?"
+                    " WHERE model = ? AND config = ? AND text_hash = ?",
+                    ((now, model, config, h) for h in stale),
+                )
+        return [
+            np.frombuffer(found[h], dtype=np.float32).tolist() if h in found else None
+            for h in text_hashes
+        ]
+
+    def put(
+        self,
+        embedding_model: EmbeddingModel,
+        texts: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+    ) -> None:
+        """Store the texts' embeddings, evicting the least recently used beyond size."""
+        model, config = self.model_key(embedding_model)
+        now = time.time_ns()
+        with self.connection:
+            # Upsert rather than replace, as replacing doesn't fire delete triggers
+            self.connection.executemany(
+                "INSERT INTO embeddings VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT DO UPDATE SET"
+                " embedding = excluded.embedding, last_used = excluded.last_used",
+                (
+                    (
+                        model,
+                        config,
+                        hashlib.sha256(text.encode()).hexdigest(),
+                        np.asarray(embedding, dtype=np.float32).tobytes(),
+                        now,
+                    )
+                    for text, embedding in zip(texts, embeddings, strict=True)
+                ),
+            )
+            n_over = len(self) - self.max_size
+            if n_over > 0:
+                self.connection.execute(
+                    "DELETE FROM embeddings WHERE (model, config, text_hash) IN"
+                    " (SELECT model, config, text_hash FROM embeddings"
+                    " ORDER BY last_used LIMIT ?)",
+                    (n_over,),
+                )
+
+    async def embed_documents(
+        self,
+        embedding_model: EmbeddingModel,
+        texts: Sequence[str],
+        embed: Callable[[list[str]], Awaitable[list[list[float]]]] | None = None,
+    ) -> list[list[float]]:
+        """Embed the input texts, only embedding the texts not cached.
+
+        Args:
+            embedding_model: Embedding model, which also keys the cache.
+            texts: Texts to embed.
+            embed: Optional function to embed the misses, default is the embedding
+                model's `embed_documents`.
+
+        Returns:
+            Embeddings aligned with the texts.
+        """
+        embeddings = self.get(embedding_model, texts)
+        # Deduplicate misses, so repeated texts are embedded once
+        misses = list(
+            dict.fromkeys(
+                t for t, e in zip(texts, embeddings, strict=True) if e is None
+            )
+        )
+        self.misses += len(misses)
+        self.hits += len(texts) - len(misses)
+        if misses:
+            new_embeddings = await (
+                embed(misses)
+                if embed is not None
+                else embedding_model.embed_documents(texts=misses)
+            )
+            self.put(embedding_model, misses, new_embeddings)
+            embedded = dict(zip(misses, new_embeddings, strict=True))
+            embeddings = [
+                e if e is not None else embedded[t]
+                for t, e in zip(texts, embeddings, strict=True)
+            ]
+        return cast("list[list[float]]", embeddings)
+
+
+def _text_dockey(text: Embeddable) -> str | None:
+    """Get the key of a text's document, or None if it's not from a document."""
+    return getattr(getattr(text, "doc", None), "dockey", None)
+
+
+def _exclude_docs(
+    texts: Sequence[Embeddable],
+    scores: list[float],
+    exclude_dockeys: Collection[str] | None,
+) -> tuple[list[Embeddable], list[float]]:
+    """Drop the texts (and their scores) of the excluded documents."""
+    if not exclude_dockeys:
+        return list(texts), scores
+    kept = [i for i, t in enumerate(texts) if _text_dockey(t) not in exclude_dockeys]
+    return [texts[i] for i in kept], [scores[i] for i in kept]
+
+
+# Words, keeping names joined by hyphens or periods whole (e.g. IL-6 or 5-HT2A)
+_TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-.'][^\W_]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase tokens for lexical search."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index(BaseModel):
+    """In-memory inverted index of texts, scored against queries by Okapi BM25.
+
+    Each term's postings hold the rows (positions in the index) of the texts
+    containing it and its frequency in each, so a search only scores rows sharing
+    a term with the query. Texts are only ever appended, so removed documents' rows
+    are tombstoned, and they and excluded documents are filtered at search time
+    like the vector stores.
+    """
+
+    k1: float = Field(
+        default=1.5, ge=0.0, description="Saturation of a term's frequency."
+    )
+    b: float = Field(
+        default=0.75,
+        ge=0.0,
+        le=1.0,
+        description="Strength of normalizing term frequencies by text length.",
+    )
+    _texts: list[Embeddable] = PrivateAttr(default_factory=list)
+    _texts_hashes: set[int] = PrivateAttr(default_factory=set)
+    # Term to its postings, as parallel arrays of rows and term frequencies
+    _postings: dict[str, tuple[array, array]] = PrivateAttr(default_factory=dict)
+    _lengths: array = PrivateAttr(default_factory=lambda: array("q"))
+    _total_length: int = 0
+    # Integer label of each document key, and the label of each row
+    _dockey_labels: dict[str | None, int] = PrivateAttr(default_factory=dict)
+    _row_labels: array = PrivateAttr(default_factory=lambda: array("q"))
+    # Labels of removed documents, and their number of rows
+    _removed_labels: set[int] = PrivateAttr(default_factory=set)
+    _n_removed: int = 0
+
+    def __contains__(self, item) -> bool:
+        return hash(item) in self._texts_hashes
+
+    def __len__(self) -> int:
+        return len(self._texts) - self._n_removed
+
+    @property
+    def texts_hashes(self) -> set[int]:
+        """Hashes of the indexed texts."""
+        return self._texts_hashes
+
+    def clear(self) -> None:
+        self._texts = []
+        self._texts_hashes = set()
+        self._postings = {}
+        self._lengths = array("q")
+        self._total_length = 0
+        self._dockey_labels = {}
+        self._row_labels = array("q")
+        self._removed_labels = set()
+        self._n_removed = 0
+
+    def remove_doc(self, dockey: str) -> None:
+        """Tombstone a document's texts, so searches no longer return them.
+
+        The document's label is dropped, so its texts can be added again.
+        """
+        label = self._dockey_labels.pop(dockey, None)
+        if label is None:
+            return
+        self._removed_labels.add(label)
+        rows = np.flatnonzero(np.frombuffer(self._row_labels, dtype=np.int64) == label)
+        self._n_removed += len(rows)
+        self._texts_hashes.difference_update(hash(self._texts[i]) for i in rows)
+
+    def add_texts(self, texts: Iterable[Embeddable]) -> None:
+        """Index the texts, appending to the postings of each of their terms."""
+        # Bind private attributes once, as their lookup is slow in this hot loop
+        all_texts, postings, lengths = self._texts, self._postings, self._lengths
+        dockey_labels, row_labels = self._dockey_labels, self._row_labels
+        # Removed documents' labels aren't reused
+        n_removed_labels = len(self._removed_labels)
+        for text in texts:
+            row = len(all_texts)
+            tokens = tokenize(getattr(text, "text", ""))
+            for term, frequency in Counter(tokens).items():
+                posting = postings.get(term)
+                if posting is None:
+                    posting = postings[term] = array("q"), array("q")
+                posting[0].append(row)
+                posting[1].append(frequency)
+            lengths.append(len(tokens))
+            self._total_length += len(tokens)
+            row_labels.append(
+                dockey_labels.setdefault(
+                    _text_dockey(text), len(dockey_labels) + n_removed_labels
+                )
+            )
+            all_texts.append(text)
+            self._texts_hashes.add(hash(text))
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        exclude_dockeys: Collection[str] | None = None,
+    ) -> tuple[list[Embeddable], list[float]]:
+        """Get the k texts with the highest BM25 scores for the query.
+
+        Args:
+            query: Query string.
+            k: Number of texts to return.
+            exclude_dockeys: Optional keys of documents whose texts to exclude.
+
+        Returns:
+            Two-tuple of up to k texts sharing a term with the query, and their
+                scores, sorted by descending score.
+        """
+        n_rows = len(self._texts)
+        if n_rows == 0 or k <= 0:
+            return [], []
+
+        # Views of the arrays, without copying them
+        lengths = np.frombuffer(self._lengths, dtype=np.int64)
+        mean_length = max(self._total_length / n_rows, 1.0)
+        term_rows: list[np.ndarray] = []
+        term_scores: list[np.ndarray] = []
+        for term in set(tokenize(query)):
+            if term not in self._postings:
+                continue
+            rows = np.frombuffer(self._postings[term][0], dtype=np.int64)
+            frequencies = np.frombuffer(self._postings[term][1], dtype=np.int64)
+            idf = np.log1p((n_rows - len(rows) + 0.5) / (len(rows) + 0.5))
+            norms = self.k1 * (1 - self.b + self.b * lengths[rows] / mean_length)
+            term_rows.append(rows)
+            term_scores.append(
+                idf * frequencies * (self.k1 + 1) / (frequencies + norms)
+            )
+        if not term_rows:
+            return [], []
+
+        # Sum each row's term scores, only touching rows in the postings
+        # unless they cover enough rows for a dense sum to be cheaper
+        candidates = np.concatenate(term_rows)
+        if len(term_rows) == 1:
+            scores = term_scores[0]  # Postings have unique rows
+        elif len(candidates) < n_rows // 8:
+            candidates, inverse = np.unique(candidates, return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(term_scores))
+        else:
+            all_scores = np.bincount(
+                candidates, weights=np.concatenate(term_scores), minlength=n_rows
+            )
+            candidates = np.flatnonzero(all_scores)
+            scores = all_scores[candidates]
+
+        excluded_labels = [
+            *self._removed_labels,
+            *(
+                self._dockey_labels[d]
+                for d in exclude_dockeys or ()
+                if d in self._dockey_labels
+            ),
+        ]
+        if excluded_labels:
+            row_labels = np.frombuffer(self._row_labels, dtype=np.int64)
+            included = ~np.isin(row_labels[candidates], excluded_labels)
+            candidates, scores = candidates[included], scores[included]
+        top = top_k_indices(scores, k)
+        return [self._texts[i] for i in candidates[top]], scores[top].tolist()
+
+
+T = TypeVar("T")
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[Sequence[T]],
+    k: int | None = None,
+    rrf_k: int = 60,
+    key: Callable[[T], Hashable] = hash,
+) -> list[T]:
+    """Fuse rankings of items by summing their reciprocal rank in each ranking.
+
+    Each appearance of an item at rank r (starting at 1) adds 1 / (rrf_k + r),
+    items are deduplicated by key, keeping their first appearance.
+
+    Args:
+        rankings: Rankings of items, each sorted from best to worst.
+        k: Optional number of fused items to return, or all of them if None.
+        rrf_k: Constant damping the weight of top ranks.
+        key: Function identifying items, defaulting to their hash.
+
+    Returns:
+        Items sorted by descending fused score, ties broken by first appearance.
+    """
+    items: dict[Hashable, T] = {}
+    scores: defaultdict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            item_key = key(item)
+            items.setdefault(item_key, item)
+            scores[item_key] += 1 / (rrf_k + rank)
+    # Sorting is stable, and dicts keep insertion (first appearance) order
+    fused = sorted(items, key=lambda item_key: -scores[item_key])
+    return [items[item_key] for item_key in fused[:k]]
+
+
 class VectorStore(BaseModel, ABC):
     """Interface for vector store - very similar to LangChain's VectorStore to be compatible."""
 
@@ -64,13 +869,22 @@ class VectorStore(BaseModel, ABC):
         description="MMR lambda value, a value above 1 disables MMR search.",
     )
     texts_hashes: set[int] = Field(default_factory=set)
+    query_embedding_cache: QueryEmbeddingCache | None = Field(
+        default=None,
+        exclude=True,
+        description="Optional cache to reuse query embeddings across searches.",
+    )
 
     def __contains__(self, item) -> bool:
-        return hash(item) in self.texts_hashes
+        return hash(item) in self.sync_texts_hashes()
 
     def __len__(self) -> int:
         return len(self.texts_hashes)
 
+    def sync_texts_hashes(self) -> set[int]:
+        """Get `texts_hashes`, first adding the hashes of any texts it defers."""
+        return self.texts_hashes
+
     @abstractmethod
     async def add_texts_and_embeddings(self, texts: Iterable[Embeddable]) -> None:
         """Add texts and their embeddings to the store."""
@@ -86,6 +900,85 @@ class VectorStore(BaseModel, ABC):
     def clear(self) -> None:
         self.texts_hashes = set()
 
+    async def remove_texts(self, texts: Iterable[Embeddable]) -> None:
+        """Remove texts from the store, so searches no longer return them.
+
+        Stores should also drop the removed texts' hashes from `texts_hashes`,
+        so the texts can be added again.
+        """
+        raise NotImplementedError(
+            "remove_texts is not implemented for this VectorStore."
+        )
+
+    async def remove_doc(self, dockey: str) -> None:
+        """Remove every text of the input document, like `remove_texts`."""
+        raise NotImplementedError("remove_doc is not implemented for this VectorStore.")
+
+    async def embed_query(
+        self, query: str, embedding_model: EmbeddingModel
+    ) -> np.ndarray:
+        """Embed the input query, using the embedding model's query mode."""
+        if self.query_embedding_cache is not None:
+            return await self.query_embedding_cache.embed_query(query, embedding_model)
+        # this will only affect models that embedding prompts
+        embedding_model.set_mode(EmbeddingModes.QUERY)
+        np_query = np.array((await embedding_model.embed_documents([query]))[0])
+        embedding_model.set_mode(EmbeddingModes.DOCUMENT)
+        return np_query
+
+    async def embed_queries(
+        self, queries: Sequence[str], embedding_model: EmbeddingModel
+    ) -> np.ndarray:
+        """Embed the input queries in one request, returning a matrix of one row per query."""
+        if self.query_embedding_cache is not None:
+            return np.array(
+                await self.query_embedding_cache.embed_queries(queries, embedding_model)
+            )
+        embedding_model.set_mode(EmbeddingModes.QUERY)
+        np_queries = np.array(await embedding_model.embed_documents(list(queries)))
+        embedding_model.set_mode(EmbeddingModes.DOCUMENT)
+        return np_queries
+
+    async def batch_similarity_search(
+        self, queries: Sequence[str], k: int, embedding_model: EmbeddingModel
+    ) -> list[tuple[Sequence[Embeddable], list[float]]]:
+        """Perform similarity search for many queries.
+
+        The default implementation searches query by query, stores should override
+        it to embed all queries in one request and score them together.
+
+        Args:
+            queries: Query strings.
+            k: Number of results to return per query.
+            embedding_model: model used to embed the queries.
+
+        Returns:
+            List of the same results as `similarity_search`, one per query.
+        """
+        return [
+            await self.similarity_search(query, k, embedding_model) for query in queries
+        ]
+
+    async def batch_max_marginal_relevance_search(
+        self,
+        queries: Sequence[str],
+        k: int,
+        fetch_k: int,
+        embedding_model: EmbeddingModel,
+        exclude_dockeys: Collection[str] | None = None,
+    ) -> list[tuple[Sequence[Embeddable], list[float]]]:
+        """Perform `max_marginal_relevance_search` for many queries, on a batched fetch."""
+        if fetch_k < k:
+            raise ValueError("fetch_k must be greater or equal to k")
+        n_excluded = len(exclude_dockeys or ())
+        results = []
+        for texts, scores in await self.batch_similarity_search(
+            queries, fetch_k + n_excluded, embedding_model
+        ):
+            texts, scores = _exclude_docs(texts, scores, exclude_dockeys)
+            results.append(self._select_mmr(texts[:fetch_k], scores[:fetch_k], k))
+        return results
+
     async def partitioned_similarity_search(
         self,
         query: str,
@@ -115,6 +1008,7 @@ class VectorStore(BaseModel, ABC):
         fetch_k: int,
         embedding_model: EmbeddingModel,
         partitioning_fn: Callable[[Embeddable], int] | None = None,
+        exclude_dockeys: Collection[str] | None = None,
     ) -> tuple[Sequence[Embeddable], list[float]]:
         """Vectorized implementation of Maximal Marginal Relevance (MMR) search.
 
@@ -125,6 +1019,10 @@ class VectorStore(BaseModel, ABC):
             embedding_model: model used to embed the query
             partitioning_fn: optional function to partition the documents into
                 different groups, performing MMR within each group.
+            exclude_dockeys: optional keys of documents whose texts to exclude.
+                Stores should filter them within the search, this default
+                implementation over-fetches by one text per excluded document
+                and filters them out afterwards.
 
         Returns:
             List of tuples (doc, score) of length k.
@@ -132,77 +1030,662 @@ class VectorStore(BaseModel, ABC):
         if fetch_k < k:
             raise ValueError("fetch_k must be greater or equal to k")
 
+        n_excluded = len(exclude_dockeys or ())
         if partitioning_fn is None:
             texts, scores = await self.similarity_search(
-                query, fetch_k, embedding_model
+                query, fetch_k + n_excluded, embedding_model
             )
         else:
             texts, scores = await self.partitioned_similarity_search(
-                query, fetch_k, embedding_model, partitioning_fn
+                query, fetch_k + n_excluded, embedding_model, partitioning_fn
             )
+        texts, scores = _exclude_docs(texts, scores, exclude_dockeys)
+        return self._select_mmr(texts[:fetch_k], scores[:fetch_k], k)
 
+    def _select_mmr(
+        self, texts: Sequence[Embeddable], scores: list[float], k: int
+    ) -> tuple[Sequence[Embeddable], list[float]]:
+        """Select k of the fetched texts by MMR, or all of them if MMR is disabled."""
         if len(texts) <= k or self.mmr_lambda >= 1.0:
             return texts, scores
 
-        embeddings = np.array([t.embedding for t in texts])
-        np_scores = np.array(scores)
-        similarity_matrix = cosine_similarity(embeddings, embeddings)
-
-        selected_indices = [0]
-        remaining_indices = list(range(1, len(texts)))
-
-        while len(selected_indices) < k:
-            selected_similarities = similarity_matrix[:, selected_indices]
-            max_sim_to_selected = selected_similarities.max(axis=1)
-
-            mmr_scores = (
-                self.mmr_lambda * np_scores
-                - (1 - self.mmr_lambda) * max_sim_to_selected
-            )
-            mmr_scores[selected_indices] = -np.inf  # Exclude already selected documents
-
-            max_mmr_index = mmr_scores.argmax()
-            selected_indices.append(max_mmr_index)
-            remaining_indices.remove(max_mmr_index)
-
+        embeddings = l2_normalize(
+            np.array([t.embedding for t in texts], dtype=np.float32)
+        )
+        selected_indices = maximal_marginal_relevance(
+            embeddings, np.array(scores), k, self.mmr_lambda
+        )
         return [texts[i] for i in selected_indices], [
             scores[i] for i in selected_indices
         ]
 
 
 class NumpyVectorStore(VectorStore):  # noqa: PLW1641  # TODO: add __hash__
-    texts: list[Embeddable] = Field(default_factory=list)
+    texts: ChunkStore | list[Embeddable] = Field(
+        default_factory=list,
+        union_mode="left_to_right",
+        description=(
+            "Texts aligned with the embeddings matrix's rows. Pass a"
+            " `ChunkStore(store_embeddings=False)` to store them compactly, only"
+            " materializing the texts searches return."
+        ),
+    )
+    quantization: Literal["float16", "int8"] | None = Field(
+        default=None,
+        description=(
+            "Optional compressed storage of the embeddings matrix, 'float16' halves"
+            " and 'int8' quarters the memory searches scan. Searches score the"
+            " compressed rows, then re-rank a shortlist by float32 rows kept"
+            " alongside, so the texts needn't hold embeddings. In memory these cost"
+            " as much as an unquantized matrix, but `load` memory-maps them, so"
+            " searches of a loaded store only read in the rows they re-rank."
+            " Note numpy decompresses float16 slowly, so 'int8' is also faster."
+        ),
+    )
+    rerank_factor: int = Field(
+        default=4,
+        ge=1,
+        description=(
+            "When quantized, multiple of k candidates to shortlist for re-ranking."
+        ),
+    )
+    compaction_threshold: float = Field(
+        default=0.25,
+        gt=0.0,
+        le=1.0,
+        description=(
+            "Fraction of removed rows at which the store is compacted. Removed rows"
+            " are tombstoned (masked out of searches) until compaction drops them"
+            " from the texts and embeddings."
+        ),
+    )
+    # Preallocated buffer whose first `n_rows` rows are the L2-normalized embeddings
+    # of `texts`, grown geometrically so appending a batch only copies the new rows.
+    # If quantized, rows are codes, int8 rows have a scale in `_scales`, and
+    # `_exact_embeddings` holds the full-precision rows to re-rank by
     _embeddings_matrix: np.ndarray | None = None
-    _texts_filter: np.ndarray | None = None
+    _scales: np.ndarray | None = None
+    _exact_embeddings: np.ndarray | None = None
+    _n_rows: int = 0
+    # Partition label of each row, per partitioning function
+    _partition_labels: dict[Callable[[Embeddable], int], np.ndarray] = PrivateAttr(
+        default_factory=dict
+    )
+    # Integer label of each document key, to mask documents' rows by their labels
+    _dockey_labels: dict[str | None, int] = PrivateAttr(default_factory=dict)
+    # Tombstones flagging removed rows, aligned with the first rows of `texts`
+    _removed_rows: np.ndarray | None = None
+    _n_removed: int = 0
+    # Number of first rows of `texts` whose hashes `texts_hashes` defers, as a loaded
+    # store needn't decode every text to be searched
+    _n_unhashed_rows: int = 0
+
+    MIN_CAPACITY: ClassVar[int] = 64
+    GROWTH_FACTOR: ClassVar[float] = 2.0
+    # Max number of scores held at once when batch searching
+    BATCH_SCORES_BUDGET: ClassVar[int] = 2**24
+    # Number of quantized rows to decompress at once when scoring,
+    # small enough for the float32 copy to stay in CPU cache
+    DEQUANTIZE_CHUNK_ROWS: ClassVar[int] = 512
+    # Dtype of the embeddings buffer's rows, by quantization
+    ROW_DTYPES: ClassVar[dict[str | None, type[np.generic]]] = {
+        None: np.float32,
+        "float16": np.float16,
+        "int8": np.int8,
+    }
+
+    # Layout of a store saved to a directory
+    FORMAT_VERSION: ClassVar[int] = 2
+    EMBEDDINGS_FILENAME: ClassVar[str] = "embeddings.npy"
+    # If quantized, the codes and int8 scales, next to the full-precision embeddings
+    CODES_FILENAME: ClassVar[str] = "codes.npy"
+    SCALES_FILENAME: ClassVar[str] = "scales.npy"
+    TEXTS_FILENAME: ClassVar[str] = "texts.json"
+    # Template of the filenames of the texts' columns, by column name
+    CHUNKS_FILENAME: ClassVar[str] = "chunks_{}.npy"
+    CHUNKS_COLUMNS: ClassVar[tuple[str, ...]] = (
+        "text_bytes",
+        "text_offsets",
+        "name_bytes",
+        "name_offsets",
+        "doc_indices",
+    )
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, type(self)):
             return NotImplemented
         return (
             self.texts == other.texts
-            and self.texts_hashes == other.texts_hashes
+            and self.sync_texts_hashes() == other.sync_texts_hashes()
             and self.mmr_lambda == other.mmr_lambda
             and (
-                other._embeddings_matrix is None
-                if self._embeddings_matrix is None
+                other.embeddings_matrix is None
+                if self.embeddings_matrix is None
                 else (
                     False
-                    if other._embeddings_matrix is None
-                    else np.allclose(self._embeddings_matrix, other._embeddings_matrix)
+                    if other.embeddings_matrix is None
+                    else np.allclose(self.embeddings_matrix, other.embeddings_matrix)
+                )
+            )
+        )
+
+    def __getstate__(self) -> dict[Any, Any]:
+        state = super().__getstate__()
+        # Copy to not modify this instance's private attributes. Partitioning
+        # functions may be unpicklable (e.g. lambdas), and labels are cheap to redo
+        private = state["__pydantic_private__"] | {"_partition_labels": {}}
+        if self._embeddings_matrix is not None:
+            # Don't persist the buffer's unused capacity
+            private["_embeddings_matrix"] = self._embeddings_matrix[
+                : self._n_rows
+            ].copy()
+        if self._scales is not None:
+            private["_scales"] = self._scales[: self._n_rows].copy()
+        if self._exact_embeddings is not None:
+            private["_exact_embeddings"] = self._exact_embeddings[: self._n_rows].copy()
+        state["__pydantic_private__"] = private
+        return state
+
+    def __len__(self) -> int:
+        # Saved rows were indexed once per hash, so deferred hashes are distinct
+        return len(self.texts_hashes) + self._n_unhashed_rows
+
+    def sync_texts_hashes(self) -> set[int]:
+        if self._n_unhashed_rows:
+            self.texts_hashes.update(
+                self._row_hashes()[: self._n_unhashed_rows].tolist()
+            )
+            self._n_unhashed_rows = 0
+        return self.texts_hashes
+
+    @property
+    def capacity(self) -> int:
+        """Number of rows allocated in the embeddings buffer."""
+        if self._embeddings_matrix is None:
+            return 0
+        return self._embeddings_matrix.shape[0]
+
+    @property
+    def n_rows(self) -> int:
+        """Number of rows in use in the embeddings buffer."""
+        return self._n_rows
+
+    @property
+    def nbytes(self) -> int:
+        """Number of bytes of embeddings held in memory.
+
+        This includes the scales and full-precision rows of quantized stores, but
+        not memory-mapped files, whose pages the OS reads in and evicts as needed.
+        """
+        return sum(
+            buffer.nbytes
+            for buffer in (
+                self._embeddings_matrix,
+                self._scales,
+                self._exact_embeddings,
+            )
+            if buffer is not None and not isinstance(buffer, np.memmap)
+        )
+
+    @property
+    def embeddings_matrix(self) -> np.ndarray | None:
+        """View of the embeddings buffer's used (L2-normalized) rows, aligned with `texts`.
+
+        If quantized, this is instead a float32 copy of the decompressed rows.
+        """
+        if self._embeddings_matrix is None:
+            return None
+        return self._dequantize(slice(0, self._n_rows))
+
+    def clear(self) -> None:
+        super().clear()
+        if isinstance(self.texts, ChunkStore):
+            self.texts.clear()
+        else:
+            self.texts = []
+        self._embeddings_matrix = None
+        self._scales = None
+        self._exact_embeddings = None
+        self._n_rows = 0
+        self._partition_labels = {}
+        self._dockey_labels = {}
+        self._removed_rows = None
+        self._n_removed = 0
+        self._n_unhashed_rows = 0
+
+    def _reserve(self, n_rows: int, dim: int) -> None:
+        """Ensure the embeddings buffer can hold at least the input number of rows."""
+        if self._embeddings_matrix is not None and n_rows <= self.capacity:
+            return
+        new_capacity = max(
+            n_rows, int(self.capacity * self.GROWTH_FACTOR), self.MIN_CAPACITY
+        )
+        buffer = np.empty((new_capacity, dim), dtype=self.ROW_DTYPES[self.quantization])
+        if self._embeddings_matrix is not None:
+            buffer[: self._n_rows] = self._embeddings_matrix[: self._n_rows]
+        self._embeddings_matrix = buffer
+        if self.quantization == "int8":
+            scales = np.empty(new_capacity, dtype=np.float32)
+            if self._scales is not None:
+                scales[: self._n_rows] = self._scales[: self._n_rows]
+            self._scales = scales
+        if self.quantization is not None:
+            exact = np.empty((new_capacity, dim), dtype=np.float32)
+            if self._exact_embeddings is not None:
+                exact[: self._n_rows] = self._exact_embeddings[: self._n_rows]
+            self._exact_embeddings = exact
+
+    def _append_rows(self, texts: Sequence[Embeddable]) -> None:
+        if not texts:
+            return
+        new_rows = l2_normalize(
+            np.asarray([t.embedding for t in texts], dtype=np.float32)
+        )
+        start, stop = self._n_rows, self._n_rows + len(new_rows)
+        self._reserve(stop, dim=new_rows.shape[1])
+        if self.quantization is not None:
+            self._exact_embeddings[start:stop] = new_rows  # type: ignore[index]
+        if self.quantization == "int8":
+            # Symmetric per-row scales, mapping each row's max magnitude to 127
+            scales = np.abs(new_rows).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            self._scales[start:stop] = scales  # type: ignore[index]
+            new_rows = np.rint(new_rows / scales[:, None])
+        self._embeddings_matrix[start:stop] = new_rows  # type: ignore[index]
+        self._n_rows = stop
+
+    def _dequantize(self, rows: slice | np.ndarray) -> np.ndarray:
+        """Get the input rows as float32, decompressing them if quantized."""
+        codes = cast("np.ndarray", self._embeddings_matrix)[rows]
+        if self.quantization is None:
+            return codes
+        embeddings = codes.astype(np.float32)
+        if self.quantization == "int8":
+            embeddings *= cast("np.ndarray", self._scales)[rows][:, None]
+        return embeddings
+
+    def _exact_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Get the input rows' full-precision L2-normalized embeddings."""
+        if self.quantization is None:
+            return cast("np.ndarray", self._embeddings_matrix)[rows]
+        return cast("np.ndarray", self._exact_embeddings)[rows]
+
+    def _score_rows(self, np_query: np.ndarray, rows: slice | np.ndarray) -> np.ndarray:
+        """Get the input rows' cosine similarity to the normalized query.
+
+        If quantized, similarities are approximated from the codes.
+        """
+        if self.quantization is None:
+            # Rows and query are normalized, so cosine similarity is one matvec
+            similarity_scores = (
+                cast("np.ndarray", self._embeddings_matrix)[rows] @ np_query
+            )
+        else:
+            codes = cast("np.ndarray", self._embeddings_matrix)[rows]
+            similarity_scores = np.empty(len(codes), dtype=np.float32)
+            # Decompress in chunks, bounding the memory of float32 copies
+            for start in range(0, len(codes), self.DEQUANTIZE_CHUNK_ROWS):
+                stop = start + self.DEQUANTIZE_CHUNK_ROWS
+                similarity_scores[start:stop] = (
+                    codes[start:stop].astype(np.float32) @ np_query
+                )
+            if self.quantization == "int8":
+                similarity_scores *= cast("np.ndarray", self._scales)[rows]
+        return np.nan_to_num(similarity_scores, nan=-np.inf)
+
+    def _select_top_k(
+        self,
+        candidates: np.ndarray,
+        similarity_scores: np.ndarray,
+        np_query: np.ndarray,
+        k: int,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get the top k candidate rows and their scores, sorted by descending score."""
+        if self.quantization is None:
+            # A lot of algorithms expect a sorted list, but only the top k are used
+            sorted_indices = top_k_indices(similarity_scores, k)
+            return candidates[sorted_indices], similarity_scores[sorted_indices]
+
+        # Shortlist by the approximate scores, then re-rank by exact scores
+        shortlist = candidates[top_k_indices(similarity_scores, k * self.rerank_factor)]
+        exact_scores = np.nan_to_num(
+            self._exact_rows(shortlist) @ np_query, nan=-np.inf
+        )
+        sorted_indices = top_k_indices(exact_scores, k)
+        return shortlist[sorted_indices], exact_scores[sorted_indices]
+
+    def save(
+        self,
+        directory: str | os.PathLike,
+        embedding_model_name: str | None = None,
+        save_texts: bool = True,
+    ) -> None:
+        """Save to a directory as `.npy` files of the embeddings and texts' columns.
+
+        Text and names are saved as UTF-8 buffers delimited by offsets, and each
+        distinct document is saved once to a JSON table that rows reference by
+        position. So the saved store can be memory-mapped by `load`, without the
+        embeddings or texts round tripping through Python objects. The store's type
+        and configuration are saved too, so subclasses load as themselves.
+
+        Args:
+            directory: Directory to save to.
+            embedding_model_name: Optional name of the model that embedded the texts,
+                for `load` to check queries will be embedded by the same model.
+            save_texts: Opt-out flag to not save the texts, such as when they're
+                saved elsewhere (e.g. by `Docs.save`), to then pass them to `load`.
+        """
+        self._sync_rows()
+        self.compact()  # Removed rows aren't saved
+        if isinstance(self.texts, ChunkStore):
+            chunks = self.texts
+        else:
+            for text in self.texts:
+                if not isinstance(text, Text):
+                    raise TypeError(
+                        f"Saving requires texts to be {Text.__name__}s, not"
+                        f" {type(text)}."
+                    )
+            chunks = ChunkStore(cast("list[Text]", self.texts), store_embeddings=False)
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        embeddings = (
+            cast("np.ndarray", self._exact_embeddings)[: self._n_rows]
+            if self.quantization and self._n_rows
+            else self.embeddings_matrix
+        )
+        np.save(
+            directory / self.EMBEDDINGS_FILENAME,
+            np.empty((0, 0), dtype=np.float32) if embeddings is None else embeddings,
+        )
+        if self.quantization is not None:
+            np.save(
+                directory / self.CODES_FILENAME,
+                (
+                    np.empty((0, 0), dtype=self.ROW_DTYPES[self.quantization])
+                    if self._embeddings_matrix is None
+                    else self._embeddings_matrix[: self._n_rows]
+                ),
+            )
+        if self.quantization == "int8":
+            np.save(
+                directory / self.SCALES_FILENAME,
+                (
+                    np.empty(0, dtype=np.float32)
+                    if self._scales is None
+                    else self._scales[: self._n_rows]
+                ),
+            )
+        if save_texts:
+            for name, column in chunks.columns().items():
+                np.save(directory / self.CHUNKS_FILENAME.format(name), column)
+        (directory / self.TEXTS_FILENAME).write_text(
+            json.dumps(
+                {
+                    "format_version": self.FORMAT_VERSION,
+                    "type": type(self).__name__,
+                    "config": self.model_dump(
+                        mode="json", exclude={"texts", "texts_hashes"}
+                    ),
+                    "embedding_model_name": embedding_model_name,
+                    "saved_texts": save_texts,
+                    "docs": [
+                        d.model_dump(mode="json", exclude={"embedding"})
+                        for d in (chunks.docs if save_texts else [])
+                    ],
+                }
+            )
+        )
+
+    @classmethod
+    def load(
+        cls,
+        directory: str | os.PathLike,
+        mmap: bool = True,
+        embedding_model_name: str | None = None,
+        texts: ChunkStore | list[Embeddable] | None = None,
+    ) -> Self:
+        """Load a store previously written by `save`.
+
+        Memory-mapped files are shared by every process mapping them, so to share one
+        store across processes (e.g. server workers), save it once (e.g. under the
+        `/dev/shm` shared memory filesystem) and load it in each process. A store
+        saved from a subclass (e.g. `IVFVectorStore`) is loaded as that subclass.
+
+        Args:
+            directory: Directory the store was saved to.
+            mmap: Opt-out flag to read the embeddings matrix and texts' columns into
+                memory, instead of memory-mapping them read-only. Memory-mapped pages
+                are read in by the OS as queries touch them, and adding texts copies
+                them into memory.
+            embedding_model_name: Optional name of the model that will embed queries,
+                to check against the name the store was saved with (if any).
+            texts: Optional texts aligned with the saved embeddings, to use instead
+                of the saved texts. Required if the store was saved without texts.
+
+        Returns:
+            The loaded store, whose texts are a `ChunkStore` of the texts' columns.
+                Its texts don't hold embeddings, as those live in the embeddings
+                matrix. If the store was quantized, searches scan the mapped codes,
+                and only read in the full-precision rows they re-rank.
+        """
+        directory = Path(directory)
+        data = json.loads((directory / cls.TEXTS_FILENAME).read_text())
+        if data["format_version"] not in {1, cls.FORMAT_VERSION}:
+            raise ValueError(
+                f"Unsupported format version {data['format_version']} in {directory},"
+                f" expected {cls.FORMAT_VERSION}."
+            )
+        saved_model_name = data.get("embedding_model_name")
+        if embedding_model_name and saved_model_name not in {
+            None,
+            embedding_model_name,
+        }:
+            raise ValueError(
+                f"Store in {directory} was embedded by {saved_model_name!r}, so it"
+                f" can't be searched with {embedding_model_name!r} embeddings."
+            )
+        if texts is None:
+            if not data.get("saved_texts", True):
+                raise ValueError(
+                    f"Store in {directory} was saved without its texts, so pass them."
                 )
+            docs = [DOC_ADAPTER.validate_python(d) for d in data["docs"]]
+            if data["format_version"] == 1:
+                # Prior to columns, texts were saved as JSON rows
+                texts = [
+                    Text(text=text, name=name, doc=docs[doc_index])
+                    for name, text, doc_index in data["texts"]
+                ]
+            else:
+                columns = {
+                    name: np.load(
+                        directory / cls.CHUNKS_FILENAME.format(name),
+                        mmap_mode="r" if mmap else None,
+                    )
+                    for name in cls.CHUNKS_COLUMNS
+                }
+                texts = ChunkStore.from_columns(columns, docs, store_embeddings=False)
+        embeddings = np.load(
+            directory / cls.EMBEDDINGS_FILENAME, mmap_mode="r" if mmap else None
+        )
+        if texts and embeddings.shape[0] != len(texts):
+            raise ValueError(
+                f"Embeddings matrix in {directory} has {embeddings.shape[0]} rows,"
+                f" but there are {len(texts)} texts."
             )
+
+        store_cls = next(
+            (t for t in _subclasses(cls) if t.__name__ == data.get("type")), cls
+        )
+        # Stores saved before their configuration only saved these fields
+        config = data.get("config") or {
+            k: data[k]
+            for k in ("mmr_lambda", "quantization", "rerank_factor")
+            if k in data
+        }
+        store = store_cls(
+            texts=texts,
+            **{k: v for k, v in config.items() if k in store_cls.model_fields},
         )
+        # Hashing decodes every text, so defer it until the hashes are checked
+        store._n_unhashed_rows = len(texts)
+        if not texts:
+            return store
+        if store.quantization is not None:
+            store._exact_embeddings = embeddings
+            embeddings = np.load(
+                directory / cls.CODES_FILENAME, mmap_mode="r" if mmap else None
+            )
+        if store.quantization == "int8":
+            store._scales = np.load(
+                directory / cls.SCALES_FILENAME, mmap_mode="r" if mmap else None
+            )
+        store._embeddings_matrix = embeddings
+        store._n_rows = len(texts)
+        return store
 
-    def clear(self) -> None:
-        super().clear()
-        self.texts = []
-        self._embeddings_matrix = None
-        self._texts_filter = None
+    def _sync_rows(self) -> None:
+        # Rows can lag behind texts if texts were passed at construction
+        self._append_rows(self.texts[self._n_rows :])
 
     async def add_texts_and_embeddings(self, texts: Iterable[Embeddable]) -> None:
+        texts = list(texts)
         await super().add_texts_and_embeddings(texts)
-        self.texts.extend(texts)
-        self._embeddings_matrix = np.array([t.embedding for t in self.texts])
+        self._sync_rows()
+        # Append rows from the input texts, as the stored texts may drop embeddings
+        self.texts.extend(cast("list[Text]", texts))
+        self._append_rows(texts)
+
+    def partition_labels(
+        self, partitioning_fn: Callable[[Embeddable], int]
+    ) -> np.ndarray:
+        """Get the partition label of each text, aligned with `texts`.
+
+        Labels are cached per partitioning function, so each text is only
+        labelled once, the first time it's searched after being added.
+        """
+        labels = self._partition_labels.get(partitioning_fn)
+        if labels is None:
+            labels = np.empty(0, dtype=np.int64)
+        if len(labels) < len(self.texts):
+            labels = np.concatenate(
+                (
+                    labels,
+                    np.fromiter(
+                        (partitioning_fn(t) for t in self.texts[len(labels) :]),
+                        dtype=np.int64,
+                    ),
+                )
+            )
+            self._partition_labels[partitioning_fn] = labels
+        return labels
+
+    def _dockey_label(self, text: Embeddable) -> int:
+        """Partitioning function labelling each text by its document."""
+        return self._dockey_labels.setdefault(
+            _text_dockey(text), len(self._dockey_labels)
+        )
+
+    def _included_rows_mask(
+        self, exclude_dockeys: Collection[str] | None
+    ) -> np.ndarray | None:
+        """Get a mask of the rows not removed, nor from the excluded documents.
+
+        Returns:
+            Boolean mask aligned with `texts`, or None if no row is excluded.
+        """
+        live = self._live_rows_mask()
+        if not exclude_dockeys:
+            return live
+        labels = self.partition_labels(self._dockey_label)
+        excluded_labels = [
+            self._dockey_labels[d] for d in exclude_dockeys if d in self._dockey_labels
+        ]
+        if not excluded_labels:
+            return live
+        included = ~np.isin(labels, excluded_labels)
+        return included if live is None else included & live
+
+    def _removed_rows_mask(self) -> np.ndarray:
+        """Get the tombstones, padded to align with `texts`."""
+        removed = np.zeros(len(self.texts), dtype=bool)
+        if self._removed_rows is not None:
+            removed[: len(self._removed_rows)] = self._removed_rows
+        return removed
+
+    def _live_rows_mask(self) -> np.ndarray | None:
+        """Get a mask of the rows not removed, or None if no row is removed."""
+        if not self._n_removed:
+            return None
+        return ~self._removed_rows_mask()
+
+    @property
+    def n_live_rows(self) -> int:
+        """Number of texts not removed, which searches can return."""
+        return len(self.texts) - self._n_removed
+
+    def _row_hashes(self) -> np.ndarray:
+        """Get the hash of each text, aligned with `texts`."""
+        texts = self.texts
+        if isinstance(texts, ChunkStore):
+            return np.fromiter(
+                (texts.row_hash(i) for i in range(len(texts))), dtype=np.int64
+            )
+        return np.fromiter((hash(t) for t in texts), dtype=np.int64)
+
+    def _remove_rows(self, rows: np.ndarray) -> None:
+        """Tombstone the input rows, compacting once enough rows are removed."""
+        removed = self._removed_rows_mask()
+        rows = rows[~removed[rows]]
+        if not len(rows):
+            return
+        removed[rows] = True
+        self._removed_rows = removed
+        self._n_removed += len(rows)
+        self.sync_texts_hashes().difference_update(self._row_hashes()[rows].tolist())
+        if self._n_removed >= self.compaction_threshold * len(self.texts):
+            self.compact()
+
+    async def remove_texts(self, texts: Iterable[Embeddable]) -> None:
+        hashes = np.fromiter((hash(t) for t in texts), dtype=np.int64)
+        self._remove_rows(np.flatnonzero(np.isin(self._row_hashes(), hashes)))
+
+    async def remove_doc(self, dockey: str) -> None:
+        labels = self.partition_labels(self._dockey_label)
+        if dockey in self._dockey_labels:
+            self._remove_rows(np.flatnonzero(labels == self._dockey_labels[dockey]))
+
+    def compact(self) -> None:
+        """Drop removed rows from the texts and embeddings, reclaiming their memory.
+
+        This copies every kept row, so it's amortized by only running
+        automatically once `compaction_threshold` of the rows are removed.
+        """
+        if not self._n_removed:
+            return
+        self._sync_rows()
+        kept = np.flatnonzero(~self._removed_rows_mask())
+        if isinstance(self.texts, ChunkStore):
+            self.texts.keep_rows(kept.tolist())
+        else:
+            self.texts = [self.texts[i] for i in kept]
+        if self._embeddings_matrix is not None:
+            # Indexing copies, which also reads memory-mapped rows into memory
+            self._embeddings_matrix = self._embeddings_matrix[kept]
+        if self._scales is not None:
+            self._scales = self._scales[kept]
+        if self._exact_embeddings is not None:
+            self._exact_embeddings = self._exact_embeddings[kept]
+        self._n_rows = len(kept)
+        # Labels can lag behind texts, so only keep the labelled rows
+        self._partition_labels = {
+            fn: labels[kept[: np.searchsorted(kept, len(labels))]]
+            for fn, labels in self._partition_labels.items()
+        }
+        self._removed_rows = None
+        self._n_removed = 0
 
     async def partitioned_similarity_search(
         self,
@@ -211,67 +1694,437 @@ class NumpyVectorStore(VectorStore):  # noqa: PLW1641  # TODO: add __hash__
         embedding_model: EmbeddingModel,
         partitioning_fn: Callable[[Embeddable], int],
     ) -> tuple[Sequence[Embeddable], list[float]]:
-        scores: list[list[float]] = []
-        texts: list[Sequence[Embeddable]] = []
-
-        text_partitions = np.array([partitioning_fn(t) for t in self.texts])
-        # CPU bound so replacing w a gather wouldn't get us anything
-        # plus we need to reset self._texts_filter each iteration
-        for partition in np.unique(text_partitions):
-            self._texts_filter = text_partitions == partition
-            _texts, _scores = await self.similarity_search(query, k, embedding_model)
-            texts.append(_texts)
-            scores.append(_scores)
-        # reset the filter after running
-        self._texts_filter = None
+        k = min(k, self.n_live_rows)
+        if k == 0:
+            return [], []
 
+        rows, scores = self._search_partitioned_rows(
+            await self._embed_normalized_query(query, embedding_model),
+            k,
+            self.partition_labels(partitioning_fn),
+            self._live_rows_mask(),
+        )
+        return [self.texts[i] for i in rows], scores.tolist()
+
+    async def _embed_normalized_query(
+        self, query: str, embedding_model: EmbeddingModel
+    ) -> np.ndarray:
+        return l2_normalize(
+            (await self.embed_query(query, embedding_model)).astype(np.float32)
+        )
+
+    async def _embed_normalized_queries(
+        self, queries: Sequence[str], embedding_model: EmbeddingModel
+    ) -> np.ndarray:
+        return l2_normalize(
+            (await self.embed_queries(queries, embedding_model)).astype(np.float32)
+        )
+
+    def _search_rows(
+        self, np_query: np.ndarray, k: int, mask: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get the top k rows by cosine similarity to the normalized query, and their scores.
+
+        Args:
+            np_query: L2-normalized query embedding.
+            k: Number of rows to return.
+            mask: Optional boolean mask of the rows to consider.
+
+        Returns:
+            Two-tuple of row indices and their scores, sorted by descending score.
+        """
+        self._sync_rows()
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            similarity_scores = self._score_rows(np_query, candidates)
+        else:
+            candidates = np.arange(self._n_rows)
+            similarity_scores = self._score_rows(np_query, slice(0, self._n_rows))
+        return self._select_top_k(candidates, similarity_scores, np_query, k)
+
+    def _batch_search_rows(
+        self, np_queries: np.ndarray, k: int, mask: np.ndarray | None = None
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """Get `_search_rows` results for each row of a matrix of normalized queries."""
+        self._sync_rows()
+        if self.quantization is not None:
+            return [self._search_rows(np_query, k, mask) for np_query in np_queries]
+        embedding_matrix = cast("np.ndarray", self.embeddings_matrix)
+        candidates: np.ndarray | None = None
+        if mask is not None:
+            # Gather the included rows once, to score only them for every query
+            candidates = np.flatnonzero(mask)
+            embedding_matrix = embedding_matrix[candidates]
+        results: list[tuple[np.ndarray, np.ndarray]] = []
+        # Score queries in chunks, bounding the memory of the scores matrix
+        chunk_size = max(1, self.BATCH_SCORES_BUDGET // max(len(embedding_matrix), 1))
+        for start in range(0, len(np_queries), chunk_size):
+            similarity_scores = np.nan_to_num(
+                np_queries[start : start + chunk_size] @ embedding_matrix.T,
+                nan=-np.inf,
+            )
+            for query_scores in similarity_scores:
+                sorted_indices = top_k_indices(query_scores, k)
+                results.append(
+                    (
+                        (
+                            sorted_indices
+                            if candidates is None
+                            else candidates[sorted_indices]
+                        ),
+                        query_scores[sorted_indices],
+                    )
+                )
+        return results
+
+    def _search_partitioned_rows(
+        self,
+        np_query: np.ndarray,
+        k: int,
+        labels: np.ndarray,
+        mask: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get the top k rows of each partition, interleaved by rank and truncated to k.
+
+        Results alternate between partitions (in ascending label order), so the
+        first result of every partition comes before any second result.
+        """
+        self._sync_rows()
+        # Score every row in one pass, then select within each partition
+        similarity_scores = self._score_rows(np_query, slice(0, self._n_rows))
+        groups = _group_rows(labels)
+        if mask is not None:
+            groups = [rows[mask[rows]] for rows in groups]
+        results = [
+            self._select_top_k(rows, similarity_scores[rows], np_query, k)
+            for rows in groups
+            if len(rows)
+        ]
         return (
-            [
-                t
-                for t in itertools.chain.from_iterable(itertools.zip_longest(*texts))
-                if t is not None
-            ][:k],
-            [
-                s
-                for s in itertools.chain.from_iterable(itertools.zip_longest(*scores))
-                if s is not None
-            ][:k],
+            _interleave([rows for rows, _ in results])[:k],
+            _interleave([scores for _, scores in results])[:k],
         )
 
     async def similarity_search(
         self, query: str, k: int, embedding_model: EmbeddingModel
     ) -> tuple[Sequence[Embeddable], list[float]]:
-        k = min(k, len(self.texts))
+        k = min(k, self.n_live_rows)
         if k == 0:
             return [], []
 
-        # this will only affect models that embedding prompts
-        embedding_model.set_mode(EmbeddingModes.QUERY)
+        rows, scores = self._search_rows(
+            await self._embed_normalized_query(query, embedding_model),
+            k,
+            self._live_rows_mask(),
+        )
+        return [self.texts[i] for i in rows], scores.tolist()
+
+    async def batch_similarity_search(
+        self, queries: Sequence[str], k: int, embedding_model: EmbeddingModel
+    ) -> list[tuple[Sequence[Embeddable], list[float]]]:
+        k = min(k, self.n_live_rows)
+        if k == 0 or not queries:
+            return [([], []) for _ in queries]
+
+        return [
+            ([self.texts[i] for i in rows], scores.tolist())
+            for rows, scores in self._batch_search_rows(
+                await self._embed_normalized_queries(queries, embedding_model),
+                k,
+                self._live_rows_mask(),
+            )
+        ]
 
-        np_query = np.array((await embedding_model.embed_documents([query]))[0])
+    async def batch_max_marginal_relevance_search(
+        self,
+        queries: Sequence[str],
+        k: int,
+        fetch_k: int,
+        embedding_model: EmbeddingModel,
+        exclude_dockeys: Collection[str] | None = None,
+    ) -> list[tuple[Sequence[Embeddable], list[float]]]:
+        if fetch_k < k:
+            raise ValueError("fetch_k must be greater or equal to k")
 
-        embedding_model.set_mode(EmbeddingModes.DOCUMENT)
+        mask = self._included_rows_mask(exclude_dockeys)
+        fetch_k = min(fetch_k, len(self.texts) if mask is None else int(mask.sum()))
+        if fetch_k == 0 or not queries:
+            return [([], []) for _ in queries]
+
+        results: list[tuple[Sequence[Embeddable], list[float]]] = []
+        for rows, scores in self._batch_search_rows(
+            await self._embed_normalized_queries(queries, embedding_model),
+            fetch_k,
+            mask,
+        ):
+            rows, scores = self._select_mmr_rows(rows, scores, k)
+            results.append(([self.texts[i] for i in rows], scores.tolist()))
+        return results
+
+    def _select_mmr_rows(
+        self, rows: np.ndarray, scores: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if len(rows) <= k or self.mmr_lambda >= 1.0:
+            return rows, scores
+        # Reuse the stored normalized rows instead of the texts' embeddings
+        selected_indices = maximal_marginal_relevance(
+            self._exact_rows(rows),
+            scores,
+            k,
+            self.mmr_lambda,
+        )
+        return rows[selected_indices], scores[selected_indices]
+
+    async def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int,
+        fetch_k: int,
+        embedding_model: EmbeddingModel,
+        partitioning_fn: Callable[[Embeddable], int] | None = None,
+        exclude_dockeys: Collection[str] | None = None,
+    ) -> tuple[Sequence[Embeddable], list[float]]:
+        if fetch_k < k:
+            raise ValueError("fetch_k must be greater or equal to k")
 
-        embedding_matrix = self._embeddings_matrix
+        # Mask out excluded documents' rows, so their number doesn't cost anything
+        mask = self._included_rows_mask(exclude_dockeys)
+        fetch_k = min(fetch_k, len(self.texts) if mask is None else int(mask.sum()))
+        if fetch_k == 0:
+            return [], []
 
-        if self._texts_filter is not None:
-            original_indices = np.where(self._texts_filter)[0]
-            embedding_matrix = embedding_matrix[self._texts_filter]  # type: ignore[index]
+        np_query = await self._embed_normalized_query(query, embedding_model)
+        if partitioning_fn is None:
+            rows, scores = self._search_rows(np_query, fetch_k, mask)
         else:
-            original_indices = np.arange(len(self.texts))
-
-        similarity_scores = cosine_similarity(
-            np_query.reshape(1, -1), embedding_matrix
-        )[0]
-        similarity_scores = np.nan_to_num(similarity_scores, nan=-np.inf)
-        # minus so descending
-        # we could use arg-partition here
-        # but a lot of algorithms expect a sorted list
-        sorted_indices = np.argsort(-similarity_scores)
-        return (
-            [self.texts[i] for i in original_indices[sorted_indices][:k]],
-            [similarity_scores[i] for i in sorted_indices[:k]],
+            rows, scores = self._search_partitioned_rows(
+                np_query, fetch_k, self.partition_labels(partitioning_fn), mask
+            )
+        rows, scores = self._select_mmr_rows(rows, scores, k)
+        return [self.texts[i] for i in rows], scores.tolist()
+
+
+def _subclasses(cls: type[T]) -> list[type[T]]:
+    """Get every subclass of the input class, including indirect subclasses."""
+    return [s for c in cls.__subclasses__() for s in (c, *_subclasses(c))]
+
+
+def _group_rows(labels: np.ndarray) -> list[np.ndarray]:
+    """Group row indices by label, in ascending label order."""
+    order = np.argsort(labels, kind="stable")
+    _, boundaries = np.unique(labels[order], return_index=True)
+    return np.split(order, boundaries[1:]) if len(order) else []
+
+
+def _interleave(groups: Sequence[np.ndarray]) -> np.ndarray:
+    """Round-robin the input arrays: first elements of each, then second elements, etc."""
+    if not groups:
+        return np.empty(0, dtype=np.intp)
+    values = np.concatenate(groups)
+    ranks = np.concatenate([np.arange(len(g)) for g in groups])
+    group_ids = np.repeat(np.arange(len(groups)), [len(g) for g in groups])
+    return values[np.lexsort((group_ids, ranks))]
+
+
+def _nearest_centroids(
+    embeddings: np.ndarray, centroids: np.ndarray, batch_size: int = 65536
+) -> np.ndarray:
+    """Assign each L2-normalized embedding to its most similar centroid."""
+    assignments = np.empty(len(embeddings), dtype=np.intp)
+    for start in range(0, len(embeddings), batch_size):
+        batch = embeddings[start : start + batch_size]
+        assignments[start : start + len(batch)] = (batch @ centroids.T).argmax(axis=1)
+    return assignments
+
+
+def spherical_kmeans(
+    embeddings: np.ndarray, n_clusters: int, n_iterations: int, seed: int = 0
+) -> np.ndarray:
+    """Cluster L2-normalized embeddings by cosine similarity, returning the centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = embeddings[
+        rng.choice(len(embeddings), size=n_clusters, replace=False)
+    ].astype(np.float32)
+    for _ in range(n_iterations):
+        assignments = _nearest_centroids(embeddings, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, embeddings)
+        # Empty clusters keep their previous centroid
+        nonempty = np.bincount(assignments, minlength=n_clusters) > 0
+        centroids[nonempty] = l2_normalize(sums[nonempty])
+    return centroids
+
+
+class IVFVectorStore(NumpyVectorStore):
+    """Approximate nearest neighbor store using an inverted file (IVF) index.
+
+    Rows are clustered by spherical k-means, and a query only scores the rows in the
+    `n_probe` lists whose centroids are most similar to the query. Below
+    `min_train_rows` rows, searches are exact like `NumpyVectorStore`.
+    """
+
+    n_lists: int | None = Field(
+        default=None,
+        ge=1,
+        description=(
+            "Number of k-means clusters (lists) to partition rows into, leave unset"
+            " to use about the square root of the number of rows."
+        ),
+    )
+    n_probe: int = Field(
+        default=16,
+        ge=1,
+        description=(
+            "Number of lists to scan per query, higher increases recall at the cost"
+            " of latency."
+        ),
+    )
+    min_train_rows: int = Field(
+        default=50_000,
+        ge=1,
+        description="Number of rows at which the index is first trained.",
+    )
+    retrain_growth: float = Field(
+        default=2.0,
+        gt=1.0,
+        description=(
+            "Factor of growth in rows since the last training that triggers"
+            " retraining, keeping the amortized cost of retraining linear."
+        ),
+    )
+    kmeans_iterations: int = Field(default=10, ge=1)
+    _centroids: np.ndarray | None = None
+    _lists: list[np.ndarray] = PrivateAttr(default_factory=list)
+    _trained_n_rows: int = 0
+
+    def clear(self) -> None:
+        super().clear()
+        self._centroids = None
+        self._lists = []
+        self._trained_n_rows = 0
+
+    def compact(self) -> None:
+        if not self._n_removed:
+            return
+        self._sync_rows()
+        kept = ~self._removed_rows_mask()
+        super().compact()
+        if self.is_trained:
+            # Renumber the kept rows of each list, keeping the centroids
+            new_rows = np.cumsum(kept) - 1
+            self._lists = [new_rows[rows[kept[rows]]] for rows in self._lists]
+            self._trained_n_rows = int(kept[: self._trained_n_rows].sum())
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def train(self) -> None:
+        """Cluster the current rows and rebuild the inverted lists."""
+        self._sync_rows()
+        embeddings = cast("np.ndarray", self.embeddings_matrix)
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(self._n_rows))), self._n_rows)
+        # Train on a sample, as centroids converge well before using every row
+        sample = embeddings[
+            np.random.default_rng(0).choice(
+                self._n_rows, size=min(self._n_rows, 256 * n_lists), replace=False
+            )
+        ]
+        self._centroids = spherical_kmeans(
+            sample, n_clusters=n_lists, n_iterations=self.kmeans_iterations
         )
+        self._lists = [np.empty(0, dtype=np.intp) for _ in range(n_lists)]
+        self._trained_n_rows = 0
+        self._assign_rows(0, self._n_rows)
+
+    def _assign_rows(self, start: int, stop: int) -> None:
+        """Append rows in the input range to their nearest centroid's list."""
+        assignments = _nearest_centroids(
+            self._dequantize(slice(start, stop)),
+            cast("np.ndarray", self._centroids),
+        )
+        order = np.argsort(assignments, kind="stable")
+        list_ids, boundaries = np.unique(assignments[order], return_index=True)
+        for list_id, rows in zip(
+            list_ids, np.split(order + start, boundaries[1:]), strict=True
+        ):
+            self._lists[list_id] = np.concatenate((self._lists[list_id], rows))
+        self._trained_n_rows = max(self._trained_n_rows, stop)
+
+    def _append_rows(self, texts: Sequence[Embeddable]) -> None:
+        start = self._n_rows
+        super()._append_rows(texts)
+        if self.is_trained and self._n_rows > start:
+            self._assign_rows(start, self._n_rows)
+
+    def _maybe_train(self) -> None:
+        if self._n_rows < self.min_train_rows:
+            return
+        if not self.is_trained or self._n_rows >= (
+            self.retrain_growth * self._trained_n_rows
+        ):
+            self.train()
+
+    def _search_rows(
+        self, np_query: np.ndarray, k: int, mask: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        self._sync_rows()
+        self._maybe_train()
+        if not self.is_trained:
+            return super()._search_rows(np_query, k, mask)
+
+        # Probe lists from most to least similar centroid, until at least
+        # n_probe lists have been probed and there are k candidates
+        probe_order = np.argsort(-(cast("np.ndarray", self._centroids) @ np_query))
+        candidate_chunks: list[np.ndarray] = []
+        n_candidates = 0
+        for i, list_id in enumerate(probe_order):
+            if i >= self.n_probe and n_candidates >= k:
+                break
+            rows = self._lists[list_id]
+            if mask is not None:
+                rows = rows[mask[rows]]
+            candidate_chunks.append(rows)
+            n_candidates += len(rows)
+        candidates = np.concatenate(candidate_chunks)
+        return self._select_top_k(
+            candidates, self._score_rows(np_query, candidates), np_query, k
+        )
+
+    def _batch_search_rows(
+        self, np_queries: np.ndarray, k: int, mask: np.ndarray | None = None
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        self._sync_rows()
+        self._maybe_train()
+        if not self.is_trained:
+            return super()._batch_search_rows(np_queries, k, mask)
+        # Each query probes different lists, so there's no shared matrix to score
+        return [self._search_rows(np_query, k, mask) for np_query in np_queries]
+
+    def _search_partitioned_rows(
+        self,
+        np_query: np.ndarray,
+        k: int,
+        labels: np.ndarray,
+        mask: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        self._sync_rows()
+        self._maybe_train()
+        if not self.is_trained:
+            return super()._search_partitioned_rows(np_query, k, labels, mask)
+
+        # Probe per partition, so small partitions still get k candidates
+        results = [
+            self._search_rows(
+                np_query,
+                k,
+                mask=labels == label if mask is None else (labels == label) & mask,
+            )
+            for label in np.unique(labels if mask is None else labels[mask])
+        ]
+        rows = _interleave([r for r, _ in results])[:k]
+        scores = _interleave([s for _, s in results])[:k]
+        return rows, scores
 
 
 class QdrantVectorStore(VectorStore):  # noqa: PLW1641  # TODO: add __hash__
@@ -284,8 +2137,37 @@ class QdrantVectorStore(VectorStore):  # noqa: PLW1641  # TODO: add __hash__
     )
     collection_name: str = Field(default_factory=lambda: f"paper-qa-{uuid.uuid4().hex}")
     vector_name: str | None = Field(default=None)
+    upsert_batch_size: int = Field(
+        default=256, ge=1, description="Number of points per upsert request."
+    )
+    max_concurrent_upserts: int = Field(
+        default=4,
+        ge=1,
+        description=(
+            "Max number of upsert requests in flight, which also bounds how many"
+            " batches of points are held in memory."
+        ),
+    )
+    partitioning_fns: dict[str, Callable[[Embeddable], int]] = Field(
+        default_factory=dict,
+        exclude=True,
+        description=(
+            "Partitioning functions by a stable name, whose labels are stored in the"
+            " payload of each point upserted, so partitioned searches by them are"
+            " grouped within Qdrant. Register them before adding texts. Searches by"
+            " other partitioning functions label a shortlist of points client-side."
+        ),
+    )
     _point_ids: set[str] | None = None
 
+    # Payload key of the texts' document key, indexed for filtering
+    DOCKEY_PAYLOAD_KEY: ClassVar[str] = "doc.dockey"
+    PARTITION_PAYLOAD_KEY_PREFIX: ClassVar[str] = "partition_"
+    # Max number of partitions a grouped search returns
+    MAX_PARTITIONS: ClassVar[int] = 1024
+    # Multiple of k points to shortlist, when labelling partitions client-side
+    PARTITION_SHORTLIST_FACTOR: ClassVar[int] = 4
+
     def __del__(self):
         """Cleanup async client connection."""
         try:
@@ -301,6 +2183,13 @@ class QdrantVectorStore(VectorStore):  # noqa: PLW1641  # TODO: add __hash__
         """Explicitly close async client."""
         await self.client.close()
 
+    def __contains__(self, item) -> bool:
+        # Point IDs include the dockey, unlike hashes of texts' names and contents
+        return self._point_ids is not None and self.point_id(item) in self._point_ids
+
+    def __len__(self) -> int:
+        return len(self._point_ids) if self._point_ids is not None else 0
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, type(self)):
             return NotImplemented
@@ -364,48 +2253,263 @@ class QdrantVectorStore(VectorStore):  # noqa: PLW1641  # TODO: add __hash__
         await self.client.delete_collection(collection_name=self.collection_name)
         self._point_ids = None
 
-    async def add_texts_and_embeddings(self, texts: Iterable[Embeddable]) -> None:
-        await super().add_texts_and_embeddings(texts)
-
-        texts_list = list(texts)
+    async def _create_payload_index(
+        self, field_name: str, field_schema: "models.PayloadSchemaType"
+    ) -> None:
+        # Local mode has no payload indexes, and warns when creating them
+        options = self.client.init_options
+        if options.get("location") == ":memory:" or options.get("path") is not None:
+            return
+        await self.client.create_payload_index(
+            self.collection_name, field_name=field_name, field_schema=field_schema
+        )
 
-        if texts_list and not await self._collection_exists():
-            params = models.VectorParams(
-                size=len(cast("Sized", texts_list[0].embedding)),
-                distance=models.Distance.COSINE,
+    @staticmethod
+    def point_id(text: Embeddable) -> str:
+        """Get a deterministic point ID from a text's dockey, name, and contents."""
+        if isinstance(text, Text):
+            key = "/".join(
+                (
+                    str(text.doc.dockey),
+                    text.name,
+                    hashlib.sha256(text.text.encode()).hexdigest(),
+                )
             )
+        else:
+            key = str(text.embedding)
+        return uuid.uuid5(uuid.NAMESPACE_URL, key).hex
+
+    async def add_texts_and_embeddings(self, texts: Iterable[Embeddable]) -> None:
+        """Stream texts into the collection in concurrent batches of upserts.
+
+        The texts are consumed lazily, so memory stays bounded by the batches in
+        flight rather than growing with the number of texts.
+        """
+        iter_texts = iter(texts)
+        pending: set[asyncio.Task] = set()
+        try:
+            while batch := list(itertools.islice(iter_texts, self.upsert_batch_size)):
+                await super().add_texts_and_embeddings(batch)
+                if self._point_ids is None:
+                    if not await self._collection_exists():
+                        params = models.VectorParams(
+                            size=len(cast("Sized", batch[0].embedding)),
+                            distance=models.Distance.COSINE,
+                        )
+                        await self.client.create_collection(
+                            self.collection_name,
+                            vectors_config=(
+                                {self.vector_name: params}
+                                if self.vector_name
+                                else params
+                            ),
+                        )
+                        # Index document keys, so excluding documents is filtered cheaply
+                        await self._create_payload_index(
+                            self.DOCKEY_PAYLOAD_KEY, models.PayloadSchemaType.KEYWORD
+                        )
+                        for name in self.partitioning_fns:
+                            await self._create_payload_index(
+                                self.PARTITION_PAYLOAD_KEY_PREFIX + name,
+                                models.PayloadSchemaType.INTEGER,
+                            )
+                    self._point_ids = set()
+
+                if len(pending) >= self.max_concurrent_upserts:
+                    # Wait for a slot before building more points, bounding memory
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    await asyncio.gather(*done)  # Raise any failure
+                # Columnar batches skip the client's per-point inspection
+                ids = [self.point_id(text) for text in batch]
+                vectors = [cast("list[float]", text.embedding) for text in batch]
+                points = models.Batch(
+                    ids=cast("list[models.ExtendedPointId]", ids),
+                    payloads=[self._payload(text) for text in batch],
+                    vectors=(
+                        {self.vector_name: vectors} if self.vector_name else vectors
+                    ),
+                )
+                pending.add(asyncio.create_task(self._upsert(ids, points)))
+            await asyncio.gather(*pending)
+        except BaseException:
+            # Don't leave upserts running unobserved after a failure
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+    def _payload(self, text: Embeddable) -> dict[str, Any]:
+        """Get a text's point payload, including its registered partitions' labels."""
+        payload = text.model_dump(exclude={"embedding"})
+        for name, partitioning_fn in self.partitioning_fns.items():
+            payload[self.PARTITION_PAYLOAD_KEY_PREFIX + name] = partitioning_fn(text)
+        return payload
+
+    async def _upsert(self, ids: list[str], points: "models.Batch") -> None:
+        """Upsert a batch of points, recording their IDs once they're stored."""
+        await self.client.upsert(collection_name=self.collection_name, points=points)
+        cast("set[str]", self._point_ids).update(ids)
+
+    async def remove_texts(self, texts: Iterable[Embeddable]) -> None:
+        """Delete the texts' points from the collection.
+
+        Qdrant marks deleted points and its optimizers vacuum them in the
+        background, so there's no compaction to trigger here.
+        """
+        texts = list(texts)
+        if not texts or not await self._collection_exists():
+            return
+        ids = [self.point_id(text) for text in texts]
+        await self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(
+                points=cast("list[models.ExtendedPointId]", ids)
+            ),
+        )
+        # Other documents' texts may share a removed text's hash, which drops
+        # their hash too, and at worst causes an idempotent re-upsert of them
+        self.texts_hashes.difference_update(hash(t) for t in texts)
+        if self._point_ids is not None:
+            self._point_ids.difference_update(ids)
 
-            await self.client.create_collection(
-                self.collection_name,
-                vectors_config=(
-                    {self.vector_name: params} if self.vector_name else params
+    async def remove_doc(self, dockey: str) -> None:
+        if not await self._collection_exists():
+            return
+        texts: list[Text] = []
+        offset: models.ExtendedPointId | None = None
+        while True:
+            points, offset = await self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=models.Filter(
+                    must=[
+                        models.FieldCondition(
+                            key=self.DOCKEY_PAYLOAD_KEY,
+                            match=models.MatchValue(value=dockey),
+                        )
+                    ]
                 ),
+                limit=self.upsert_batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            texts.extend(
+                Text(**cast("dict[str, Any]", point.payload)) for point in points
             )
+            if offset is None:
+                break
+        await self.remove_texts(texts)
+
+    def _query_filter(
+        self, exclude_dockeys: Collection[str] | None
+    ) -> "models.Filter | None":
+        """Get a filter excluding the texts of the input documents, if any."""
+        if not exclude_dockeys:
+            return None
+        return models.Filter(
+            must_not=[
+                models.FieldCondition(
+                    key=self.DOCKEY_PAYLOAD_KEY,
+                    match=models.MatchAny(any=sorted(exclude_dockeys)),
+                )
+            ]
+        )
 
-        ids, payloads, vectors = [], [], []
-        for text in texts_list:
-            ids.append(uuid.uuid5(uuid.NAMESPACE_URL, str(text.embedding)).hex)
-            payloads.append(text.model_dump(exclude={"embedding"}))
-            vectors.append(
-                {self.vector_name: text.embedding}
-                if self.vector_name
-                else text.embedding
+    async def _search(
+        self, np_query: np.ndarray, k: int, query_filter: "models.Filter | None"
+    ) -> tuple[list[Text], list[float]]:
+        points = (
+            await self.client.query_points(
+                collection_name=self.collection_name,
+                query=np_query,
+                using=self.vector_name,
+                query_filter=query_filter,
+                limit=k,
+                with_vectors=True,
+                with_payload=True,
             )
+        ).points
+        return self._points_to_texts(points)
 
-        await self.client.upsert(
+    async def _batch_search(
+        self, np_queries: np.ndarray, k: int, query_filter: "models.Filter | None"
+    ) -> list[tuple[list[Text], list[float]]]:
+        responses = await self.client.query_batch_points(
             collection_name=self.collection_name,
-            points=[
-                models.PointStruct(
-                    id=some_id,
-                    payload=some_payload,
-                    vector=some_vector,
-                )
-                for some_id, some_payload, some_vector in zip(
-                    ids, payloads, vectors, strict=True
+            requests=[
+                models.QueryRequest(
+                    query=np_query.tolist(),
+                    using=self.vector_name,
+                    filter=query_filter,
+                    limit=k,
+                    with_vector=True,
+                    with_payload=True,
                 )
+                for np_query in np_queries
             ],
         )
-        self._point_ids = set(ids)
+        return [self._points_to_texts(r.points) for r in responses]
+
+    def _partition_payload_key(
+        self, partitioning_fn: Callable[[Embeddable], int]
+    ) -> str | None:
+        """Get the payload key of a registered partitioning function's labels, if any."""
+        for name, registered_fn in self.partitioning_fns.items():
+            if registered_fn is partitioning_fn:
+                return self.PARTITION_PAYLOAD_KEY_PREFIX + name
+        return None
+
+    async def _search_partitioned(
+        self,
+        np_query: np.ndarray,
+        k: int,
+        partitioning_fn: Callable[[Embeddable], int],
+        query_filter: "models.Filter | None",
+    ) -> tuple[list[Text], list[float]]:
+        """Get the top k points of each partition, interleaved by rank and truncated to k.
+
+        Matches `NumpyVectorStore`, alternating between partitions in ascending
+        label order. Registered partitioning functions' labels are in the points'
+        payloads, so Qdrant groups points by them, limiting each partition to k
+        points. Otherwise, the top points are shortlisted and labelled client-side,
+        so partitions absent from the shortlist are missed.
+        """
+        key = self._partition_payload_key(partitioning_fn)
+        if key is None:
+            texts, scores = await self._search(
+                np_query, k * self.PARTITION_SHORTLIST_FACTOR, query_filter
+            )
+            rows_by_label: dict[int, list[int]] = defaultdict(list)
+            for i, text in enumerate(texts):
+                rows_by_label[partitioning_fn(text)].append(i)
+            rows = _interleave(
+                [np.array(rows_by_label[label]) for label in sorted(rows_by_label)]
+            )[:k]
+            return [texts[i] for i in rows], [scores[i] for i in rows]
+
+        groups = (
+            await self.client.query_points_groups(
+                collection_name=self.collection_name,
+                group_by=key,
+                query=np_query,
+                using=self.vector_name,
+                query_filter=query_filter,
+                limit=self.MAX_PARTITIONS,
+                group_size=k,
+                with_vectors=True,
+                with_payload=True,
+            )
+        ).groups
+        groups.sort(key=lambda g: g.id)
+        points = [
+            group.hits[rank]
+            for rank in range(max((len(g.hits) for g in groups), default=0))
+            for group in groups
+            if rank < len(group.hits)
+        ]
+        return self._points_to_texts(points[:k])
 
     async def similarity_search(
         self, query: str, k: int, embedding_model: EmbeddingModel
@@ -413,21 +2517,91 @@ class QdrantVectorStore(VectorStore):  # noqa: PLW1641  # TODO: add __hash__
         if not await self._collection_exists():
             return ([], [])
 
-        embedding_model.set_mode(EmbeddingModes.QUERY)
-        np_query = np.array((await embedding_model.embed_documents([query]))[0])
-        embedding_model.set_mode(EmbeddingModes.DOCUMENT)
+        return await self._search(
+            await self.embed_query(query, embedding_model), k, query_filter=None
+        )
 
-        points = (
-            await self.client.query_points(
-                collection_name=self.collection_name,
-                query=np_query,
-                using=self.vector_name,
-                limit=k,
-                with_vectors=True,
-                with_payload=True,
+    async def batch_similarity_search(
+        self, queries: Sequence[str], k: int, embedding_model: EmbeddingModel
+    ) -> list[tuple[Sequence[Embeddable], list[float]]]:
+        if not queries or not await self._collection_exists():
+            return [([], []) for _ in queries]
+
+        return list(
+            await self._batch_search(
+                await self.embed_queries(queries, embedding_model),
+                k,
+                query_filter=None,
             )
-        ).points
+        )
+
+    async def partitioned_similarity_search(
+        self,
+        query: str,
+        k: int,
+        embedding_model: EmbeddingModel,
+        partitioning_fn: Callable[[Embeddable], int],
+    ) -> tuple[Sequence[Embeddable], list[float]]:
+        if not await self._collection_exists():
+            return ([], [])
+
+        return await self._search_partitioned(
+            await self.embed_query(query, embedding_model),
+            k,
+            partitioning_fn,
+            query_filter=None,
+        )
+
+    async def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int,
+        fetch_k: int,
+        embedding_model: EmbeddingModel,
+        partitioning_fn: Callable[[Embeddable], int] | None = None,
+        exclude_dockeys: Collection[str] | None = None,
+    ) -> tuple[Sequence[Embeddable], list[float]]:
+        if fetch_k < k:
+            raise ValueError("fetch_k must be greater or equal to k")
+        if not await self._collection_exists():
+            return ([], [])
+
+        np_query = await self.embed_query(query, embedding_model)
+        # Qdrant filters out excluded documents, so fetch_k needn't grow with them
+        query_filter = self._query_filter(exclude_dockeys)
+        if partitioning_fn is None:
+            texts, scores = await self._search(np_query, fetch_k, query_filter)
+        else:
+            texts, scores = await self._search_partitioned(
+                np_query, fetch_k, partitioning_fn, query_filter
+            )
+        return self._select_mmr(texts, scores, k)
+
+    async def batch_max_marginal_relevance_search(
+        self,
+        queries: Sequence[str],
+        k: int,
+        fetch_k: int,
+        embedding_model: EmbeddingModel,
+        exclude_dockeys: Collection[str] | None = None,
+    ) -> list[tuple[Sequence[Embeddable], list[float]]]:
+        if fetch_k < k:
+            raise ValueError("fetch_k must be greater or equal to k")
+        if not queries or not await self._collection_exists():
+            return [([], []) for _ in queries]
+
+        return [
+            self._select_mmr(texts, scores, k)
+            for texts, scores in await self._batch_search(
+                await self.embed_queries(queries, embedding_model),
+                fetch_k,
+                self._query_filter(exclude_dockeys),
+            )
+        ]
 
+    def _points_to_texts(
+        self, points: "Sequence[models.ScoredPoint]"
+    ) -> tuple[list[Text], list[float]]:
         return (
             [
                 Text(
@@ -448,78 +2622,185 @@ class QdrantVectorStore(VectorStore):  # noqa: PLW1641  # TODO: add __hash__
         collection_name: str,
         vector_name: str | None = None,
         batch_size: int = 100,
-        max_concurrent_requests: int = 5,
+        max_concurrent_requests: int | None = None,
+        with_vectors: bool = True,
+        with_text: bool = True,
     ) -> "Docs":
+        """Load a `Docs` from a collection, see `iter_load_docs` for the arguments."""
+        if max_concurrent_requests is not None:
+            warnings.warn(
+                "The 'max_concurrent_requests' argument is ignored, as pages are"
+                " fetched by following Qdrant's cursor, and will be removed in"
+                " version 6.",
+                category=DeprecationWarning,
+                stacklevel=2,
+            )
+        docs: Docs | None = None
+        async for docs in cls.iter_load_docs(  # noqa: B007
+            client,
+            collection_name,
+            vector_name=vector_name,
+            batch_size=batch_size,
+            with_vectors=with_vectors,
+            with_text=with_text,
+        ):
+            pass
+        if docs is None:
+            raise RuntimeError(f"Loading collection {collection_name} yielded no Docs.")
+        return docs
+
+    @classmethod
+    async def iter_load_docs(
+        cls,
+        client: "AsyncQdrantClient",
+        collection_name: str,
+        vector_name: str | None = None,
+        batch_size: int = 100,
+        with_vectors: bool = True,
+        with_text: bool = True,
+    ) -> AsyncIterator["Docs"]:
+        """Incrementally hydrate a `Docs` from a collection, one page of points at a time.
+
+        Pages are fetched by following Qdrant's `next_page_offset` cursor, and the
+        next page is fetched while the current one is hydrated. Loaded points are
+        marked as already indexed, so the `Docs` doesn't re-upsert them.
+
+        Args:
+            client: Client of the Qdrant instance holding the collection.
+            collection_name: Name of the collection to load.
+            vector_name: Optional name of the vector in the collection.
+            batch_size: Number of points per page.
+            with_vectors: Opt-out flag to skip loading embeddings, for faster and
+                smaller loads. Searches are done by Qdrant, which returns
+                embeddings alongside the matching texts.
+            with_text: Opt-out flag to skip loading the texts' contents, leaving
+                `Docs.texts` as placeholders (with empty text) for the documents.
+                Searches still return the full texts from Qdrant.
+
+        Yields:
+            The same `Docs`, after each page of points is hydrated into it.
+        """
         from paperqa.docs import Docs  # Avoid circular imports
 
         vectorstore = cls(
             client=client, collection_name=collection_name, vector_name=vector_name
         )
+        vectorstore._point_ids = set()
         docs = Docs(texts_index=vectorstore)
 
-        collection_info = await client.get_collection(collection_name)
-        total_points = collection_info.points_count or 0
+        async def fetch_page(
+            offset: "models.ExtendedPointId | None",
+        ) -> "tuple[list[Record], models.ExtendedPointId | None]":
+            return await client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=(
+                    True
+                    if with_text
+                    else models.PayloadSelectorExclude(exclude=["text"])
+                ),
+                with_vectors=with_vectors,
+            )
 
-        semaphore = asyncio.Semaphore(max_concurrent_requests)
-        all_points: list[Record] = []
+        start_time = time.perf_counter()
+        n_points = 0
+        next_page = asyncio.create_task(fetch_page(None))
+        while next_page is not None:
+            points, offset = await next_page
+            # Prefetch the next page while hydrating this one
+            next_page = (
+                asyncio.create_task(fetch_page(offset)) if offset is not None else None
+            )
+            for point in points:
+                cls._hydrate_point(docs, point, vector_name, with_vectors)
+            n_points += len(points)
+            yield docs
+
+        elapsed = time.perf_counter() - start_time
+        logger.info(
+            f"Loaded {n_points} points into {len(docs.docs)} docs from collection"
+            f" {collection_name} in {elapsed:.1f}-sec"
+            f" ({n_points / max(elapsed, 1e-9):.0f} points/sec)."
+        )
 
-        async def fetch_batch_with_semaphore(offset: int) -> None:
-            async with semaphore:
-                points = await client.scroll(
-                    collection_name=collection_name,
-                    limit=batch_size,
-                    offset=offset,
-                    with_payload=True,  # noqa: FURB120
-                    with_vectors=True,
+    @staticmethod
+    def _hydrate_point(
+        docs: "Docs",
+        point: "Record",
+        vector_name: str | None,
+        with_vectors: bool = True,
+    ) -> None:
+        """Add a point's document and text to the `Docs`, skipping invalid points."""
+        try:
+            if point.payload is None:
+                return
+
+            payload = point.payload
+            doc_data = payload.get("doc", {})
+            if not isinstance(doc_data, dict):
+                return
+
+            doc = docs.docs.get(doc_data["dockey"])
+            if doc is None:
+                doc = Doc(
+                    docname=doc_data.get("docname", ""),
+                    citation=doc_data.get("citation", ""),
+                    dockey=doc_data["dockey"],
                 )
-                all_points.extend(points[0])
 
-        tasks = [
-            fetch_batch_with_semaphore(offset)
-            for offset in range(0, total_points, batch_size)
-        ]
-        await asyncio.gather(*tasks)
+            if with_vectors and point.vector is None:
+                docs._append_texts(doc, [])
+                return
 
-        for point in all_points:
-            try:
-                if point.payload is None:
-                    continue
-
-                payload = point.payload
-                doc_data = payload.get("doc", {})
-                if not isinstance(doc_data, dict):
-                    continue
-
-                if doc_data.get("dockey") not in docs.docs:
-                    docs.docs[doc_data["dockey"]] = Doc(
-                        docname=doc_data.get("docname", ""),
-                        citation=doc_data.get("citation", ""),
-                        dockey=doc_data["dockey"],
-                    )
-                    docs.docnames.add(doc_data.get("docname", ""))
+            vector_value = (
+                point.vector.get(vector_name)
+                if vector_name and isinstance(point.vector, dict)
+                else point.vector
+            )
 
-                if point.vector is None:
-                    continue
+            text = Text(
+                text=payload.get("text", ""),
+                name=payload.get("name", ""),
+                doc=doc,
+                embedding=vector_value,
+            )
+            # The point is already in the collection, so don't add it again
+            docs._append_texts(doc, [text], indexed=True)
+            # Qdrant returns hyphenated UUIDs, whereas point IDs are unhyphenated
+            cast(
+                "set[str]", cast("QdrantVectorStore", docs.texts_index)._point_ids
+            ).add(uuid.UUID(str(point.id)).hex)
 
-                vector_value = (
-                    point.vector.get(vector_name)
-                    if vector_name and isinstance(point.vector, dict)
-                    else point.vector
-                )
+        except KeyError as e:
+            logger.warning(f"Skipping invalid point due to missing field: {e!s}")
 
-                text = Text(
-                    text=payload.get("text", ""),
-                    name=payload.get("name", ""),
-                    doc=docs.docs[doc_data["dockey"]],
-                    embedding=vector_value,
-                )
-                docs.texts.append(text)
 
-            except KeyError as e:
-                logger.warning(f"Skipping invalid point due to missing field: {e!s}")
-                continue
+def vector_store_factory(vector_store: str, **kwargs) -> VectorStore:
+    """
+    Factory function to create an appropriate VectorStore based on its name.
 
-        return docs
+    Supports:
+    - "numpy": exact (brute force) search via `NumpyVectorStore`
+    - "ivf": approximate search for large corpora via `IVFVectorStore`
+    - "qdrant": `QdrantVectorStore`, defaulting to an in-memory Qdrant client
+
+    Args:
+        vector_store: The vector store identifier.
+        **kwargs: Additional keyword arguments for the vector store.
+    """
+    vector_store_classes: dict[str, type[VectorStore]] = {
+        "numpy": NumpyVectorStore,
+        "ivf": IVFVectorStore,
+        "qdrant": QdrantVectorStore,
+    }
+    try:
+        return vector_store_classes[vector_store.strip().lower()](**kwargs)
+    except KeyError:
+        raise ValueError(
+            f"Unknown vector store {vector_store!r}, supported options are"
+            f" {sorted(vector_store_classes)}."
+        ) from None
 
 
 def embedding_model_factory(embedding: str, **kwargs) -> EmbeddingModel:
@@ -2,6 +2,9 @@ from __future__ import annotations
 
 import asyncio
 import os
+from collections.abc import Callable
+from concurrent.futures import Executor
+from functools import partial
 from math import ceil
 from pathlib import Path
 from typing import Literal, Protocol, cast, overload, runtime_checkable
@@ -321,6 +324,27 @@ def chunk_code_text(
     return texts
 
 
+async def _run_parser(
+    fn: Callable[..., ParsedText],
+    path: str | os.PathLike,
+    executor: Executor | None,
+    /,
+    thread_safe: bool = True,
+    **kwargs,
+) -> ParsedText:
+    """Run a parsing function in the executor, or otherwise in a thread if it's safe."""
+    if executor is not None:
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, partial(fn, path, **kwargs)
+        )
+    if not thread_safe:
+        # Some PDF parsers are not thread-safe,
+        # so can't use multithreading via `asyncio.to_thread` here
+        return fn(path, **kwargs)
+    # TODO: Make parse_text async
+    return await asyncio.to_thread(fn, path, **kwargs)
+
+
 @overload
 async def read_doc(
     path: str | os.PathLike,
@@ -330,6 +354,7 @@ async def read_doc(
     chunk_chars: int = ...,
     overlap: int = ...,
     parse_pdf: PDFParserFn | None = ...,
+    executor: Executor | None = ...,
     **parser_kwargs,
 ) -> ParsedText: ...
 @overload
@@ -341,6 +366,7 @@ async def read_doc(
     chunk_chars: int = ...,
     overlap: int = ...,
     parse_pdf: PDFParserFn | None = ...,
+    executor: Executor | None = ...,
     **parser_kwargs,
 ) -> ParsedText: ...
 @overload
@@ -352,6 +378,7 @@ async def read_doc(
     chunk_chars: int = ...,
     overlap: int = ...,
     parse_pdf: PDFParserFn | None = ...,
+    executor: Executor | None = ...,
     **parser_kwargs,
 ) -> tuple[list[Text], ParsedMetadata]: ...
 @overload
@@ -363,6 +390,7 @@ async def read_doc(
     chunk_chars: int = ...,
     overlap: int = ...,
     parse_pdf: PDFParserFn | None = ...,
+    executor: Executor | None = ...,
     **parser_kwargs,
 ) -> list[Text]: ...
 @overload
@@ -374,6 +402,7 @@ async def read_doc(
     chunk_chars: int = ...,
     overlap: int = ...,
     parse_pdf: PDFParserFn | None = ...,
+    executor: Executor | None = ...,
     **parser_kwargs,
 ) -> tuple[list[Text], ParsedMetadata]: ...
 async def read_doc(
@@ -384,6 +413,7 @@ async def read_doc(
     chunk_chars: int = 3000,
     overlap: int = 100,
     parse_pdf: PDFParserFn | None = None,
+    executor: Executor | None = None,
     **parser_kwargs,
 ) -> list[Text] | ParsedText | tuple[list[Text], ParsedMetadata]:
     """Parse a document and split into chunks.
@@ -397,6 +427,8 @@ async def read_doc(
         chunk_chars: size of chunks
         overlap: size of overlap between chunks
         parse_pdf: Optional function to parse PDF files (if you're parsing a PDF).
+        executor: Optional executor to parse in, such as a process pool for parsing
+            many documents in parallel. Its parsing functions must then be picklable.
         parser_kwargs: Keyword arguments to pass to the used parsing function.
     """
     str_path = str(path)
@@ -405,23 +437,25 @@ async def read_doc(
     if str_path.endswith(".pdf"):
         if parse_pdf is None:
             raise ValueError("When parsing a PDF, a parsing function must be provided.")
-        # Some PDF parsers are not thread-safe,
-        # so can't use multithreading via `asyncio.to_thread` here
-        parsed_text: ParsedText = parse_pdf(path, **parser_kwargs)
+        parsed_text: ParsedText = await _run_parser(
+            parse_pdf, path, executor, thread_safe=False, **parser_kwargs
+        )
     elif str_path.endswith(".txt"):
-        # TODO: Make parse_text async
-        parsed_text = await asyncio.to_thread(parse_text, path, **parser_kwargs)
+        parsed_text = await _run_parser(parse_text, path, executor, **parser_kwargs)
     elif str_path.endswith(".html"):
         parser_kwargs.pop("use_block_parsing", None)  # Not a parse_text kwarg
-        parsed_text = await asyncio.to_thread(
-            parse_text, path, html=True, **parser_kwargs
-            parse_text, path, html=True, **parser_kwargs
+        parsed_text = await _run_parser(
+            parse_text, path, executor, html=True, **parser_kwargs
         )
     else:
         parser_kwargs.pop("use_block_parsing", None)  # Not a parse_text kwarg
-        parsed_text = await asyncio.to_thread(
-            parse_text, path, split_lines=True, use_tiktoken=False, **parser_kwargs
-            parse_text, path, split_lines=True, use_tiktoken=False, **parser_kwargs
+        parsed_text = await _run_parser(
+            parse_text,
+            path,
+            executor,
+            split_lines=True,
+            use_tiktoken=False,
+            **parser_kwargs,
         )
 
     if parsed_text_only:
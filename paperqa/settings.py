@@ -39,6 +39,7 @@ from paperqa._ldp_shims import (
     _Memories,
     set_training_mode,
 )
+from paperqa.llms import VectorStore, vector_store_factory
 from paperqa.prompts import (
     CONTEXT_INNER_PROMPT,
     CONTEXT_OUTER_PROMPT,
@@ -702,6 +703,36 @@ class Settings(BaseSettings):
     texts_index_mmr_lambda: float = Field(
         default=1.0, description="Lambda for MMR in text index."
     )
+    texts_index: str = Field(
+        default="numpy",
+        description=(
+            "Vector store for the text index of new Docs, either 'numpy' for exact"
+            " search, 'ivf' for approximate search over large corpora, or 'qdrant'."
+        ),
+    )
+    texts_index_config: dict | None = Field(
+        default=None,
+        description=(
+            "Optional keyword arguments for the text index's vector store, such as"
+            " `n_probe` to trade latency for recall with 'ivf'."
+        ),
+    )
+    texts_index_lexical: bool = Field(
+        default=False,
+        description=(
+            "Opt-in flag to fuse BM25 lexical retrieval with the text index's dense"
+            " retrieval by reciprocal-rank fusion, helping exact names (e.g. genes or"
+            " compounds) be retrieved. Partitioned retrieval stays dense-only."
+        ),
+    )
+    texts_index_rrf_k: int = Field(
+        default=60,
+        ge=1,
+        description=(
+            "Constant of reciprocal-rank fusion, where lower values weigh top ranks"
+            " more heavily."
+        ),
+    )
     index_absolute_directory: bool = Field(
         default=False,
         description="Whether to use the absolute paper directory for the PQA index.",
@@ -895,6 +926,9 @@ class Settings(BaseSettings):
     def get_embedding_model(self) -> EmbeddingModel:
         return embedding_model_factory(self.embedding, **(self.embedding_config or {}))
 
+    def get_texts_index(self) -> VectorStore:
+        return vector_store_factory(self.texts_index, **(self.texts_index_config or {}))
+
     def make_aviary_tool_selector(self, agent_type: str | type) -> ToolSelector | None:
         """Attempt to convert the input agent type to an aviary ToolSelector."""
         if agent_type is ToolSelector or (
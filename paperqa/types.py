@@ -3,16 +3,22 @@ from __future__ import annotations
 import ast
 import csv
 import logging
+import operator
 import os
 import re
+import time
 import warnings
-from collections.abc import Collection, Iterable, Mapping, Sequence
+import weakref
+from array import array
+from collections.abc import Collection, Iterable, Iterator, Mapping, Sequence
+from contextlib import contextmanager
 from copy import deepcopy
 from datetime import datetime
 from enum import StrEnum
-from typing import Annotated, Any, ClassVar, Self, cast
+from typing import Annotated, Any, ClassVar, Self, SupportsIndex, cast, overload
 from uuid import UUID, uuid4
 
+import numpy as np
 import tiktoken
 from aviary.core import Message
 from lmi import Embeddable, LLMResult
@@ -23,11 +29,17 @@ from pydantic import (
     BaseModel,
     ConfigDict,
     Field,
+    GetCoreSchemaHandler,
     PlainSerializer,
+    SerializationInfo,
+    SerializerFunctionWrapHandler,
+    TypeAdapter,
     computed_field,
     field_validator,
+    model_serializer,
     model_validator,
 )
+from pydantic_core import core_schema
 
 from paperqa.utils import (
     create_bibtex_key,
@@ -83,6 +95,12 @@ class Doc(Embeddable):
     def formatted_citation(self) -> str:
         return self.citation
 
+    def without_embedding(self) -> Self:
+        """Get this document without its embedding, sharing it if it has none."""
+        if self.embedding is None:
+            return self
+        return self.model_copy(update={"embedding": None})
+
     def matches_filter_criteria(self, filter_criteria: Mapping[str, Any]) -> bool:
         """Returns True if the doc matches the filter criteria, False otherwise."""
         data_dict = self.model_dump()
@@ -160,6 +178,378 @@ class Text(Embeddable):
         return hash((self.name, self.text))
 
 
+class _StringColumn:
+    """Strings packed into one contiguous UTF-8 buffer, delimited by offsets."""
+
+    def __init__(
+        self, buffer: np.ndarray | None = None, offsets: np.ndarray | None = None
+    ) -> None:
+        """Initialize, optionally viewing existing (e.g. memory-mapped) arrays.
+
+        Viewed arrays are copied into memory on the first append.
+        """
+        self.buffer: bytearray | memoryview = (
+            bytearray() if buffer is None else memoryview(buffer)
+        )
+        self.offsets: array | np.ndarray = (
+            array("q", [0]) if offsets is None else offsets
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return str(self.buffer[self.offsets[i] : self.offsets[i + 1]], "utf-8")
+
+    def append(self, value: str) -> None:
+        if not isinstance(self.buffer, bytearray):
+            self.buffer = bytearray(self.buffer)
+            self.offsets = array(
+                "q", np.asarray(self.offsets, dtype=np.int64).tobytes()
+            )
+        self.buffer += value.encode()
+        self.offsets.append(len(self.buffer))
+
+    def take(self, rows: Iterable[int]) -> _StringColumn:
+        """Get a new column of only the input rows."""
+        column = _StringColumn()
+        for i in rows:
+            column.buffer += self.buffer[self.offsets[i] : self.offsets[i + 1]]
+            column.offsets.append(len(column.buffer))
+        return column
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.offsets.itemsize * len(self.offsets)
+
+    def arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """Get copies of the buffer and offsets as arrays."""
+        return (
+            np.frombuffer(self.buffer, dtype=np.uint8).copy(),
+            np.asarray(self.offsets, dtype=np.int64).copy(),
+        )
+
+
+class ChunkStore(Sequence[Text]):
+    """Columnar storage of text chunks, materializing `Text`s only when accessed.
+
+    A `Text` per chunk costs a pydantic object, a string, and a list of Python
+    floats for its embedding. Instead this packs the texts and names into UTF-8
+    buffers, references each chunk's document by index into a table of distinct
+    documents, and stacks embeddings into a float32 matrix.
+
+    Indexing materializes a `Text` (sharing its `Doc` with other chunks), which
+    is cached for as long as it's referenced elsewhere. Materialized `Text`s are
+    snapshots, so update embeddings with `set_embeddings`.
+
+    Use it in place of the `texts` list of `Docs` or `NumpyVectorStore`,
+    e.g. `Docs(texts=ChunkStore())`.
+    """
+
+    MIN_CAPACITY: ClassVar[int] = 64
+    GROWTH_FACTOR: ClassVar[float] = 2.0
+
+    def __init__(
+        self, texts: Iterable[Text] = (), store_embeddings: bool = True
+    ) -> None:
+        """Initialize.
+
+        Args:
+            texts: Optional texts to add.
+            store_embeddings: Opt-out flag to not store embeddings, such as when a
+                vector store already holds them in its own matrix.
+        """
+        self.store_embeddings = store_embeddings
+        self._texts = _StringColumn()
+        self._names = _StringColumn()
+        self._docs: list[Doc | DocDetails] = []
+        self._doc_indices_by_key: dict[DocKey, int] = {}
+        self._doc_indices: array | np.ndarray = array("q")
+        # Preallocated buffer, whose rows without embeddings are flagged
+        self._embeddings: np.ndarray | None = None
+        self._has_embedding = array("b")
+        # Hashes of each chunk, matching `hash` of its materialized `Text`, or None
+        # until first needed, as loaded columns needn't all be decoded to be searched
+        self._hashes: array | None = array("q")
+        self._materialized: weakref.WeakValueDictionary[int, Text] = (
+            weakref.WeakValueDictionary()
+        )
+        self.extend(texts)
+
+    def __len__(self) -> int:
+        return len(self._doc_indices)
+
+    @overload
+    def __getitem__(self, i: SupportsIndex) -> Text: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[Text]: ...
+
+    def __getitem__(self, i: SupportsIndex | slice) -> Text | list[Text]:
+        if isinstance(i, slice):
+            return self.materialize(range(*i.indices(len(self))))
+        i = operator.index(i)  # Allow NumPy integers, e.g. from search rows
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Chunk index {i} out of range for {len(self)} chunks.")
+        text = self._materialized.get(i)
+        if text is None:
+            text = Text.model_construct(
+                text=self._texts[i],
+                name=self._names[i],
+                doc=self._docs[self._doc_indices[i]],
+                embedding=self.embedding(i),
+            )
+            self._materialized[i] = text
+        return text
+
+    def __iter__(self) -> Iterator[Text]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            a == b for a, b in zip(self, other, strict=True)
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __iadd__(self, texts: Iterable[Text]) -> Self:
+        self.extend(texts)
+        return self
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(n_chunks={len(self)}, n_docs={len(self._docs)})"
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_materialized"]
+        if self._embeddings is not None:
+            # Don't persist the buffer's unused capacity
+            state["_embeddings"] = self._embeddings[: len(self)].copy()
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._materialized = weakref.WeakValueDictionary()
+        # String hashes are salted per process, so they must be recomputed
+        self._hashes = None
+
+    @classmethod
+    def from_columns(
+        cls,
+        columns: Mapping[str, np.ndarray],
+        docs: Iterable[Doc | DocDetails],
+        store_embeddings: bool = True,
+    ) -> Self:
+        """Create a store viewing the arrays of `columns`, without copying them.
+
+        Args:
+            columns: Arrays as returned by `columns`, such as memory-mapped arrays
+                shared by many processes. They're copied into memory on the first
+                added text. Embeddings are only viewed if included.
+            docs: Distinct documents, that the `doc_indices` column indexes.
+            store_embeddings: Opt-out flag to not store embeddings.
+        """
+        store = cls(store_embeddings=store_embeddings)
+        store._texts = _StringColumn(columns["text_bytes"], columns["text_offsets"])
+        store._names = _StringColumn(columns["name_bytes"], columns["name_offsets"])
+        store._docs = list(docs)
+        store._doc_indices_by_key = {d.dockey: i for i, d in enumerate(store._docs)}
+        store._doc_indices = columns["doc_indices"]
+        store._has_embedding = array("b", bytes(len(store)))
+        if store_embeddings and "embeddings" in columns:
+            store._has_embedding = array(
+                "b", np.asarray(columns["has_embedding"], dtype=np.int8).tobytes()
+            )
+            if any(store._has_embedding):
+                store._embeddings = columns["embeddings"]
+        # String hashes are salted per process, so compute them instead of sharing
+        store._hashes = None
+        return store
+
+    def columns(self, include_embeddings: bool = False) -> dict[str, np.ndarray]:
+        """Get copies of the chunks' columns as arrays.
+
+        Args:
+            include_embeddings: Opt-in flag to include the "has_embedding" flags and
+                the "embeddings" matrix, whose rows without embeddings are zeros.
+        """
+        text_bytes, text_offsets = self._texts.arrays()
+        name_bytes, name_offsets = self._names.arrays()
+        columns = {
+            "text_bytes": text_bytes,
+            "text_offsets": text_offsets,
+            "name_bytes": name_bytes,
+            "name_offsets": name_offsets,
+            "doc_indices": np.asarray(self._doc_indices, dtype=np.int64).copy(),
+        }
+        if include_embeddings:
+            columns["has_embedding"] = np.frombuffer(
+                self._has_embedding, dtype=np.int8
+            ).copy()
+            columns["embeddings"] = (
+                np.zeros((len(self), 0), dtype=np.float32)
+                if self._embeddings is None
+                else self._embeddings[: len(self)].copy()
+            )
+        return columns
+
+    @property
+    def docs(self) -> list[Doc | DocDetails]:
+        """Distinct documents of the chunks, in order of first appearance."""
+        return self._docs
+
+    @classmethod
+    def __get_pydantic_core_schema__(  # noqa: PLW3201
+        cls, source_type: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        return core_schema.is_instance_schema(
+            cls,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda store: [t.model_dump() for t in store]
+            ),
+        )
+
+    def append(self, text: Text) -> None:
+        self.extend([text])
+
+    def extend(self, texts: Iterable[Text]) -> None:
+        """Add texts to the end of the store, copying their data into its columns."""
+        if not isinstance(self._doc_indices, array):
+            # Copy viewed columns into memory, e.g. out of a memory map
+            self._doc_indices = array(
+                "q", np.asarray(self._doc_indices, dtype=np.int64).tobytes()
+            )
+        for text in texts:
+            dockey = text.doc.dockey
+            if dockey not in self._doc_indices_by_key:
+                self._doc_indices_by_key[dockey] = len(self._docs)
+                self._docs.append(text.doc)
+            self._doc_indices.append(self._doc_indices_by_key[dockey])
+            self._texts.append(text.text)
+            self._names.append(text.name)
+            if self._hashes is not None:
+                self._hashes.append(hash(text))
+            self._has_embedding.append(0)
+            if self.store_embeddings and text.embedding is not None:
+                self.set_embeddings([len(self) - 1], [text.embedding])
+
+    def clear(self) -> None:
+        self.__init__(store_embeddings=self.store_embeddings)  # type: ignore[misc]
+
+    def _reserve(self, n_rows: int, dim: int) -> None:
+        """Ensure the embeddings buffer has capacity for at least n_rows rows."""
+        if self._embeddings is not None and not self._embeddings.flags.writeable:
+            # Copy viewed embeddings into memory, e.g. out of a memory map
+            self._embeddings = np.array(self._embeddings)
+        capacity = 0 if self._embeddings is None else len(self._embeddings)
+        if n_rows <= capacity:
+            return
+        new_capacity = max(
+            n_rows, int(capacity * self.GROWTH_FACTOR), self.MIN_CAPACITY
+        )
+        embeddings = np.zeros((new_capacity, dim), dtype=np.float32)
+        if self._embeddings is not None:
+            embeddings[:capacity] = self._embeddings
+        self._embeddings = embeddings
+
+    def set_embeddings(
+        self, rows: Sequence[int], embeddings: Sequence[Sequence[float]]
+    ) -> None:
+        """Set the embeddings of the input rows, including on materialized `Text`s."""
+        for i, embedding in zip(rows, embeddings, strict=True):
+            if text := self._materialized.get(i):
+                text.embedding = list(embedding)
+            if not self.store_embeddings:
+                continue
+            self._reserve(len(self), len(embedding))
+            cast("np.ndarray", self._embeddings)[i] = embedding
+            self._has_embedding[i] = 1
+
+    def embedding(self, i: int) -> list[float] | None:
+        if not self._has_embedding[i]:
+            return None
+        return cast("np.ndarray", self._embeddings)[i].tolist()
+
+    def has_embedding(self, i: int) -> bool:
+        return bool(self._has_embedding[i])
+
+    def text(self, i: int) -> str:
+        """Get a chunk's text, without materializing a `Text`."""
+        return self._texts[i]
+
+    def name(self, i: int) -> str:
+        return self._names[i]
+
+    def doc(self, i: int) -> Doc | DocDetails:
+        return self._docs[self._doc_indices[i]]
+
+    def row_hash(self, i: int) -> int:
+        """Get the hash of a chunk's `Text`, without materializing it."""
+        return self._row_hashes()[i]
+
+    def _row_hashes(self) -> array:
+        if self._hashes is None:
+            self._hashes = array(
+                "q", (hash((self._names[i], self._texts[i])) for i in range(len(self)))
+            )
+        return self._hashes
+
+    def materialize(self, rows: Iterable[SupportsIndex]) -> list[Text]:
+        return [self[i] for i in rows]
+
+    def remove_docs(self, dockeys: Collection[DocKey]) -> None:
+        """Remove every chunk of the input documents, compacting the columns."""
+        removed = {
+            self._doc_indices_by_key[k]
+            for k in dockeys
+            if k in self._doc_indices_by_key
+        }
+        if not removed:
+            return
+        self.keep_rows([i for i, d in enumerate(self._doc_indices) if d not in removed])
+
+    def keep_rows(self, kept: Sequence[int]) -> None:
+        """Keep only the input rows (in ascending order), compacting the columns.
+
+        Documents without any kept chunk are dropped from the documents table.
+        """
+        kept_docs = sorted({int(self._doc_indices[i]) for i in kept})
+        new_doc_indices = {old: new for new, old in enumerate(kept_docs)}
+        self._doc_indices = array(
+            "q", (new_doc_indices[self._doc_indices[i]] for i in kept)
+        )
+        self._docs = [self._docs[i] for i in kept_docs]
+        self._doc_indices_by_key = {d.dockey: i for i, d in enumerate(self._docs)}
+        self._texts = self._texts.take(kept)
+        self._names = self._names.take(kept)
+        if self._hashes is not None:
+            self._hashes = array("q", (self._hashes[i] for i in kept))
+        self._has_embedding = array("b", (self._has_embedding[i] for i in kept))
+        if self._embeddings is not None:
+            self._embeddings = self._embeddings[kept]
+        # Rows shifted, so cached materializations no longer match their rows
+        self._materialized = weakref.WeakValueDictionary()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns, excluding the documents table."""
+        return (
+            self._texts.nbytes
+            + self._names.nbytes
+            + sum(
+                a.itemsize * len(a)
+                for a in (self._doc_indices, self._has_embedding, self._hashes)
+                if a is not None
+            )
+            + (0 if self._embeddings is None else self._embeddings.nbytes)
+        )
+
+
 # Sentinel to autopopulate a field within model_validator
 AUTOPOPULATE_VALUE = ""  # NOTE: this is falsy by design
 
@@ -283,6 +673,55 @@ class PQASession(BaseModel):
             data.pop("used_contexts", None)
         return data
 
+    @model_validator(mode="before")
+    @classmethod
+    def intern_docs(cls, data: Any) -> Any:
+        """Resolve contexts' documents from the table of a JSON serialized session."""
+        if not isinstance(data, dict) or "docs" not in data:
+            return data
+        docs = [DOC_ADAPTER.validate_python(d) for d in data["docs"]]
+        contexts = []
+        for c in data.get("contexts", []):
+            text = c.get("text") if isinstance(c, dict) else None
+            if isinstance(text, dict) and isinstance(text.get("doc"), int):
+                c |= {"text": text | {"doc": docs[text["doc"]]}}
+            contexts.append(c)
+        # Avoid mutating input data
+        return {k: v for k, v in data.items() if k != "docs"} | {"contexts": contexts}
+
+    @model_serializer(mode="wrap")
+    def dedupe_docs(
+        self, handler: SerializerFunctionWrapHandler, info: SerializationInfo
+    ) -> dict[str, Any]:
+        """Opt-in to serialize to JSON with each distinct document once.
+
+        When the serialization context has a truthy "dedupe_docs" (e.g.
+        `model_dump_json(context={"dedupe_docs": True})`), documents are written to
+        a "docs" table, and contexts' texts reference their document by position in
+        the table, instead of repeating documents (e.g. `DocDetails` with their
+        bibtex and metadata payloads) per context. Otherwise, the default inline
+        documents are kept, and both shapes are accepted by validation.
+        """
+        data = handler(self)
+        if not info.mode_is_json() or not (info.context or {}).get("dedupe_docs"):
+            return data
+        docs: list[dict[str, Any]] = []
+        positions_by_dockey: dict[Any, list[int]] = {}
+        for c in data.get("contexts", []):
+            text = c.get("text")
+            doc = text.get("doc") if isinstance(text, dict) else None
+            if not isinstance(doc, dict):
+                continue
+            positions = positions_by_dockey.setdefault(doc.get("dockey"), [])
+            # Documents sharing a key can still differ, e.g. if one was upgraded
+            position = next((i for i in positions if docs[i] == doc), None)
+            if position is None:
+                position = len(docs)
+                docs.append(doc)
+                positions.append(position)
+            text["doc"] = position
+        return data | {"docs": docs}
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def used_contexts(self) -> set[str]:
@@ -343,7 +782,7 @@ class PQASession(BaseModel):
                     # Similar to the explanation in `map_fxn_summary`'s internals
                     # on why we drop embeddings, drop embeddings here too because
                     # embeddings aren't displayed to front end users
-                    doc=c.text.doc.model_dump(exclude={"embedding"}),
+                    doc=c.text.doc.without_embedding(),
                     **c.text.model_dump(exclude={"text", "embedding", "doc"}),
                 ),
             )
@@ -476,6 +915,41 @@ class ParsedText(BaseModel):
         return "\n\n".join(self.content.values())
 
 
+class IngestionStats(BaseModel):
+    """Per-stage throughput counters of document ingestion, to size its concurrency.
+
+    Stages of many documents overlap, so each stage's seconds sum the wall time of
+    its calls, making its throughput per concurrent call.
+    """
+
+    counts: dict[str, int] = Field(
+        default_factory=dict,
+        description=(
+            "Number of items through each stage, documents or texts when embedding."
+        ),
+    )
+    seconds: dict[str, float] = Field(
+        default_factory=dict, description="Summed wall time of each stage's calls."
+    )
+
+    def throughput(self, stage: str) -> float:
+        """Get the items per second through a stage's calls."""
+        seconds = self.seconds.get(stage, 0.0)
+        return self.counts.get(stage, 0) / seconds if seconds else 0.0
+
+    @contextmanager
+    def time_stage(self, stage: str, n_items: int = 1) -> Iterator[None]:
+        """Time a stage's call, only counting its items if it succeeds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] = (
+                self.seconds.get(stage, 0.0) + time.perf_counter() - start
+            )
+        self.counts[stage] = self.counts.get(stage, 0) + n_items
+
+
 class BibTeXSource(StrEnum):
     """Possible BibTeX sources."""
 
@@ -1050,3 +1524,9 @@ class DocDetails(Doc):
         if isinstance(other, int):
             return self
         return self.__add__(other)
+
+
+# Validates serialized documents into `Doc`s or `DocDetails`, whichever they were
+DOC_ADAPTER: TypeAdapter[Doc | DocDetails] = TypeAdapter(
+    Annotated[Doc | DocDetails, Field(union_mode="left_to_right")]
+)
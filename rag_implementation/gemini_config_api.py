@@ -9,7 +9,7 @@ import json
 from pydantic import BaseModel
 
 # Import these from your main module
-from paperqa import Settings, ask
+from paperqa import Docs, Settings, ask
 from paperqa.settings import AgentSettings
 
 # Create FastAPI app
@@ -54,6 +54,32 @@ ollama_config = {
 # Create a thread pool executor
 executor = concurrent.futures.ThreadPoolExecutor()
 
+# Settings shared by every request
+settings = Settings(
+    llm="gemini/gemini-2.5-flash-preview-04-17",
+    llm_config=gemini_config,
+    summary_llm="gemini/gemini-2.5-flash-preview-04-17",
+    summary_llm_config=gemini_config,
+    agent=AgentSettings(
+        agent_llm="gemini/gemini-2.5-flash-preview-04-17",
+        agent_llm_config=gemini_config
+    ),
+    embedding="ollama/mxbai-embed-large",
+    embedding_config=ollama_config,
+    verbosity=0
+)
+
+# Optional collection shared by every uvicorn worker. A loader process saves it with
+# its texts index once, e.g. `docs.save("/dev/shm/pqa-index", settings.embedding)`,
+# then each worker memory-maps it read-only, so resident memory doesn't grow with the
+# number of workers. Loading checks the index was embedded by the same model
+shared_index_dir = os.environ.get("PQA_SHARED_INDEX_DIR")
+shared_docs = (
+    Docs.load(shared_index_dir, embedding_model_name=settings.embedding)
+    if shared_index_dir
+    else None
+)
+
 # Pydantic models for request/response
 class ChatMessage(BaseModel):
     role: str
@@ -122,26 +148,16 @@ def run_ask_function(query: str) -> Dict[str, Any]:
     This avoids event loop issues.
     """
     try:
-        # Create settings
-        settings = Settings(
-            llm="gemini/gemini-2.5-flash-preview-04-17",
-            llm_config=gemini_config,
-            summary_llm="gemini/gemini-2.5-flash-preview-04-17",
-            summary_llm_config=gemini_config,
-            agent=AgentSettings(
-                agent_llm="gemini/gemini-2.5-flash-preview-04-17",
-                agent_llm_config=gemini_config
-            ),
-            embedding="ollama/mxbai-embed-large",
-            embedding_config=ollama_config,
-            verbosity=0
-        )
-
         # Process the query
-        answer_response = ask(
-            query=query,
-            settings=settings
-        )
+        if shared_docs is not None:
+            # Answer from the shared collection, whose index is already built, so
+            # querying only reads it
+            answer_response = shared_docs.query(query, settings=settings)
+        else:
+            answer_response = ask(
+                query=query,
+                settings=settings
+            )
 
         # Extract just the clean answer from the complex response object
         clean_answer = extract_answer_from_response(answer_response)
@@ -163,6 +179,26 @@ async def ask_question(q: str = Query(..., description="The question to ask")):
     result = await loop.run_in_executor(executor, run_ask_function, q)
     return result
 
+@app.get("/search")
+async def search_texts(
+    q: str = Query(..., description="The query to search for"),
+    k: int = Query(5, description="The number of texts to return"),
+):
+    """
+    Search the shared collection's texts index for the texts most similar to the query.
+    """
+    if shared_docs is None:
+        raise HTTPException(status_code=404, detail="No shared index is loaded, set PQA_SHARED_INDEX_DIR")
+    texts, scores = await shared_docs.texts_index.similarity_search(
+        q, k=k, embedding_model=settings.get_embedding_model()
+    )
+    return {
+        "results": [
+            {"name": t.name, "citation": t.doc.formatted_citation, "text": t.text, "score": score}
+            for t, score in zip(texts, scores, strict=True)
+        ]
+    }
+
 @app.post("/v1/chat/completions")
 async def chat_completions(request: ChatRequest):
     """
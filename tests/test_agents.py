@@ -39,10 +39,11 @@ from paperqa.agents.env import (
     clinical_trial_status,
     settings_to_tools,
 )
-from paperqa.agents.main import FAKE_AGENT_TYPE, run_agent
+from paperqa.agents.main import FAKE_AGENT_TYPE, index_search, run_agent
 from paperqa.agents.models import AgentStatus, AnswerResponse
 from paperqa.agents.search import (
     FAILED_DOCUMENT_ADD_ID,
+    SearchDocumentStorage,
     get_directory_index,
     maybe_get_manifest,
 )
@@ -983,6 +984,48 @@ def test_answers_are_striped() -> None:
     response.model_dump_json()
 
 
+@pytest.mark.asyncio
+async def test_answers_index_dedupes_docs(tmp_path: Path) -> None:
+    doc = Doc(docname="foo", citation="bar", dockey="baz")
+    session = PQASession(
+        question="What is the meaning of life?",
+        answer="42",
+        contexts=[
+            Context(
+                context=f"bla {i}",
+                question="foo",
+                text=Text(name=f"text {i}", text="", doc=doc),
+                score=3,
+            )
+            for i in range(3)
+        ],
+    )
+    response = AnswerResponse(session=session, bibtex={}, status=AgentStatus.SUCCESS)
+    answers_index = SearchIndex(
+        fields=[*SearchIndex.REQUIRED_FIELDS, "question"],
+        index_name="answers",
+        index_directory=tmp_path,
+        storage=SearchDocumentStorage.JSON_MODEL_DUMP,
+        storage_context={"dedupe_docs": True},
+    )
+    await answers_index.add_document(
+        {
+            "file_location": str(session.id),
+            "body": session.answer,
+            "question": session.question,
+        },
+        document=response,
+    )
+    await answers_index.save_index()
+
+    (stored,) = await answers_index.query("meaning")
+    assert [c["text"]["doc"] for c in stored["session"]["contexts"]] == [0, 0, 0]
+    assert [d["dockey"] for d in stored["session"]["docs"]] == ["baz"]
+    ((loaded, file_location),) = await index_search("meaning", index_directory=tmp_path)
+    assert file_location == str(session.id)
+    assert loaded.session.contexts == session.contexts
+
+
 @pytest.mark.asyncio
 async def test_clinical_tool_usage(agent_test_settings) -> None:
     agent_test_settings.llm = "gpt-4o"
@@ -7,6 +7,7 @@ import pytest
 from pydantic import ValidationError
 from pytest_subtests import SubTests
 
+from paperqa.llms import IVFVectorStore, NumpyVectorStore
 from paperqa.prompts import citation_prompt
 from paperqa.settings import (
     AgentSettings,
@@ -102,6 +103,17 @@ def test_router_kwargs_present_in_models() -> None:
     assert settings.get_summary_llm().config["router_kwargs"] is not None
 
 
+def test_get_texts_index() -> None:
+    assert type(Settings().get_texts_index()) is NumpyVectorStore
+    texts_index = Settings(
+        texts_index="ivf", texts_index_config={"n_probe": 4}
+    ).get_texts_index()
+    assert isinstance(texts_index, IVFVectorStore)
+    assert texts_index.n_probe == 4
+    with pytest.raises(ValueError, match="Unknown vector store"):
+        Settings(texts_index="stub").get_texts_index()
+
+
 def test_o1_requires_temp_equals_1() -> None:
     with warnings.catch_warnings(record=True) as w:
         warnings.simplefilter("always")
@@ -1,16 +1,20 @@
+import asyncio
 import contextlib
 import csv
+import hashlib
+import itertools
+import json
 import os
 import pathlib
 import pickle
 import re
 import sys
-from collections.abc import AsyncIterable, Sequence
+from collections.abc import AsyncIterable, Iterator, Sequence
 from copy import deepcopy
 from datetime import datetime, timedelta
 from io import BytesIO
 from pathlib import Path
-from typing import cast
+from typing import Literal, cast
 from uuid import UUID
 
 import httpx
@@ -22,6 +26,7 @@ from lmi import (
     CommonLLMNames,
     Embeddable,
     EmbeddingModel,
+    EmbeddingModes,
     HybridEmbeddingModel,
     LiteLLMEmbeddingModel,
     LLMModel,
@@ -34,24 +39,40 @@ from pytest_subtests import SubTests
 
 from paperqa import (
     Answer,
+    BM25Index,
+    ChunkStore,
+    DiskEmbeddingCache,
     Doc,
     DocDetails,
     Docs,
+    EmbeddingBatcher,
+    IngestionStats,
+    IVFVectorStore,
     NumpyVectorStore,
     PQASession,
     QdrantVectorStore,
+    QueryEmbeddingCache,
     Settings,
     Text,
     VectorStore,
+    readers,
 )
 from paperqa.clients import CrossrefProvider
 from paperqa.clients.journal_quality import JournalQualityPostProcessor
-from paperqa.core import llm_parse_json
+from paperqa.core import llm_parse_json, map_fxn_summary
+from paperqa.llms import (
+    cosine_similarity,
+    l2_normalize,
+    maximal_marginal_relevance,
+    reciprocal_rank_fusion,
+    top_k_indices,
+)
 from paperqa.prompts import CANNOT_ANSWER_PHRASE
 from paperqa.prompts import qa_prompt as default_qa_prompt
 from paperqa.readers import parse_pdf_to_pages, read_doc
 from paperqa.types import ChunkMetadata
 from paperqa.utils import (
+    ImpossibleParsingError,
     clean_possessives,
     encode_id,
     extract_score,
@@ -929,6 +950,163 @@ async def test_repeat_keys(stub_data_dir) -> None:
     assert ds[1].docname == "Wiki2023a"
 
 
+@pytest.mark.asyncio
+async def test_aadd_many(stub_data_dir: Path) -> None:
+    class StubLLMModel(LLMModel):
+        name: str = "custom/myllm"
+
+        async def acompletion(
+            self, messages: list[Message], **kwargs  # noqa: ARG002
+        ) -> list[LLMResult]:
+            return [
+                LLMResult(
+                    model=self.name,
+                    text="Doe, Stub Title, 2023",
+                    prompt=messages,
+                    prompt_count=1,
+                    completion_count=1,
+                )
+            ]
+
+        async def acompletion_iter(
+            self, messages: list[Message], **kwargs
+        ) -> AsyncIterable[LLMResult]:
+            for result in await self.acompletion(messages, **kwargs):
+                yield result
+
+        async def check_rate_limit(self, token_count: float, **kwargs) -> None:
+            """This is a dummy check."""
+
+    class CountingEmbeds(EmbeddingModel):
+        name: str = "counting_embed"
+        n_calls: int = 0
+
+        async def embed_documents(self, texts):
+            self.n_calls += 1
+            return [[float(len(t)), 1.0] for t in texts]
+
+    settings = Settings()
+    settings.parsing.use_doc_details = False
+    embedding_model = CountingEmbeds()
+    stats = IngestionStats()
+    docs = Docs()
+    paths = [
+        stub_data_dir / "bates.txt",
+        stub_data_dir / "flag_day.html",
+        stub_data_dir / "empty.txt",  # Can't be read
+        stub_data_dir / "bates.txt",  # Already added
+    ]
+    docnames = await docs.aadd_many(
+        paths,
+        docnames=[None, "FlagDay", None, None],
+        concurrency=2,
+        embedding_batch_size=10_000,
+        settings=settings,
+        llm_model=StubLLMModel(),
+        embedding_model=embedding_model,
+        stats=stats,
+    )
+    # Either copy of the duplicate may finish first
+    assert sorted(d for d in docnames if d is not None) == ["Doe2023", "FlagDay"]
+    assert docnames[1] == "FlagDay"
+    assert docnames[2] is None
+    assert len(docs.docs) == 2
+    assert all(t.embedding is not None for t in docs.texts)
+    assert embedding_model.n_calls == 1, "Expected embeddings coalesced across docs"
+    assert stats.counts["parse"] == stats.counts["citation"] == 3
+    assert stats.counts["embed"] == len(docs.texts)
+    assert stats.throughput("embed") > 0
+
+    with pytest.raises(ValueError, match="docnames for"):
+        await docs.aadd_many(paths, docnames=["Bates"])
+
+
+@pytest.mark.asyncio
+async def test_aadd_parses_once(
+    stub_data_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class StubLLMModel(LLMModel):
+        name: str = "custom/myllm"
+        n_calls: int = 0
+
+        async def acompletion(
+            self, messages: list[Message], **kwargs  # noqa: ARG002
+        ) -> list[LLMResult]:
+            self.n_calls += 1
+            # The structured citation prompt contains the citation
+            if "Doe, Stub Title, 2023" in (messages[0].content or ""):
+                text = '{"title": "Stub Title", "doi": "10.1234/stub"}'
+            else:
+                text = "Doe, Stub Title, 2023"
+            return [
+                LLMResult(
+                    model=self.name,
+                    text=text,
+                    prompt=messages,
+                    prompt_count=1,
+                    completion_count=1,
+                )
+            ]
+
+        async def acompletion_iter(
+            self, messages: list[Message], **kwargs
+        ) -> AsyncIterable[LLMResult]:
+            for result in await self.acompletion(messages, **kwargs):
+                yield result
+
+        async def check_rate_limit(self, token_count: float, **kwargs) -> None:
+            """This is a dummy check."""
+
+    class StubMetadataClient:
+        async def upgrade_doc_to_doc_details(self, doc: Doc, **kwargs) -> DocDetails:
+            return DocDetails(
+                citation=doc.citation,
+                dockey=doc.dockey,
+                title=kwargs["title"],
+                doi=kwargs["doi"],
+                authors=["John Doe"],
+                year=2023,
+            )
+
+    n_calls = {"parse_text": 0, "chunk_text": 0}
+
+    def counting(fn):
+        def wrapper(*args, **kwargs):
+            n_calls[fn.__name__] += 1
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(readers, "parse_text", counting(readers.parse_text))
+    monkeypatch.setattr(readers, "chunk_text", counting(readers.chunk_text))
+    llm_model = StubLLMModel()
+    settings = Settings(parsing={"defer_embedding": True})
+    docs = Docs()
+    await docs.aadd(
+        stub_data_dir / "bates.txt",
+        settings=settings,
+        llm_model=llm_model,
+        metadata_client=StubMetadataClient(),
+    )
+    assert n_calls == {"parse_text": 1, "chunk_text": 1}
+    assert llm_model.n_calls == 2, "Expected citation and structured citation calls"
+    (doc,) = docs.docs.values()
+    assert isinstance(doc, DocDetails)
+    assert doc.doi == "10.1234/stub"
+    texts = docs.get_doc_texts(doc.dockey)
+    assert texts
+    assert all(t.doc is doc for t in texts)
+    # Chunks were named under a placeholder docname, rewritten to the resolved one
+    assert all(t.name.startswith(f"{doc.docname} ") for t in texts)
+
+    # Unreadable documents fail before any LLM or metadata call
+    with pytest.raises(ImpossibleParsingError, match="No text was parsed"):
+        await docs.aadd(
+            stub_data_dir / "empty.txt", settings=settings, llm_model=llm_model
+        )
+    assert llm_model.n_calls == 2
+
+
 @pytest.mark.asyncio
 async def test_can_read_normal_pdf_reader(docs_fixture) -> None:
     answer = await docs_fixture.aquery("Are counterfactuals actionable? [yes/no]")
@@ -1023,6 +1201,1500 @@ async def test_partly_embedded_texts(defer_embeddings: bool) -> None:
     assert len(docs.texts_index.texts_hashes) == len(texts_to_add)
 
 
+@pytest.mark.asyncio
+async def test_numpy_vector_store_growable_buffer() -> None:
+    rng = np.random.default_rng(seed=42)
+    stub_doc = Doc(docname="stub", citation="stub", dockey="stub")
+    texts = [
+        Text(
+            text=f"chunk {i}",
+            name=f"stub chunk {i}",
+            doc=stub_doc,
+            embedding=rng.standard_normal(8).tolist(),
+        )
+        for i in range(200)
+    ]
+
+    class QueryEmbeds(EmbeddingModel):
+        name: str = "query_embed"
+
+        async def embed_documents(self, texts):  # noqa: ARG002
+            return [texts_to_add[-1].embedding]
+
+    index = NumpyVectorStore()
+    assert index.capacity == index.n_rows == 0
+    assert index.embeddings_matrix is None
+
+    capacities = []
+    for batch_start in range(0, len(texts), 10):
+        texts_to_add = texts[batch_start : batch_start + 10]
+        await index.add_texts_and_embeddings(texts_to_add)
+        assert index.n_rows == len(index.texts) == batch_start + 10
+        assert index.capacity >= index.n_rows
+        capacities.append(index.capacity)
+    # Growth is geometric, so only a handful of reallocations happened
+    assert len(set(capacities)) <= 3
+    assert index.embeddings_matrix is not None
+    assert index.embeddings_matrix.dtype == np.float32
+    expected_matrix = np.array([t.embedding for t in texts])
+    expected_matrix /= np.linalg.norm(expected_matrix, axis=1, keepdims=True)
+    assert np.allclose(index.embeddings_matrix, expected_matrix, atol=1e-6)
+
+    matches, _ = await index.similarity_search(
+        "query", k=1, embedding_model=QueryEmbeds()
+    )
+    assert matches == [texts[-1]]
+
+    # Pickling drops the buffer's unused capacity without changing contents
+    unpickled = pickle.loads(pickle.dumps(index))
+    assert unpickled == index
+    assert unpickled.capacity == unpickled.n_rows == len(texts)
+
+    index.clear()
+    assert index.capacity == index.n_rows == 0
+
+
+@pytest.mark.asyncio
+async def test_numpy_vector_store_normalized_rows() -> None:
+    rng = np.random.default_rng(seed=42)
+    stub_doc = Doc(docname="stub", citation="stub", dockey="stub")
+    raw_embeddings = rng.standard_normal((50, 16)) * rng.uniform(0.1, 10, (50, 1))
+    texts = [
+        Text(text=f"chunk {i}", name=f"stub chunk {i}", doc=stub_doc, embedding=e)
+        for i, e in enumerate(raw_embeddings.tolist())
+    ]
+    query_embedding = rng.standard_normal(16)
+
+    class QueryEmbeds(EmbeddingModel):
+        name: str = "query_embed"
+
+        async def embed_documents(self, texts):  # noqa: ARG002
+            return [query_embedding.tolist()]
+
+    index = NumpyVectorStore(mmr_lambda=0.5)
+    await index.add_texts_and_embeddings(texts)
+    assert index.embeddings_matrix is not None
+    assert np.allclose(np.linalg.norm(index.embeddings_matrix, axis=1), 1.0)
+
+    matches, scores = await index.similarity_search(
+        "query", k=10, embedding_model=QueryEmbeds()
+    )
+    expected_scores = np.sort(
+        cosine_similarity(query_embedding.reshape(1, -1), raw_embeddings)[0]
+    )[::-1][:10]
+    assert np.allclose(scores, expected_scores, atol=1e-5)
+    assert all(isinstance(s, float) for s in scores)
+
+    # MMR over the stored rows matches MMR over the texts' raw embeddings
+    mmr_matches, mmr_scores = await index.max_marginal_relevance_search(
+        "query", k=5, fetch_k=10, embedding_model=QueryEmbeds()
+    )
+    base_matches, base_scores = await VectorStore.max_marginal_relevance_search(
+        index, "query", k=5, fetch_k=10, embedding_model=QueryEmbeds()
+    )
+    assert mmr_matches == base_matches
+    assert np.allclose(mmr_scores, base_scores)
+    assert mmr_matches != matches[:5], "Expected MMR to diversify results"
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+@pytest.mark.asyncio
+async def test_numpy_vector_store_save_load(tmp_path: Path, mmap: bool) -> None:
+    rng = np.random.default_rng(seed=42)
+    docs = [
+        Doc(docname="stub", citation="stub", dockey="stub"),
+        DocDetails(docname="details", citation="details", dockey="details", year=2024),
+    ]
+    texts = [
+        Text(
+            text=f"chunk {i}",
+            name=f"{docs[i % 2].docname} chunk {i}",
+            doc=docs[i % 2],
+            embedding=rng.standard_normal(8).tolist(),
+        )
+        for i in range(20)
+    ]
+
+    class QueryEmbeds(EmbeddingModel):
+        name: str = "query_embed"
+
+        async def embed_documents(self, texts):  # noqa: ARG002
+            return [texts_to_query[0].embedding]
+
+    texts_to_query = texts[3:4]
+    index = NumpyVectorStore(mmr_lambda=0.9)
+    await index.add_texts_and_embeddings(texts)
+    index.save(tmp_path / "index", embedding_model_name="query_embed")
+
+    loaded = NumpyVectorStore.load(
+        tmp_path / "index", mmap=mmap, embedding_model_name="query_embed"
+    )
+    assert (
+        loaded._n_unhashed_rows == len(loaded) == len(texts)
+    ), "Expected hashing to be deferred"
+    assert loaded == index
+    assert not loaded._n_unhashed_rows
+    with pytest.raises(ValueError, match="embedded by 'query_embed'"):
+        NumpyVectorStore.load(tmp_path / "index", embedding_model_name="other")
+    assert isinstance(loaded.embeddings_matrix, np.memmap) == mmap
+    assert isinstance(loaded.texts, ChunkStore)
+    assert loaded.texts == texts
+    assert isinstance(loaded.texts[1], Text)
+    assert isinstance(loaded.texts[1].doc, DocDetails)
+    assert loaded.texts[0].doc is loaded.texts[2].doc, "Expected docs to be shared"
+    assert all(t in loaded for t in texts)
+    assert await loaded.similarity_search(
+        "query", k=5, embedding_model=QueryEmbeds()
+    ) == await index.similarity_search("query", k=5, embedding_model=QueryEmbeds())
+
+    # Adding to a memory-mapped store moves it into memory, leaving the file intact
+    new_text = Text(
+        text="new chunk", name="new chunk", doc=docs[0], embedding=[1.0] * 8
+    )
+    texts_to_query = [new_text]
+    await loaded.add_texts_and_embeddings([new_text])
+    assert loaded.n_rows == len(texts) + 1
+    matches, _ = await loaded.similarity_search(
+        "query", k=1, embedding_model=QueryEmbeds()
+    )
+    assert matches == [new_text]
+    assert NumpyVectorStore.load(tmp_path / "index") == index
+
+    # Stores saved before texts were columnar still load
+    (tmp_path / "index" / NumpyVectorStore.TEXTS_FILENAME).write_text(
+        json.dumps(
+            {
+                "format_version": 1,
+                "mmr_lambda": 0.9,
+                "docs": [
+                    d.model_dump(mode="json", exclude={"embedding"}) for d in docs
+                ],
+                "texts": [[t.name, t.text, i % 2] for i, t in enumerate(texts)],
+            }
+        )
+    )
+    assert NumpyVectorStore.load(tmp_path / "index", mmap=mmap) == index
+
+    # Subclasses load as themselves, with their configuration
+    ivf_index = IVFVectorStore(n_probe=3, mmr_lambda=0.5)
+    await ivf_index.add_texts_and_embeddings(texts)
+    ivf_index.save(tmp_path / "ivf")
+    loaded_ivf = NumpyVectorStore.load(tmp_path / "ivf", mmap=mmap)
+    assert isinstance(loaded_ivf, IVFVectorStore)
+    assert (loaded_ivf.n_probe, loaded_ivf.mmr_lambda) == (3, 0.5)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+@pytest.mark.parametrize("texts_type", [list, ChunkStore])
+@pytest.mark.asyncio
+async def test_docs_save_load(tmp_path: Path, mmap: bool, texts_type: type) -> None:
+    rng = np.random.default_rng(seed=42)
+
+    class QueryEmbeds(EmbeddingModel):
+        name: str = "query_embed"
+
+        async def embed_documents(self, texts):
+            return [[1.0] * 8 for _ in texts]
+
+    docs = Docs(texts=texts_type(), name="saved")
+    # DocDetails derives its own dockey and docname
+    details = DocDetails(docname="details", citation="details", dockey="details")
+    for i, doc in enumerate(
+        [
+            Doc(docname="stub", citation="stub", dockey="stub"),
+            details,
+            Doc(docname="deleted", citation="deleted", dockey="deleted"),
+        ]
+    ):
+        await docs.aadd_texts(
+            texts=[
+                Text(
+                    text=f"doc {i} chunk {j}",
+                    name=f"{doc.docname} chunk {j}",
+                    doc=doc,
+                    embedding=(
+                        rng.standard_normal(8, dtype=np.float32).tolist()
+                        if i != 1
+                        else None
+                    ),
+                )
+                for j in range(5)
+            ],
+            doc=doc,
+            settings=Settings(parsing={"defer_embedding": True}),
+        )
+    await docs._build_texts_index(QueryEmbeds())
+    docs.delete(dockey="deleted")
+    docs.save(tmp_path / "docs")
+
+    loaded = Docs.load(tmp_path / "docs", mmap=mmap)
+    assert loaded == docs
+    assert isinstance(loaded.texts, texts_type)
+    assert (loaded.id, loaded.name) == (docs.id, "saved")
+    assert loaded.docnames == docs.docnames
+    assert loaded.deleted_dockeys == {"deleted"}
+    assert isinstance(loaded.docs[details.dockey], DocDetails)
+    assert loaded.texts[0].doc is loaded.docs["stub"], "Expected docs to be shared"
+    assert [t.embedding for t in loaded.texts] == [t.embedding for t in docs.texts]
+    assert (
+        await loaded.retrieve_texts("query", k=3, embedding_model=QueryEmbeds())
+    ) == await docs.retrieve_texts("query", k=3, embedding_model=QueryEmbeds())
+
+    # Loaded collections can grow, leaving the saved files intact
+    doc = Doc(docname="new", citation="new", dockey="new")
+    await loaded.aadd_texts(
+        texts=[Text(text="new chunk", name="new chunk", doc=doc)],
+        doc=doc,
+        embedding_model=QueryEmbeds(),
+    )
+    assert len(loaded.texts) == len(docs.texts) + 1
+    assert Docs.load(tmp_path / "docs").texts == docs.texts
+
+    # Saving an index caught up with the texts lets retrieval skip hashing them,
+    # and the index references the collection's text columns instead of copying them
+    await docs._build_texts_index(QueryEmbeds())
+    docs.save(tmp_path / "indexed")
+    assert not list((tmp_path / "indexed" / Docs.TEXTS_INDEX_DIRNAME).glob("chunks_*"))
+    loaded = Docs.load(tmp_path / "indexed", mmap=mmap)
+    await loaded._build_texts_index(QueryEmbeds())
+    assert loaded.texts_index._n_unhashed_rows == len(docs.texts)
+    assert loaded.texts_index.texts == docs.texts_index.texts
+    assert loaded.texts_index.texts is not loaded.texts
+
+    metadata_path = tmp_path / "docs" / Docs.METADATA_FILENAME
+    metadata_path.write_text(
+        json.dumps(json.loads(metadata_path.read_text()) | {"format_version": -1})
+    )
+    with pytest.raises(ValueError, match="Unsupported format version"):
+        Docs.load(tmp_path / "docs")
+
+
+@pytest.mark.asyncio
+async def test_numpy_vector_store_partitioned_search(tmp_path: Path) -> None:
+    rng = np.random.default_rng(seed=42)
+    docs = [
+        Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        for i in range(3)
+    ]
+    # Unbalanced partitions, so the smallest runs out of results
+    texts = [
+        Text(
+            text=f"chunk {i}",
+            name=f"chunk {i}",
+            doc=docs[0 if i % 5 else (1 if i % 10 else 2)],
+            embedding=rng.standard_normal(8).tolist(),
+        )
+        for i in range(40)
+    ]
+    query_embedding = rng.standard_normal(8).tolist()
+    n_embed_calls = 0
+
+    class QueryEmbeds(EmbeddingModel):
+        name: str = "query_embed"
+
+        async def embed_documents(self, texts):  # noqa: ARG002
+            nonlocal n_embed_calls
+            n_embed_calls += 1
+            return [query_embedding]
+
+    n_partition_calls = 0
+
+    def partition_by_doc(t: Embeddable) -> int:
+        nonlocal n_partition_calls
+        n_partition_calls += 1
+        return int(cast("Text", t).doc.docname[-1])
+
+    index = NumpyVectorStore()
+    await index.add_texts_and_embeddings(texts)
+
+    # Reference: exact search within each partition, interleaved by rank
+    per_partition = []
+    for label in range(3):
+        partition = NumpyVectorStore()
+        await partition.add_texts_and_embeddings(
+            [t for t in texts if partition_by_doc(t) == label]
+        )
+        per_partition.append(
+            (
+                await partition.similarity_search(
+                    "query", k=10, embedding_model=QueryEmbeds()
+                )
+            )[0]
+        )
+    expected = [
+        t
+        for t in itertools.chain.from_iterable(itertools.zip_longest(*per_partition))
+        if t is not None
+    ][:10]
+
+    n_embed_calls = n_partition_calls = 0
+    for _ in range(2):
+        matches, scores = await index.partitioned_similarity_search(
+            "query",
+            k=10,
+            embedding_model=QueryEmbeds(),
+            partitioning_fn=partition_by_doc,
+        )
+        assert matches == expected
+        assert all(isinstance(s, float) for s in scores)
+    assert n_embed_calls == 2, "Expected one query embedding per search"
+    assert n_partition_calls == len(texts), "Expected labels to be cached"
+
+    new_text = Text(
+        text="new chunk", name="new chunk", doc=docs[2], embedding=query_embedding
+    )
+    await index.add_texts_and_embeddings([new_text])
+    matches, _ = await index.partitioned_similarity_search(
+        "query", k=10, embedding_model=QueryEmbeds(), partitioning_fn=partition_by_doc
+    )
+    assert matches[2] == new_text
+    assert n_partition_calls == len(texts) + 1, "Expected only new texts labelled"
+
+    # Partitioned MMR works from stored rows, even when texts lack embeddings
+    index.mmr_lambda = 0.5
+    index.save(tmp_path / "index")
+    loaded = NumpyVectorStore.load(tmp_path / "index")
+    results = [
+        await store.max_marginal_relevance_search(
+            "query",
+            k=5,
+            fetch_k=10,
+            embedding_model=QueryEmbeds(),
+            partitioning_fn=partition_by_doc,
+        )
+        for store in (index, loaded)
+    ]
+    assert [t.name for t in results[0][0]] == [t.name for t in results[1][0]]
+    assert np.allclose(results[0][1], results[1][1])
+
+
+@pytest.mark.parametrize(
+    ("texts_index", "texts_index_config"),
+    [
+        ("numpy", None),
+        ("ivf", {"min_train_rows": 100, "n_lists": 4}),
+        ("qdrant", None),
+    ],
+)
+@pytest.mark.asyncio
+async def test_vector_store_excluded_docs_and_partitions(
+    texts_index: str, texts_index_config: dict | None
+) -> None:
+    rng = np.random.default_rng(seed=42)
+    docs = [
+        Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        for i in range(4)
+    ]
+    texts = [
+        Text(
+            text=f"chunk {i}",
+            name=f"{docs[i % 4].docname} chunk {i}",
+            doc=docs[i % 4],
+            embedding=rng.standard_normal(8).tolist(),
+        )
+        for i in range(200)
+    ]
+    query_embedding = rng.standard_normal(8).tolist()
+
+    class QueryEmbeds(EmbeddingModel):
+        name: str = "query_embed"
+
+        async def embed_documents(self, texts):  # noqa: ARG002
+            return [query_embedding]
+
+    def partition_by_parity(t: Embeddable) -> int:
+        return int(cast("Text", t).doc.docname[-1]) % 2
+
+    index = Settings(
+        texts_index=texts_index, texts_index_config=texts_index_config
+    ).get_texts_index()
+    if isinstance(index, QdrantVectorStore):
+        # Label points at upsert, so Qdrant groups them by partition
+        index.partitioning_fns["parity"] = partition_by_parity
+    await index.add_texts_and_embeddings(texts)
+    excluded = {"stub0", "stub3"}
+
+    # Reference: exact search over only the included documents' texts
+    reference = NumpyVectorStore()
+    await reference.add_texts_and_embeddings(
+        [t for t in texts if t.doc.dockey not in excluded]
+    )
+    for partitioning_fn in (None, partition_by_parity):
+        expected, expected_scores = await reference.max_marginal_relevance_search(
+            "query",
+            k=6,
+            fetch_k=6,
+            embedding_model=QueryEmbeds(),
+            partitioning_fn=partitioning_fn,
+        )
+        matches, scores = await index.max_marginal_relevance_search(
+            "query",
+            k=6,
+            fetch_k=6,
+            embedding_model=QueryEmbeds(),
+            partitioning_fn=partitioning_fn,
+            exclude_dockeys=excluded,
+        )
+        assert [cast("Text", t).name for t in matches] == [
+            cast("Text", t).name for t in expected
+        ]
+        assert np.allclose(scores, expected_scores, atol=1e-5)
+
+    (batch_matches, _), *_ = await index.batch_max_marginal_relevance_search(
+        ["query"],
+        k=6,
+        fetch_k=6,
+        embedding_model=QueryEmbeds(),
+        exclude_dockeys=excluded,
+    )
+    expected, _ = await reference.similarity_search(
+        "query", k=6, embedding_model=QueryEmbeds()
+    )
+    assert [cast("Text", t).name for t in batch_matches] == [
+        cast("Text", t).name for t in expected
+    ]
+
+    # Without exclusions, partitioned search matches exact search over all texts
+    expected, _ = await NumpyVectorStore(texts=texts).partitioned_similarity_search(
+        "query", k=6, embedding_model=QueryEmbeds(), partitioning_fn=partition_by_parity
+    )
+    matches, _ = await index.partitioned_similarity_search(
+        "query", k=6, embedding_model=QueryEmbeds(), partitioning_fn=partition_by_parity
+    )
+    assert [cast("Text", t).name for t in matches] == [
+        cast("Text", t).name for t in expected
+    ]
+
+    if isinstance(index, QdrantVectorStore):
+        # Unregistered partitioning functions label a shortlist client-side,
+        # without writing their labels to the collection
+        matches, _ = await index.partitioned_similarity_search(
+            "query",
+            k=6,
+            embedding_model=QueryEmbeds(),
+            partitioning_fn=lambda t: partition_by_parity(t),  # noqa: PLW0108
+        )
+        assert [cast("Text", t).name for t in matches] == [
+            cast("Text", t).name for t in expected
+        ]
+        points, _ = await index.client.scroll(index.collection_name, limit=len(texts))
+        assert all(
+            set(cast("dict", p.payload)) == {"text", "name", "doc", "partition_parity"}
+            for p in points
+        )
+
+
+@pytest.mark.asyncio
+async def test_query_embedding_cache() -> None:
+    embedded: list[str] = []
+    modes: list[EmbeddingModes] = []
+
+    class CountingEmbeds(EmbeddingModel):
+        name: str = "counting_embed"
+
+        def set_mode(self, mode: EmbeddingModes) -> None:
+            modes.append(mode)
+
+        async def embed_documents(self, texts):
+            embedded.extend(texts)
+            return [[float(len(t)), 1.0] for t in texts]
+
+    doc = Doc(docname="stub", citation="stub", dockey="stub")
+    docs = Docs()
+    await docs.aadd_texts(
+        texts=[
+            Text(text=f"chunk {i}" * i, name=f"chunk {i}", doc=doc) for i in range(5)
+        ],
+        doc=doc,
+        embedding_model=CountingEmbeds(),
+    )
+    embedded.clear()
+
+    cache = QueryEmbeddingCache(max_size=2)
+    for query in ("foo", "bar", "foo", "foo"):
+        await docs.retrieve_texts(
+            query, k=2, embedding_model=CountingEmbeds(), query_embedding_cache=cache
+        )
+    assert embedded == ["foo", "bar"]
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert cache.hit_rate == 0.5
+    assert modes[-1] == EmbeddingModes.DOCUMENT, "Expected mode to be reset"
+
+    # Cache stays attached for later retrievals, evicting the least recently used
+    await docs.retrieve_texts("baz", k=2, embedding_model=CountingEmbeds())
+    assert docs.texts_index.query_embedding_cache is cache
+    assert len(cache) == 2
+    await docs.retrieve_texts("bar", k=2, embedding_model=CountingEmbeds())
+    assert embedded == ["foo", "bar", "baz", "bar"]
+
+    # Keys include the model name, and cached embeddings can't be corrupted
+    (embedding,) = await CountingEmbeds().embed_documents(["foo"])
+    cached = await cache.embed_query("foo", CountingEmbeds(name="other_embed"))
+    assert np.array_equal(cached, embedding)
+    assert not cached.flags.writeable
+    assert cache.misses == 5
+
+    cache.clear()
+    assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_embedding_batcher() -> None:
+    batches: list[list[str]] = []
+
+    class CountingEmbeds(EmbeddingModel):
+        name: str = "counting_embed"
+
+        async def embed_documents(self, texts):
+            batches.append(texts)
+            await asyncio.sleep(0)
+            return [[float(len(t)), 1.0] for t in texts]
+
+    batcher = EmbeddingBatcher(max_batch_tokens=20, max_batch_size=4)
+    docs = Docs(embedding_batcher=batcher)
+    embedding_model = CountingEmbeds()
+    stub_docs = [
+        Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        for i in range(3)
+    ]
+    # Concurrently added small docs share batches
+    await asyncio.gather(
+        *(
+            docs.aadd_texts(
+                texts=[
+                    Text(text=f"chunk {j}", name=f"{d.docname} chunk {j}", doc=d)
+                    for j in range(2)
+                ],
+                doc=d,
+                embedding_model=embedding_model,
+            )
+            for d in stub_docs
+        )
+    )
+    assert [len(b) for b in batches] == [4, 2], "Expected batches across docs"
+    assert all(t.embedding == [7.0, 1.0] for t in docs.texts)
+    assert (batcher.n_batches, batcher.n_texts) == (2, 6)
+    assert batcher.mean_batch_size == 3
+    assert 0 < batcher.fill_ratio <= 1
+    assert batcher.mean_latency >= 0
+
+    # Batches stay within the token budget, a text above it goes alone
+    batches.clear()
+    long_text = "word " * 30
+    short_texts = ["a b c d e f g h i j k l", "m n o p q r s t u v w x"]
+    embeddings = await batcher.embed_documents(
+        embedding_model, [*short_texts, long_text]
+    )
+    assert batches == [short_texts[:1], short_texts[1:], [long_text]]
+    assert embeddings[2] == [float(len(long_text)), 1.0]
+
+    # Failures propagate to the callers
+    class FailingEmbeds(EmbeddingModel):
+        name: str = "failing_embed"
+
+        async def embed_documents(self, texts):  # noqa: ARG002
+            raise RuntimeError("Provider is down")
+
+    with pytest.raises(RuntimeError, match="down"):
+        await batcher.embed_documents(FailingEmbeds(), ["foo"])
+    # Pickling keeps the stats, but not the pending work
+    unpickled = pickle.loads(pickle.dumps(docs)).embedding_batcher
+    assert unpickled is not None
+    assert unpickled.model_dump() == batcher.model_dump()
+
+
+@pytest.mark.asyncio
+async def test_disk_embedding_cache(tmp_path) -> None:
+    embedded: list[str] = []
+
+    class CountingEmbeds(EmbeddingModel):
+        name: str = "counting_embed"
+        scale: float = 1.0
+
+        async def embed_documents(self, texts):
+            embedded.extend(texts)
+            return [[self.scale * len(t), 0.5] for t in texts]
+
+    cache = DiskEmbeddingCache(path=tmp_path / "embeddings.sqlite3", max_size=4)
+    docs = Docs(embedding_cache=cache)
+    doc = Doc(docname="stub", citation="stub", dockey="stub")
+    texts = [
+        Text(text=t, name=f"stub chunk {i}", doc=doc)
+        for i, t in enumerate(["boilerplate", "foo", "boilerplate"])
+    ]
+    await docs.aadd_texts(texts=texts, doc=doc, embedding_model=CountingEmbeds())
+    assert embedded == ["boilerplate", "foo"], "Repeated texts should embed once"
+    assert [t.embedding for t in texts] == [[11.0, 0.5], [3.0, 0.5], [11.0, 0.5]]
+    assert len(cache) == 2
+
+    # A new Docs (or index rebuild) reuses the persisted embeddings
+    embedded.clear()
+    cache = DiskEmbeddingCache(path=cache.path, max_size=4)
+    other_doc = Doc(docname="other", citation="other", dockey="other")
+    other_texts = [
+        Text(text=t, name=f"other chunk {i}", doc=other_doc)
+        for i, t in enumerate(["foo", "bar"])
+    ]
+    await Docs(embedding_cache=cache).aadd_texts(
+        texts=other_texts, doc=other_doc, embedding_model=CountingEmbeds()
+    )
+    assert embedded == ["bar"]
+    assert other_texts[0].embedding == [3.0, 0.5]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+
+    # Differently configured models don't share embeddings
+    embedded.clear()
+    assert await cache.embed_documents(CountingEmbeds(scale=2.0), ["foo"]) == [
+        [6.0, 0.5]
+    ]
+    assert embedded == ["foo"]
+
+    # The least recently used embeddings are evicted beyond the max size
+    await cache.embed_documents(CountingEmbeds(), ["baz", "qux"])
+    assert len(cache) == 4
+    assert cache.get(CountingEmbeds(), ["boilerplate", "bar", "qux"]) == [
+        None,
+        [3.0, 0.5],
+        [3.0, 0.5],
+    ]
+    # Replacing an embedding keeps the count
+    cache.put(CountingEmbeds(), ["qux"], [[1.0, 0.5]])
+    assert len(cache) == 4
+    assert cache.get(CountingEmbeds(), ["qux"]) == [[1.0, 0.5]]
+
+    # Uses are only recorded beyond the resolution, to not write on every hit
+    def last_used(text: str) -> int:
+        return cache.connection.execute(
+            "SELECT last_used FROM embeddings WHERE text_hash = ?",
+            (hashlib.sha256(text.encode()).hexdigest(),),
+        ).fetchone()[0]
+
+    used = last_used("bar")
+    cache.get(CountingEmbeds(), ["bar"])
+    assert last_used("bar") == used
+    cache.last_used_resolution = 0.0
+    cache.get(CountingEmbeds(), ["bar"])
+    assert last_used("bar") > used
+
+    # Pickling drops the connection, which is reopened on use
+    unpickled = pickle.loads(pickle.dumps(cache))
+    assert len(unpickled) == 4
+    assert unpickled.hits == cache.hits
+    unpickled.clear()
+    assert (len(cache), unpickled.hits) == (0, 0)
+    cache.close()
+    unpickled.close()
+
+
+@pytest.mark.asyncio
+async def test_incremental_texts_index_build() -> None:
+    embedded: list[str] = []
+
+    class CountingEmbeds(EmbeddingModel):
+        name: str = "counting_embed"
+
+        async def embed_documents(self, texts):
+            embedded.extend(texts)
+            return [[float(len(t)), 1.0] for t in texts]
+
+    embedding_model = CountingEmbeds()
+    settings = Settings(parsing={"defer_embedding": True})
+    docs = Docs()
+
+    async def add_doc(name: str) -> None:
+        doc = Doc(docname=name, citation=name, dockey=name)
+        await docs.aadd_texts(
+            texts=[
+                Text(text=f"{name} chunk {i}", name=f"{name} chunk {i}", doc=doc)
+                for i in range(2)
+            ],
+            doc=doc,
+            settings=settings,
+        )
+
+    await add_doc("first")
+    await docs._build_texts_index(embedding_model)
+    assert len(embedded) == len(docs.texts_index) == 2
+    rows, _ = docs._unindexed_rows("texts", docs.texts_index)
+    assert not rows, "Nothing was added since the last build"
+
+    await add_doc("second")
+    rows, (_, _, _, n_rows, _) = docs._unindexed_rows("texts", docs.texts_index)
+    assert rows == [2, 3]
+    assert n_rows == 4
+    await docs._build_texts_index(embedding_model)
+    assert embedded[2:] == ["second chunk 0", "second chunk 1"]
+    assert len(docs.texts_index) == 4
+
+    # Removals shift the rows, so the next build checks all rows again
+    docs.delete(dockey="first")
+    await add_doc("third")
+    rows, _ = docs._unindexed_rows("texts", docs.texts_index)
+    assert rows == [2, 3]
+    await docs._build_texts_index(embedding_model)
+    assert [t.text for t in docs.texts_index.texts] == [
+        "second chunk 0",
+        "second chunk 1",
+        "third chunk 0",
+        "third chunk 1",
+    ]
+
+    # So do changes to the index made outside of building it
+    docs.texts_index.clear()
+    rows, _ = docs._unindexed_rows("texts", docs.texts_index)
+    assert rows == [0, 1, 2, 3]
+    await docs._build_texts_index(embedding_model)
+    assert len(docs.texts_index) == 4
+    assert len(embedded) == 6, "Texts already embedded shouldn't be embedded again"
+
+    # The watermarks survive pickling
+    unpickled = pickle.loads(pickle.dumps(docs))
+    rows, _ = unpickled._unindexed_rows("texts", unpickled.texts_index)
+    assert not rows
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("texts_type", [list, ChunkStore])
+async def test_docs_per_doc_index(texts_type: type) -> None:
+    docs = Docs(texts=texts_type())
+    for i in range(4):
+        doc = Doc(docname="stub", citation=f"stub{i}", dockey=f"stub{i}")
+        await docs.aadd_texts(
+            texts=[
+                Text(text=f"doc {i} chunk {j}", name=f"stub chunk {j}", doc=doc)
+                for j in range(i + 1)
+            ],
+            doc=doc,
+            settings=Settings(parsing={"defer_embedding": True}),
+        )
+    assert docs.docnames == {"stub", "stuba", "stubb", "stubc"}
+    assert [t.text for t in docs.get_doc_texts("stub2")] == [
+        "doc 2 chunk 0",
+        "doc 2 chunk 1",
+        "doc 2 chunk 2",
+    ]
+    assert docs.get_doc_texts("missing") == []
+
+    docs.delete(docname="stuba")
+    docs.delete(dockey="stub0")
+    assert set(docs.docs) == {"stub2", "stub3"}
+    assert [t.text for t in docs.texts] == [
+        *(f"doc 2 chunk {j}" for j in range(3)),
+        *(f"doc 3 chunk {j}" for j in range(4)),
+    ]
+    assert [t.name for t in docs.get_doc_texts("stub3")] == [
+        f"stubc chunk {j}" for j in range(4)
+    ]
+    docs.delete(docname="missing")  # No-op
+    assert docs._get_unique_name("stub") == "stubd"
+
+    # The index is rebuilt after texts were changed outside of Docs
+    docs.texts = texts_type(reversed(list(docs.texts)))
+    assert [t.text for t in docs.get_doc_texts("stub2")] == [
+        f"doc 2 chunk {j}" for j in reversed(range(3))
+    ]
+    unpickled = pickle.loads(pickle.dumps(docs))
+    unpickled.delete(docname="stubb")
+    assert [t.doc.dockey for t in unpickled.texts] == ["stub3"] * 4
+
+
+@pytest.mark.parametrize("mmr_lambda", [1.0, 0.5])
+@pytest.mark.parametrize(
+    ("texts_index", "texts_index_config"),
+    [
+        ("numpy", None),
+        ("ivf", {"min_train_rows": 100, "n_lists": 4}),
+        ("qdrant", None),
+    ],
+)
+@pytest.mark.asyncio
+async def test_retrieve_texts_many(
+    texts_index: str, texts_index_config: dict | None, mmr_lambda: float
+) -> None:
+    embed_calls: list[list[str]] = []
+
+    class RandomEmbeds(EmbeddingModel):
+        name: str = "random_embed"
+
+        async def embed_documents(self, texts):
+            embed_calls.append(texts)
+            return [
+                np.random.default_rng(seed=list(t.encode()))
+                .standard_normal(16)
+                .tolist()
+                for t in texts
+            ]
+
+    settings = Settings(
+        texts_index=texts_index,
+        texts_index_config=texts_index_config,
+        texts_index_mmr_lambda=mmr_lambda,
+    )
+    docs = Docs(texts_index=settings.get_texts_index())
+    for i in range(3):
+        doc = Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        await docs.aadd_texts(
+            texts=[
+                Text(text=f"doc {i} chunk {j}", name=f"stub{i} chunk {j}", doc=doc)
+                for j in range(50)
+            ],
+            doc=doc,
+            embedding_model=RandomEmbeds(),
+        )
+    docs.delete(docname="stub1")
+    queries = [f"query {i}" for i in range(8)]
+
+    embed_calls.clear()
+    batch_results = await docs.retrieve_texts_many(
+        queries, k=5, settings=settings, embedding_model=RandomEmbeds()
+    )
+    assert embed_calls == [queries], "Expected one batched embedding request"
+    for query, batch_matches in zip(queries, batch_results, strict=True):
+        matches = await docs.retrieve_texts(
+            query, k=5, settings=settings, embedding_model=RandomEmbeds()
+        )
+        assert batch_matches == matches
+        assert len(matches) == 5
+        assert all(m.doc.docname != "stub1" for m in matches)
+
+    assert not await docs.retrieve_texts_many(
+        [], k=5, settings=settings, embedding_model=RandomEmbeds()
+    )
+
+
+def test_bm25_index() -> None:
+    docs = [
+        Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        for i in range(2)
+    ]
+    texts = [
+        Text(text=text, name=f"chunk {i}", doc=docs[i % 2])
+        for i, text in enumerate(
+            (
+                "The TP53 gene encodes p53, a tumor suppressor.",
+                "IL-6 signaling drives inflammation. IL-6 is a cytokine.",
+                "Tumor suppressor genes are often mutated in cancer.",
+                "Inflammation is a response of the immune system.",
+            )
+        )
+    ]
+    index = BM25Index()
+    index.add_texts(texts[:2])
+    index.add_texts(texts[2:])
+    assert len(index) == len(texts)
+    assert all(t in index for t in texts)
+
+    matches, scores = index.search("tp53", k=5)
+    assert matches == [texts[0]]
+    assert all(isinstance(s, float) and s > 0 for s in scores)
+    # Hyphenated names are kept whole, and repeated terms score higher
+    matches, scores = index.search("IL-6 and inflammation", k=5)
+    assert matches == [texts[1], texts[3]]
+    assert scores[0] > scores[1]
+    matches, _ = index.search("tumor suppressor", k=1)
+    assert matches == [texts[0]], "Expected shorter texts to rank first on ties"
+
+    matches, _ = index.search("inflammation in cancer", k=5, exclude_dockeys={"stub1"})
+    assert matches == [texts[2]]
+    assert index.search("unrelated words", k=5) == ([], [])
+
+    # Removed documents' texts are tombstoned, and can be added again
+    index.remove_doc("stub1")
+    assert len(index) == 2
+    assert texts[1] not in index
+    matches, _ = index.search("IL-6 and inflammation", k=5)
+    assert not matches
+    index.add_texts(texts[1:2])
+    matches, _ = index.search("IL-6 and inflammation", k=5)
+    assert matches == [texts[1]]
+
+    index.clear()
+    assert not index
+    assert index.search("tp53", k=5) == ([], [])
+
+
+def test_reciprocal_rank_fusion() -> None:
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]]) == [
+        "c",
+        "a",
+        "b",
+        "d",
+    ]
+    assert reciprocal_rank_fusion([["a", "b"], ["b", "a"]], k=1) == ["a"]
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[1, 2], [-1]], key=abs) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_texts_lexical() -> None:
+    class RandomEmbeds(EmbeddingModel):
+        name: str = "random_embed"
+
+        async def embed_documents(self, texts):
+            return [
+                np.random.default_rng(seed=list(t.encode()))
+                .standard_normal(16)
+                .tolist()
+                for t in texts
+            ]
+
+    docs = Docs()
+    for i in range(3):
+        doc = Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        await docs.aadd_texts(
+            texts=[
+                Text(
+                    text=f"Doc {i} chunk {j} is about gene G{i}x{j}.",
+                    name=f"stub{i} chunk {j}",
+                    doc=doc,
+                )
+                for j in range(30)
+            ],
+            doc=doc,
+            embedding_model=RandomEmbeds(),
+        )
+    assert not docs.lexical_index, "Expected no indexing until lexical retrieval"
+    docs.delete(docname="stub0")
+
+    settings = Settings(texts_index_lexical=True)
+    for query, expected in (("Tell me about G1x7", "stub1 chunk 7"), ("G0x3", None)):
+        matches = await docs.retrieve_texts(
+            query, k=5, settings=settings, embedding_model=RandomEmbeds()
+        )
+        assert len(matches) == 5
+        assert all(m.doc.docname != "stub0" for m in matches)
+        if expected is not None:
+            assert expected in {m.name for m in matches}
+        (batch_matches,) = await docs.retrieve_texts_many(
+            [query], k=5, settings=settings, embedding_model=RandomEmbeds()
+        )
+        assert batch_matches == matches
+    assert len(docs.lexical_index) == len(docs.texts)
+
+    # Docs loaded without a lexical index catch up on retrieval
+    loaded = Docs(docs=docs.docs, texts=docs.texts, docnames=docs.docnames)
+    assert not loaded.lexical_index
+    matches = await loaded.retrieve_texts(
+        "G2x11", k=5, settings=settings, embedding_model=RandomEmbeds()
+    )
+    assert "stub2 chunk 11" in {m.name for m in matches}
+    assert len(loaded.lexical_index) == len(loaded.texts)
+
+
+@pytest.mark.asyncio
+async def test_chunk_store() -> None:
+    class RandomEmbeds(EmbeddingModel):
+        name: str = "random_embed"
+
+        async def embed_documents(self, texts):
+            return [
+                np.random.default_rng(seed=list(t.encode()))
+                .standard_normal(16)
+                .tolist()
+                for t in texts
+            ]
+
+    docs_by_key = {
+        f"stub{i}": Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        for i in range(3)
+    }
+    texts = [
+        Text(
+            text=f"Chunk {j} is about gene G{i}x{j}.", name=f"{key} chunk {j}", doc=doc
+        )
+        for i, (key, doc) in enumerate(docs_by_key.items())
+        for j in range(10)
+    ]
+    store = ChunkStore(texts)
+    assert store == texts, "Expected equality to the texts it was built from"
+    assert store[3] is store[3], "Expected materialized texts to be reused"
+    assert store[-1] == texts[-1]
+    assert store[:2] == texts[:2]
+    assert store.doc(0) is store.doc(1), "Expected texts to share their doc"
+    assert pickle.loads(pickle.dumps(store)) == texts
+    assert deepcopy(store) == texts
+
+    embeddings = await RandomEmbeds().embed_documents([t.text for t in texts[:2]])
+    materialized = store[0]
+    store.set_embeddings([0, 1], embeddings)
+    assert materialized.embedding == embeddings[0]
+    assert store[1].embedding == pytest.approx(embeddings[1])
+    assert not store.has_embedding(2)
+
+    store.remove_docs({"stub1"})
+    assert store == [t for t in texts if t.doc.dockey != "stub1"]
+    assert store[0].embedding == pytest.approx(embeddings[0])
+
+    # Docs with a columnar texts and texts index retrieve like with lists
+    docs = Docs(texts=ChunkStore())
+    assert isinstance(docs.texts_index, NumpyVectorStore)
+    assert isinstance(docs.texts_index.texts, ChunkStore)
+    assert not docs.texts_index.texts.store_embeddings
+    assert isinstance(Docs().texts_index.texts, list)
+    for key, doc in docs_by_key.items():
+        await docs.aadd_texts(
+            texts=[t for t in texts if t.doc.dockey == key],
+            doc=doc,
+            embedding_model=RandomEmbeds(),
+        )
+    assert isinstance(docs.texts, ChunkStore)
+    assert docs.texts == texts
+    docs.delete(docname="stub0")
+    assert len(docs.texts) == 20
+    settings = Settings(texts_index_lexical=True)
+    matches = await docs.retrieve_texts(
+        "G1x7", k=5, settings=settings, embedding_model=RandomEmbeds()
+    )
+    assert isinstance(docs.texts_index, NumpyVectorStore)
+    assert isinstance(docs.texts_index.texts, ChunkStore)
+    assert len(matches) == 5
+    assert all(m.doc.docname != "stub0" for m in matches)
+    assert "stub1 chunk 7" in {m.name for m in matches}
+    assert len(docs.lexical_index) == len(docs.texts)
+    assert isinstance(pickle.loads(pickle.dumps(docs)).texts, ChunkStore)
+
+
+@pytest.mark.parametrize("quantization", ["float16", "int8"])
+@pytest.mark.asyncio
+async def test_numpy_vector_store_quantization(
+    tmp_path: Path, quantization: Literal["float16", "int8"]
+) -> None:
+    rng = np.random.default_rng(seed=42)
+    doc = Doc(docname="stub", citation="stub", dockey="stub")
+    texts = [
+        Text(
+            text=f"chunk {i}",
+            name=f"chunk {i}",
+            doc=doc,
+            embedding=rng.standard_normal(64).tolist(),
+        )
+        for i in range(1000)
+    ]
+    queries = [rng.standard_normal(64).tolist() for _ in range(5)]
+
+    class QueryEmbeds(EmbeddingModel):
+        name: str = "query_embed"
+
+        async def embed_documents(self, texts):
+            return [queries[int(t)] for t in texts]
+
+    exact_index = NumpyVectorStore(mmr_lambda=0.5)
+    index = NumpyVectorStore(mmr_lambda=0.5, quantization=quantization)
+    for store in (exact_index, index):
+        for batch_start in range(0, len(texts), 300):
+            await store.add_texts_and_embeddings(texts[batch_start : batch_start + 300])
+    assert np.allclose(
+        index.embeddings_matrix, exact_index.embeddings_matrix, atol=0.02
+    )
+
+    def partition_by_parity(t: Embeddable) -> int:
+        return int(cast("Text", t).name[-1]) % 2
+
+    async def search(
+        store: NumpyVectorStore,
+    ) -> list[tuple[Sequence[Embeddable], list[float]]]:
+        results = []
+        for query in (str(i) for i in range(len(queries))):
+            results += [
+                await store.similarity_search(query, 10, QueryEmbeds()),
+                await store.max_marginal_relevance_search(
+                    query, 5, fetch_k=10, embedding_model=QueryEmbeds()
+                ),
+                await store.partitioned_similarity_search(
+                    query, 10, QueryEmbeds(), partition_by_parity
+                ),
+            ]
+        return results + await store.batch_similarity_search(
+            [str(i) for i in range(len(queries))], 10, QueryEmbeds()
+        )
+
+    # Re-ranking by full-precision rows recovers the exact results,
+    # even once the texts no longer hold their embeddings
+    for text in texts:
+        text.embedding = None
+    exact_results = await search(exact_index)
+    for (matches, scores), (exact_matches, exact_scores) in zip(
+        await search(index), exact_results, strict=True
+    ):
+        assert matches == exact_matches
+        assert np.allclose(scores, exact_scores)
+
+    # Saving persists the full-precision rows
+    index.save(tmp_path / "index")
+    exact_index.save(tmp_path / "exact_index")
+    assert np.array_equal(
+        np.load(tmp_path / "index" / NumpyVectorStore.EMBEDDINGS_FILENAME),
+        np.load(tmp_path / "exact_index" / NumpyVectorStore.EMBEDDINGS_FILENAME),
+    )
+
+    # Loading maps the codes to scan and the full-precision rows to re-rank,
+    # so no embeddings are read into the process's private memory
+    loaded = NumpyVectorStore.load(tmp_path / "index")
+    assert loaded.quantization == quantization
+    assert isinstance(loaded._embeddings_matrix, np.memmap)
+    assert isinstance(loaded._exact_embeddings, np.memmap)
+    assert loaded.nbytes == 0
+    for (matches, scores), (exact_matches, exact_scores) in zip(
+        await search(loaded), exact_results, strict=True
+    ):
+        assert [m.name for m in matches] == [m.name for m in exact_matches]  # type: ignore[attr-defined]
+        assert np.allclose(scores, exact_scores)
+
+
+@pytest.mark.asyncio
+async def test_qdrant_vector_store_batched_upsert() -> None:
+    docs = [
+        Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        for i in range(2)
+    ]
+    # Same embedding and name across docs, which must not collide
+    texts = [
+        Text(text=f"chunk {i}", name=f"chunk {i}", doc=doc, embedding=[1.0, 0.5])
+        for doc in docs
+        for i in range(10)
+    ]
+    index = QdrantVectorStore(upsert_batch_size=3, max_concurrent_upserts=2)
+    consumed: list[Text] = []
+
+    def stream(texts: list[Text]) -> Iterator[Text]:
+        for text in texts:
+            consumed.append(text)
+            yield text
+
+    await index.add_texts_and_embeddings(stream(texts[:7]))
+    await index.add_texts_and_embeddings(stream(texts[7:]))
+    assert consumed == texts
+    assert len(index._point_ids or set()) == len(texts)
+    assert (await index.client.count(index.collection_name)).count == len(texts)
+    assert index._point_ids == {QdrantVectorStore.point_id(t) for t in texts}
+
+    # Re-adding a text overwrites its point, as IDs are deterministic
+    await index.add_texts_and_embeddings(texts[:1])
+    assert (await index.client.count(index.collection_name)).count == len(texts)
+    changed_text = texts[0].model_copy(update={"text": "changed"})
+    assert QdrantVectorStore.point_id(changed_text) not in index._point_ids
+
+    # A failed upsert's points aren't recorded, and the upserts in flight finish
+    failing_index = QdrantVectorStore(upsert_batch_size=3, max_concurrent_upserts=2)
+    upsert = failing_index.client.upsert
+    n_upserts = 0
+
+    async def flaky_upsert(**kwargs) -> object:
+        nonlocal n_upserts
+        n_upserts += 1
+        if n_upserts == 2:
+            raise RuntimeError("Upsert failed.")
+        return await upsert(**kwargs)
+
+    failing_index.client.upsert = flaky_upsert
+    with pytest.raises(RuntimeError, match="Upsert failed"):
+        await failing_index.add_texts_and_embeddings(texts)
+    assert failing_index._point_ids == {
+        QdrantVectorStore.point_id(t) for t in texts[:3]
+    }
+    assert (
+        await failing_index.client.count(failing_index.collection_name)
+    ).count == len(failing_index)
+
+
+@pytest.mark.parametrize("index_cls", [NumpyVectorStore, IVFVectorStore])
+@pytest.mark.asyncio
+async def test_numpy_vector_store_removal(
+    index_cls: type[NumpyVectorStore], tmp_path: Path
+) -> None:
+    rng = np.random.default_rng(seed=42)
+    docs = [
+        Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        for i in range(4)
+    ]
+    texts = [
+        Text(
+            text=f"chunk {j}",
+            name=f"stub{i} chunk {j}",
+            doc=doc,
+            embedding=rng.standard_normal(8).tolist(),
+        )
+        for i, doc in enumerate(docs)
+        for j in range(50)
+    ]
+
+    class QueryEmbeds(EmbeddingModel):
+        name: str = "query_embed"
+
+        async def embed_documents(self, texts):  # noqa: ARG002
+            return [query_embedding]
+
+    index = index_cls(compaction_threshold=0.5)
+    if isinstance(index, IVFVectorStore):
+        index.n_lists, index.min_train_rows = 4, 100
+    await index.add_texts_and_embeddings(texts)
+    query_embedding = texts[10].embedding
+
+    # Removed rows are tombstoned, until enough are removed to compact
+    await index.remove_doc("stub0")
+    assert index.n_rows == len(index.texts) == len(texts)
+    assert index.n_live_rows == len(index) == 150
+    assert texts[10] not in index
+    matches, _ = await index.similarity_search(
+        "query", k=200, embedding_model=QueryEmbeds()
+    )
+    assert len(matches) == 150
+    assert all(m.doc.dockey != "stub0" for m in matches)
+    ((batch_matches, _),) = await index.batch_similarity_search(
+        ["query"], k=200, embedding_model=QueryEmbeds()
+    )
+    assert batch_matches == matches
+
+    await index.remove_texts(texts[50:55])
+    assert index.n_live_rows == len(index) == 145
+    await index.remove_doc("stub1")
+    assert index.n_rows == len(index.texts) == index.n_live_rows == 100
+    assert index.texts == texts[100:]
+    assert index.embeddings_matrix is not None
+    assert len(index.embeddings_matrix) == 100
+
+    # Removed texts can be added again, and stores save without removed rows
+    await index.add_texts_and_embeddings(texts[10:11])
+    await index.remove_texts(texts[100:101])
+    matches, _ = await index.similarity_search(
+        "query", k=1, embedding_model=QueryEmbeds()
+    )
+    assert matches == [texts[10]]
+    index.save(tmp_path / "index")
+    loaded = NumpyVectorStore.load(tmp_path / "index")
+    assert loaded.texts == texts[101:] + texts[10:11]
+
+    # Docs remove deleted documents from the index at retrieval
+    docs_collection = Docs(texts_index=index_cls())
+    for doc in docs:
+        await docs_collection.aadd_texts(
+            [t for t in texts if t.doc == doc], doc, embedding_model=QueryEmbeds()
+        )
+    await docs_collection.retrieve_texts("query", k=5, embedding_model=QueryEmbeds())
+    assert len(docs_collection.texts_index) == len(texts)
+    docs_collection.delete(dockey="stub0")
+    matches = await docs_collection.retrieve_texts(
+        "query", k=5, embedding_model=QueryEmbeds()
+    )
+    assert len(matches) == 5
+    assert all(m.doc.dockey != "stub0" for m in matches)
+    assert len(docs_collection.texts_index) == 150
+
+
+@pytest.mark.asyncio
+async def test_qdrant_vector_store_removal() -> None:
+    docs = [
+        Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        for i in range(2)
+    ]
+    texts = [
+        Text(
+            text=f"{doc.docname} chunk {i}",
+            name=f"{doc.docname} chunk {i}",
+            doc=doc,
+            embedding=[1.0, 0.5],
+        )
+        for doc in docs
+        for i in range(10)
+    ]
+    index = QdrantVectorStore(upsert_batch_size=3)
+    await index.add_texts_and_embeddings(texts)
+
+    await index.remove_texts(texts[:2])
+    assert (await index.client.count(index.collection_name)).count == 18
+    assert len(index) == len(index._point_ids or set()) == 18
+    await index.remove_doc("stub1")
+    assert (await index.client.count(index.collection_name)).count == 8
+    assert index._point_ids == {QdrantVectorStore.point_id(t) for t in texts[2:10]}
+    assert texts[2] in index
+    assert texts[10] not in index
+
+
+@pytest.mark.asyncio
+async def test_qdrant_load_docs() -> None:
+    docs = [
+        Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        for i in range(3)
+    ]
+    texts = [
+        Text(text=f"chunk {i}", name=f"chunk {i}", doc=doc, embedding=[1.0, i])
+        for doc in docs
+        for i in range(5)
+    ]
+    index = QdrantVectorStore()
+    await index.add_texts_and_embeddings(texts)
+
+    # Stores close their client when collected, so keep the loaded ones referenced
+    n_texts_per_page = [
+        (len(page.texts), page)
+        async for page in QdrantVectorStore.iter_load_docs(
+            index.client, index.collection_name, batch_size=4
+        )
+    ]
+    assert [n for n, _ in n_texts_per_page] == [4, 8, 12, 15]
+
+    loaded = await QdrantVectorStore.load_docs(
+        index.client, index.collection_name, batch_size=4
+    )
+    assert set(loaded.docs) == {d.dockey for d in docs}
+    assert {(t.doc.dockey, t.text) for t in loaded.texts} == {
+        (t.doc.dockey, t.text) for t in texts
+    }
+    # Qdrant normalizes embeddings for cosine distance
+    assert all(len(t.embedding or []) == 2 for t in loaded.texts)
+    loaded_index = cast(QdrantVectorStore, loaded.texts_index)
+    assert loaded_index._point_ids == {QdrantVectorStore.point_id(t) for t in texts}
+    # Loaded texts are already indexed, so building the index is a no-op
+    assert all(t in loaded_index for t in loaded.texts)
+    assert loaded._unindexed_rows("texts", loaded_index)[0] == []
+    assert loaded._index_watermarks["texts"][3] == len(loaded.texts)
+    assert {t.name for t in loaded.get_doc_texts("stub1")} == {
+        f"chunk {i}" for i in range(5)
+    }
+
+    lazy = await QdrantVectorStore.load_docs(
+        index.client, index.collection_name, with_vectors=False, with_text=False
+    )
+    assert len(lazy.texts) == len(texts)
+    assert all(t.embedding is None and not t.text for t in lazy.texts)
+    # Searches are still served by the collection, with full texts
+    matches, _ = await lazy.texts_index.similarity_search(
+        query="chunk",
+        k=1,
+        embedding_model=SparseEmbeddingModel(ndim=2),
+    )
+    assert matches[0].text.startswith("chunk")
+
+    with pytest.warns(DeprecationWarning, match="max_concurrent_requests"):
+        await QdrantVectorStore.load_docs(
+            index.client, index.collection_name, max_concurrent_requests=5
+        )
+
+
+@pytest.mark.asyncio
+async def test_ivf_vector_store(subtests: SubTests) -> None:
+    rng = np.random.default_rng(seed=42)
+    docs = [
+        Doc(docname=f"stub{i}", citation=f"stub{i}", dockey=f"stub{i}")
+        for i in range(2)
+    ]
+    # Clustered embeddings, like those of real corpora
+    centers = rng.standard_normal((10, 16))
+    texts = [
+        Text(
+            text=f"chunk {i}",
+            name=f"chunk {i}",
+            doc=docs[i % 2],
+            embedding=(centers[i % 10] + 0.1 * rng.standard_normal(16)).tolist(),
+        )
+        for i in range(1000)
+    ]
+    query_embedding = centers[3].tolist()
+
+    class QueryEmbeds(EmbeddingModel):
+        name: str = "query_embed"
+
+        async def embed_documents(self, texts):  # noqa: ARG002
+            return [query_embedding]
+
+    exact_index = NumpyVectorStore()
+    index = IVFVectorStore(n_lists=10, n_probe=2, min_train_rows=500)
+    for batch_start in range(0, 400, 100):
+        await index.add_texts_and_embeddings(texts[batch_start : batch_start + 100])
+    await exact_index.add_texts_and_embeddings(texts)
+
+    with subtests.test(msg="exact-until-trained"):
+        await index.similarity_search("query", k=10, embedding_model=QueryEmbeds())
+        assert not index.is_trained
+
+    await index.add_texts_and_embeddings(texts[400:])
+    exact_matches, exact_scores = await exact_index.similarity_search(
+        "query", k=10, embedding_model=QueryEmbeds()
+    )
+
+    with subtests.test(msg="approximate-once-trained"):
+        matches, scores = await index.similarity_search(
+            "query", k=10, embedding_model=QueryEmbeds()
+        )
+        assert index.is_trained
+        assert sum(len(rows) for rows in index._lists) == len(texts)
+        assert set(matches) == set(exact_matches)
+        assert np.allclose(sorted(scores), sorted(exact_scores))
+
+    with subtests.test(msg="incremental-inserts"):
+        new_text = Text(
+            text="new chunk", name="new chunk", doc=docs[0], embedding=query_embedding
+        )
+        await index.add_texts_and_embeddings([new_text])
+        assert sum(len(rows) for rows in index._lists) == len(texts) + 1
+        matches, _ = await index.similarity_search(
+            "query", k=1, embedding_model=QueryEmbeds()
+        )
+        assert matches == [new_text]
+
+    def partition_by_doc(t: Embeddable) -> int:
+        return int(cast("Text", t).doc.docname == "stub1")
+
+    with subtests.test(msg="partitioned-and-mmr"):
+        partitioned_matches, _ = await index.partitioned_similarity_search(
+            "query",
+            k=10,
+            embedding_model=QueryEmbeds(),
+            partitioning_fn=partition_by_doc,
+        )
+        assert len(partitioned_matches) == 10
+        assert [partition_by_doc(t) for t in partitioned_matches] == [0, 1] * 5
+
+        index.mmr_lambda = 0.5
+        mmr_matches, _ = await index.max_marginal_relevance_search(
+            "query", k=5, fetch_k=10, embedding_model=QueryEmbeds()
+        )
+        assert len(mmr_matches) == 5
+
+    with subtests.test(msg="clear"):
+        index.clear()
+        assert not index.is_trained
+        assert not index._lists
+
+
+@pytest.mark.parametrize("mmr_lambda", [0.0, 0.5, 0.9])
+def test_maximal_marginal_relevance(mmr_lambda: float) -> None:
+    rng = np.random.default_rng(seed=42)
+    embeddings = l2_normalize(rng.standard_normal((50, 8)).astype(np.float32))
+    scores = np.sort(embeddings @ embeddings[0])[::-1].copy()
+
+    # Brute force: recompute every candidate's max similarity per selection
+    expected = [0]
+    for _ in range(19):
+        mmr_scores = [
+            (
+                -np.inf
+                if i in expected
+                else mmr_lambda * scores[i]
+                - (1 - mmr_lambda)
+                * max(float(embeddings[i] @ embeddings[j]) for j in expected)
+            )
+            for i in range(len(embeddings))
+        ]
+        expected.append(int(np.argmax(mmr_scores)))
+
+    assert maximal_marginal_relevance(embeddings, scores, 20, mmr_lambda) == expected
+    assert sorted(maximal_marginal_relevance(embeddings, scores, 99, mmr_lambda)) == (
+        list(range(50))
+    ), "Expected every candidate selected once when k exceeds the candidates"
+
+
+@pytest.mark.parametrize("k", [0, 1, 5, 99, 100, 150])
+def test_top_k_indices(k: int) -> None:
+    rng = np.random.default_rng(seed=42)
+    # Round to force ties, which must be broken the same as a full stable sort
+    scores = rng.standard_normal(100).round(1)
+    assert np.array_equal(
+        top_k_indices(scores, k), np.argsort(-scores, kind="stable")[:k]
+    )
+
+
 # some of the stored requests will be identical on
 # method, scheme, host, port, path, and query (if defined)
 # body will always be different between requests
@@ -1387,6 +3059,47 @@ def test_answer_rename(recwarn) -> None:
     assert "'Answer' class is deprecated" in str(warning_msg.message)
 
 
+@pytest.mark.asyncio
+async def test_session_interns_docs() -> None:
+    details = DocDetails(
+        docname="details",
+        citation="details",
+        dockey="details",
+        other={"payload": "x" * 1000},
+    )
+    stub = Doc(docname="stub", citation="stub", dockey="stub")
+    texts = [
+        Text(text=f"chunk {i}", name=f"chunk {i}", doc=doc, embedding=[1.0])
+        for i, doc in enumerate([details, details, stub, details])
+    ]
+    contexts = [(await map_fxn_summary(t, "question", None, None))[0] for t in texts]
+    assert contexts[0].text.doc is details, "Expected docs to be shared, not copied"
+    assert contexts[0].text.embedding is None
+
+    session = PQASession(question="question", contexts=contexts)
+    deduped_json = session.model_dump_json(context={"dedupe_docs": True})
+    data = json.loads(deduped_json)
+    assert [c["text"]["doc"] for c in data["contexts"]] == [0, 0, 1, 0]
+    assert [d["dockey"] for d in data["docs"]] == [details.dockey, "stub"]
+    assert deduped_json.count("x" * 1000) == 1
+    assert session.model_dump()["contexts"][0]["text"]["doc"]["dockey"] == (
+        details.dockey
+    )
+
+    loaded = PQASession.model_validate_json(deduped_json)
+    assert loaded.contexts == session.contexts
+    assert isinstance(loaded.contexts[0].text.doc, DocDetails)
+    assert loaded.contexts[0].text.doc is loaded.contexts[3].text.doc
+    # By default, documents stay inline, and such sessions still load
+    inline = json.loads(session.model_dump_json())
+    assert "docs" not in inline
+    assert inline["contexts"][2]["text"]["doc"]["dockey"] == "stub"
+    assert PQASession.model_validate(inline).contexts == session.contexts
+
+    session.filter_content_for_user()
+    assert session.contexts[1].text.doc is details
+
+
 @pytest.mark.parametrize(
     "doi_journals",
     [